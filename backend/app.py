@@ -1,22 +1,39 @@
 # app.py
-from flask import Flask, request, send_from_directory, jsonify, render_template_string
+# ASYNC_MODE=gevent : le monkey-patching doit précéder tous les autres imports
+from services.serving import ASYNC_MODE, monkey_patch
+monkey_patch()
+
+from flask import Flask, Response, g, request, send_from_directory, jsonify, render_template_string
 from flask_cors import CORS
+from werkzeug.formparser import FormDataParser
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
 from datetime import datetime, timezone
 from dateutil.parser import isoparse
-from werkzeug.utils import secure_filename
 from zoneinfo import ZoneInfo
 from pathlib import Path
+import logging
 import os
-
-from services.repo import YamlRepo, ensure_default_data
-from services.auth import hash_password, check_password, ensure_user_uniqueness
+import time
+
+from services.repo import make_repo, ensure_default_data
+from services.logs import setup_logging, sampled
+from services import metrics
+from services.pagination import paginate, parse_limit
+from services.search import SearchIndex
+from services.facets import FacetIndex
+from services.listing import ListingView
+from services.http_cache import ResponseCache
+from services.images import ImagePipeline, UnsupportedImage
+from services.ledger import Ledger, entry, from_cents, to_cents
+from services.scheduler import LifecycleScheduler
+from services.events import EventBus, Coalescer, socketio_options
+from services.auth import hash_password, check_password, needs_rehash, ensure_user_uniqueness, LoginThrottle
 from services.auctions import (
-    list_auctions, get_auction, create_auction, place_bid,
-    open_auction_if_due, close_auction_if_due, product_is_owned_by
+    list_auctions, get_auction, create_auction, AuctionEngine, EngineUnavailable,
+    open_auction_if_due, product_is_owned_by, auction_facets, SORTS,
+    owner_auctions, bidder_auctions
 )
 from models.schemas import RegisterSchema, LoginSchema, ProductSchema, AuctionCreateSchema, BidSchema
 
@@ -24,9 +41,6 @@ from models.schemas import RegisterSchema, LoginSchema, ProductSchema, AuctionCr
 APP_TZ = os.environ.get("APP_TZ", "Europe/Paris")
 LOCAL_TZ = ZoneInfo(APP_TZ)
 
-ALLOWED_IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
-ALLOWED_IMAGE_MIMES = {"image/jpeg", "image/png", "image/webp"}
-
 MEDIA_ROOT = Path(
     os.environ.get("MEDIA_ROOT", str((Path(__file__).parent / "local_data" / "media")))
 ).resolve()
@@ -34,8 +48,22 @@ MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 
 MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", 10))
 
+# Nombre de reverse proxies (nginx...) devant l'app dont les en-têtes
+# X-Forwarded-For/-Proto sont fiables. 0 : ignorés, l'IP vue est celle
+# de la connexion (le proxy lui-même s'il y en a un)
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
+
+# Moteur d'enchères en mémoire (BID_ENGINE=0 : place_bid transactionnel,
+# obligatoire si plusieurs workers partagent la même base)
+BID_ENGINE = os.environ.get("BID_ENGINE", "1") != "0"
+
+# Fenêtre de regroupement des bid_placed par room (rafale -> dernier état)
+BID_EVENT_WINDOW_MS = int(os.environ.get("BID_EVENT_WINDOW_MS", 100))
+
 DOCS_DIR = Path(__file__).parent / "docs"
 
+log = logging.getLogger("auctionnet")
+
 def to_utc(dt):
     """Interprète un datetime sans TZ comme Europe/Paris, puis convertit en UTC."""
     if dt.tzinfo is None:
@@ -44,6 +72,7 @@ def to_utc(dt):
 
 # ------------------- Factory -------------------
 def create_app():
+    setup_logging()
     app = Flask(__name__)
     CORS(app, supports_credentials=False, resources={r"/*": {"origins": "*"}})
 
@@ -51,34 +80,68 @@ def create_app():
     app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
     jwt = JWTManager(app)
     
-    # Initialiser SocketIO avec threading (compatible Python 3.13)
+    # ASYNC_MODE=threading (défaut) ou gevent (wsgi.py, milliers de clients)
     socketio = SocketIO(
         app, 
         cors_allowed_origins="*", 
-        async_mode='threading',
-        logger=True,
-        engineio_logger=True
+        async_mode=ASYNC_MODE,
+        # Niveaux réglés par setup_logging (SOCKETIO_LOGS=1 pour les paquets)
+        logger=logging.getLogger("socketio.server"),
+        engineio_logger=logging.getLogger("engineio.server"),
+        # EVENTS_URL=redis://... : diffusion entre workers via le broker
+        **socketio_options()
     )
-
-    repo = YamlRepo()
+    if TRUSTED_PROXIES:
+        # Autour de tout (Socket.IO compris) : request.remote_addr est
+        # l'IP du client, celle que LoginThrottle compte
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+    events = EventBus(socketio)
+    # En cas de mises concurrentes, garder l'état le plus avancé
+    bid_events = Coalescer(events, 'bid_placed', window=BID_EVENT_WINDOW_MS / 1000,
+                           newer=lambda old, new: new if new['bids_count'] >= old['bids_count'] else old)
+
+    repo = make_repo()
     ensure_default_data(repo)
+    # Soldes et montants bloqués : écritures en ajout seul, totaux en mémoire
+    ledger = Ledger.from_repo(repo)
+    ledger.start()
+    app.extensions["ledger"] = ledger
+    engine = AuctionEngine(repo, ledger, enabled=BID_ENGINE)
+    app.extensions["auction_engine"] = engine
+    # Index plein texte des produits (filtre `search` de la liste des enchères)
+    search_index = SearchIndex.from_repo(repo)
+    # Facettes statut/catégorie/état, tenues à jour à chaque écriture du repo
+    facets = FacetIndex.from_repo(repo, sort_keys=SORTS)
+    # Enchères déjà jointes (produit, nombre de mises, gagnant) pour les lectures
+    view = ListingView.from_repo(repo)
+    # Images produit : empreinte, variantes redimensionnées (pool de fond)
+    images = ImagePipeline(MEDIA_ROOT)
+    app.extensions["images"] = images
+    # Lectures interrogées en boucle par le frontend : ETag/304 et JSON déjà sérialisé
+    http_cache = ResponseCache()
+    # Tentatives de connexion par email et par IP (429 au-delà)
+    login_throttle = LoginThrottle()
+    app.extensions["login_throttle"] = login_throttle
+
+    def auction_version(aid):
+        """(version, heure) d'une enchère pour son ETag : entrée de la vue et
+        mises acceptées en mémoire (pas encore écrites). None si inconnue."""
+        entry = view.version(aid)
+        if entry is None:
+            return None
+        live = engine.version(aid) or (0, 0.0)
+        return (entry[0], live[0]), max(entry[1], live[1])
 
     # ---------- Backfill / recalage des enchères au démarrage ----------
     def ensure_auction_defaults():
-        doc = repo.load("auctions")
-        items = doc.get("auctions", [])
-        changed = False
+        items = repo.load("auctions").get("auctions", [])
         now_utc = datetime.now(LOCAL_TZ).astimezone(timezone.utc)
 
         for a in items:
-            a.setdefault("min_increment", 50)
-            a.setdefault("current_price", a.get("start_price", 0))
-            a.setdefault("current_bid_id", None)
             try:
                 s = to_utc(isoparse(a["start_at"]))
                 e = to_utc(isoparse(a["end_at"]))
             except Exception:
-                a.setdefault("status", "scheduled")
                 continue
 
             if now_utc < s:
@@ -86,92 +149,160 @@ def create_app():
             elif s <= now_utc < e:
                 new_status = "running"
             else:
-                new_status = "closed"
-
-            if a.get("status") != new_status:
-                a["status"] = new_status
-                changed = True
+                # Échue : la clôture passe par le règlement (scheduler ci-dessous),
+                # sinon le gagnant ne serait jamais débité
+                continue
 
-        if changed:
-            repo.save("auctions", {"auctions": items})
+            if a.get("status") == new_status:
+                continue
+            # Une transaction par enchère recalée : pas d'écrasement d'une mise concurrente
+            with repo.transaction(f"auction:{a['id']}") as tx:
+                cur = tx.get("auctions", a["id"])
+                if not cur:
+                    continue
+                cur.setdefault("min_increment", 50)
+                cur.setdefault("current_price", cur.get("start_price", 0))
+                cur.setdefault("current_bid_id", None)
+                cur["status"] = new_status
+                tx.put("auctions", cur)
 
     ensure_auction_defaults()
 
     # ---------- Scheduler ----------
-    scheduler = BackgroundScheduler()
+    def open_due(auction_ids):
+        opened = [a for a in (open_auction_if_due(repo, aid) for aid in auction_ids) if a]
+        if opened:
+            events.publish('auction_opened', {'auctions': [
+                {'auction_id': a['id'], 'status': a['status']} for a in opened
+            ]})
+
+    def close_due(auction_ids):
+        # Règlement groupé : une transaction pour toutes les enchères échues
+        closed = engine.settle_many(auction_ids)
+        if closed:
+            events.publish('auction_closed', {'auctions': [
+                {'auction_id': a['id'], 'winner_id': a.get('winner_id'),
+                 'current_price': a.get('current_price'), 'status': a['status']}
+                for a in closed
+            ]})
+
+    # Un seul tas d'échéances pour toutes les enchères ; les fenêtres ratées
+    # (instance arrêtée) sont échues dès le chargement
+    scheduler = LifecycleScheduler(on_open=open_due, on_close=close_due)
+    scheduler.load(repo.load("auctions").get("auctions", []))
+    # Rattrapage au démarrage par le même chemin groupé, avant de servir
+    scheduler.run_due()
     scheduler.start()
 
-    def schedule_jobs_for_all():
-        auctions = repo.load("auctions").get("auctions", [])
-        now_utc = datetime.now(LOCAL_TZ).astimezone(timezone.utc)
+    # ------------------- Routes -------------------
+    # ---------- Métriques ----------
+    @app.before_request
+    def start_timer():
+        g.started_at = time.perf_counter()
+
+    @app.before_request
+    def refresh_views():
+        # Vue, facettes et index de recherche ne suivent que les écritures
+        # de ce process : celles des autres workers sont rattrapées ici (et
+        # changent les versions, donc les ETags) avant toute lecture
+        if request.method in ('GET', 'HEAD'):
+            repo.refresh()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('started_at', None)
+        if started is not None:
+            # Route déclarée (/api/auctions/<aid>), pas l'URL : cardinalité bornée
+            labels = {'method': request.method,
+                      'route': request.url_rule.rule if request.url_rule else 'unmatched',
+                      'status': response.status_code}
+
+            def observe():
+                metrics.HTTP_SECONDS.observe(time.perf_counter() - started, **labels)
+            if response.is_streamed:
+                # Corps sérialisé pendant l'envoi, après ce hook : mesuré à la fin
+                response.call_on_close(observe)
+            else:
+                observe()
+        return response
 
-        for a in auctions:
-            try:
-                s = to_utc(isoparse(a["start_at"]))
-                e = to_utc(isoparse(a["end_at"]))
-                status = a.get("status", "scheduled")
+    def room_sizes():
+        rooms = socketio.server.manager.rooms.get('/', {})
+        return {(room,): len(sids) for room, sids in rooms.items() if room and room.startswith('auction_')}
 
-                # Rattrapage immédiat si l'instance a raté une fenêtre
-                if now_utc >= e and status != "closed":
-                    close_auction_if_due(repo, a["id"])
-                    continue
-                if s <= now_utc < e and status == "scheduled":
-                    open_auction_if_due(repo, a["id"])
-                    status = "running"
-
-                # Planification futur
-                if s > now_utc:
-                    scheduler.add_job(lambda aid=a["id"]: open_auction_if_due(repo, aid),
-                                      DateTrigger(run_date=s))
-                if e > now_utc:
-                    scheduler.add_job(lambda aid=a["id"]: close_auction_if_due(repo, aid),
-                                      DateTrigger(run_date=e))
-            except Exception:
-                continue
+    metrics.Gauge('socketio_room_clients', "Clients Socket.IO connectés par room d'enchère",
+                  ('room',), collect=room_sizes)
+    metrics.Gauge('socketio_connected_clients', 'Clients Socket.IO connectés à ce worker',
+                  collect=lambda: {(): len(socketio.server.manager.rooms.get('/', {}).get(None, ()))})
+    metrics.Gauge('ledger_held_drift_users',
+                  'Utilisateurs dont le bloqué diffère de leurs mises en tête (dernière réconciliation)',
+                  collect=lambda: {(): len(ledger.drift)})
 
-    schedule_jobs_for_all()
+    @app.get('/api/metrics')
+    def get_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
-    # ------------------- Routes -------------------
     @app.get('/api/health')
     def health():
-        return {"status": "ok"}
+        return {"status": "ok", "repo_cache": repo.cache_stats(), "events": events.backend}
 
     @app.get('/media/<pid>/<path:filename>')
     def serve_media(pid, filename):
-        dirpath = os.path.join(str(MEDIA_ROOT), pid)
-        return send_from_directory(directory=dirpath, path=filename, as_attachment=False, max_age=3600)
+        size = request.args.get('size', type=int)
+        if not size:
+            return images.serve(pid, filename, max_age=3600)
+        # ?size=<px> : plus petite variante assez large, WebP si le client l'accepte
+        name, state = images.resolve(pid, filename, size, webp='image/webp' in request.accept_mimetypes.values())
+        # Variante : nom dérivé de l'empreinte, contenu immuable. En cours de
+        # calcul : l'original, brièvement, pour reprendre la variante ensuite
+        max_age = {"variant": 31536000, "pending": 60}.get(state, 3600)
+        response = images.serve(pid, name, max_age=max_age)
+        response.vary.add('Accept')
+        return response
 
     # --- Auth ---
     @app.post('/api/auth/register')
     def register():
         data = request.get_json() or {}
         payload = RegisterSchema(**data)
-        users = repo.load("users")
-        ensure_user_uniqueness(users, payload.email)
-        new_id = repo.next_id(users, "users", prefix="u_")
-        # Extraire username de l'email (partie avant le @)
-        username = payload.email.split('@')[0]
-        users.setdefault("users", []).append({
-            "id": new_id,
-            "email": payload.email,
-            "username": username,
-            "password_hash": hash_password(payload.password),
-            "balance": 100000.0,
-            "held": 0.0,
-            "purchases": [],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
-        repo.save("users", users)
+        password_hash = hash_password(payload.password)
+        # Verrou sur l'email : deux inscriptions simultanées ne passent pas toutes les deux
+        with repo.transaction(f"email:{payload.email}") as tx:
+            ensure_user_uniqueness(repo, payload.email)
+            new_id = repo.new_id("users", prefix="u_")
+            # Extraire username de l'email (partie avant le @)
+            username = payload.email.split('@')[0]
+            tx.insert("users", {
+                "id": new_id,
+                "email": payload.email,
+                "username": username,
+                "password_hash": password_hash,
+                "purchases": [],
+                "created_at": datetime.now(timezone.utc).isoformat()
+            })
+            tx.insert("ledger", entry(repo, "credit", new_id, to_cents(100000.0), reason="signup"))
         return {"id": new_id, "email": payload.email, "balance": 100000.0}, 201
 
     @app.post('/api/auth/login')
     def login():
         data = request.get_json() or {}
         payload = LoginSchema(**data)
-        users = repo.load("users").get("users", [])
-        user = next((u for u in users if u["email"] == payload.email), None)
+        # Refusé avant tout calcul de hash : une rafale ne consomme pas le CPU
+        retry_after = login_throttle.attempt(payload.email, request.remote_addr)
+        if retry_after:
+            return {"error": "Too many login attempts"}, 429, {"Retry-After": str(retry_after)}
+        user = next(iter(repo.find("users", "email", payload.email)), None)
         if not user or not check_password(payload.password, user["password_hash"]):
             return {"error": "Invalid credentials"}, 401
+        login_throttle.succeeded(payload.email)
+        if needs_rehash(user["password_hash"]):
+            # PASSWORD_METHOD a changé : nouveau hash tant que le mot de passe est connu
+            new_hash = hash_password(payload.password)
+            with repo.transaction(f"user:{user['id']}") as tx:
+                current = tx.get("users", user["id"])
+                if current and current["password_hash"] == user["password_hash"]:
+                    current["password_hash"] = new_hash
+                    tx.put("users", current)
         token = create_access_token(identity=user["id"])
         return {"access_token": token}
 
@@ -179,15 +310,16 @@ def create_app():
     @jwt_required()
     def me():
         uid = get_jwt_identity()
-        users = repo.load("users").get("users", [])
-        user = next((u for u in users if u["id"] == uid), None)
+        user = repo.get("users", uid)
         if not user:
             return {"error": "User not found"}, 404
+        # Le moteur peut avoir des mises pas encore écrites
+        wallet = engine.wallet(uid) or ledger.totals(uid)
         return {
             "id": user["id"],
             "email": user["email"],
-            "balance": user.get("balance", 0.0),
-            "held": user.get("held", 0.0),
+            "balance": from_cents(wallet["balance"]),
+            "held": from_cents(wallet["held"]),
             "purchases": user.get("purchases", [])
         }
 
@@ -205,18 +337,13 @@ def create_app():
         if amount > 10000:
             return {"error": "Le montant maximum par crédit est de 10 000 €"}, 400
         
-        # Charger les utilisateurs
-        users_doc = repo.load("users")
-        users = users_doc.get("users", [])
-        user = next(u for u in users if u["id"] == uid)
-        
         # Ajouter le montant au solde
-        current_balance = user.get("balance", 0.0)
-        new_balance = float(current_balance) + float(amount)
-        user["balance"] = new_balance
-        
-        # Sauvegarder
-        repo.save("users", users_doc)
+        try:
+            current_balance, new_balance = engine.credit(uid, amount)
+        except ValueError:
+            return {"error": "User not found"}, 404
+        except EngineUnavailable as e:
+            return {"error": str(e)}, 503, {"Retry-After": "5"}
         
         return {
             "success": True,
@@ -228,7 +355,8 @@ def create_app():
     # --- Catégories ---
     @app.get('/api/categories')
     def categories():
-        return repo.load("categories")
+        n, changed = repo.version("categories")
+        return http_cache.serve((n,), changed, lambda: repo.load("categories"))
 
     # --- Produits ---
     @app.post('/api/products')
@@ -237,9 +365,8 @@ def create_app():
         uid = get_jwt_identity()
         data = request.get_json() or {}
         payload = ProductSchema(**data)
-        products = repo.load("products")
-        new_id = repo.next_id(products, "products", prefix="p_")
-        products.setdefault("products", []).append({
+        new_id = repo.new_id("products", prefix="p_")
+        product = {
             "id": new_id,
             "owner_id": uid,
             "title": payload.title,
@@ -247,43 +374,56 @@ def create_app():
             "category": payload.category,
             "condition": payload.condition,
             "images": payload.images,
-        })
-        repo.save("products", products)
+        }
+        repo.insert("products", product)
         return {"id": new_id}, 201
 
     @app.post('/api/products/<pid>/images')
     @jwt_required()
     def upload_product_image(pid):
         uid = get_jwt_identity()
-        products_doc = repo.load("products")
-        prod = next((p for p in products_doc.get("products", []) if p["id"] == pid), None)
+        prod = repo.get("products", pid)
         if not prod:
             return {"error": "Product not found"}, 404
         if prod.get("owner_id") != uid:
             return {"error": "You do not own this product"}, 403
 
-        if 'file' not in request.files:
-            return {"error": "Missing file"}, 400
-        file = request.files['file']
-        if file.filename == '':
-            return {"error": "Empty filename"}, 400
+        # Fichier écrit sur disque au fil de la lecture du corps (taille et
+        # type vérifiés à chaque morceau), jamais entièrement en mémoire
+        uploads = []
 
-        mime = file.mimetype or ''
-        ext = os.path.splitext(file.filename)[1].lower()
-        if ext not in ALLOWED_IMAGE_EXTS or mime not in ALLOWED_IMAGE_MIMES:
-            return {"error": "Unsupported file type"}, 400
+        def stream_factory(total_content_length, content_type, filename, content_length=None):
+            upload = images.receive(pid, app.config["MAX_CONTENT_LENGTH"])
+            uploads.append(upload)
+            return upload
 
-        safe_name = secure_filename(file.filename)
-        target_dir = os.path.join(str(MEDIA_ROOT), pid)
-        os.makedirs(target_dir, exist_ok=True)
-        ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
-        stored_name = f"{ts}_{safe_name}"
-        abs_path = os.path.join(target_dir, stored_name)
-        file.save(abs_path)
+        parser = FormDataParser(stream_factory, max_form_memory_size=request.max_form_memory_size,
+                                max_content_length=request.max_content_length,
+                                max_form_parts=request.max_form_parts)
+        try:
+            _, _, files = parser.parse(request.stream, request.mimetype, request.content_length,
+                                       request.mimetype_params)
+            if 'file' not in files:
+                return {"error": "Missing file"}, 400
+            file = files['file']
+            if file.filename == '':
+                return {"error": "Empty filename"}, 400
+            # Nom = empreinte du contenu ; variantes calculées en arrière-plan
+            stored_name = images.commit(file.stream)
+        except UnsupportedImage:
+            return {"error": "Unsupported file type"}, 400
+        finally:
+            for upload in uploads:
+                upload.discard()
 
         rel_path = f"media/{pid}/{stored_name}"
-        prod.setdefault('images', []).append(rel_path)
-        repo.save('products', products_doc)
+        with repo.transaction(f"product:{pid}") as tx:
+            prod = tx.get("products", pid)
+            paths = prod.setdefault('images', [])
+            # Même fichier téléversé deux fois : une seule entrée
+            if rel_path not in paths:
+                paths.append(rel_path)
+                tx.put("products", prod)
         return {"path": rel_path}, 201
 
     # --- Enchères ---
@@ -293,52 +433,79 @@ def create_app():
         category = request.args.get('category')
         condition = request.args.get('condition')
         q = request.args.get('search')
-        return list_auctions(repo, status=status, category=category, condition=condition, search=q)
+
+        def render():
+            try:
+                limit = parse_limit(request.args.get('limit'))
+                page = list_auctions(repo, status=status, category=category, condition=condition, search=q,
+                                     limit=limit, cursor=request.args.get('cursor'),
+                                     search_index=search_index, sort=request.args.get('sort'), facets=facets,
+                                     view=view)
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            # Mises acceptées mais pas encore écrites : prix et leader du moteur,
+            # comme pour GET /api/auctions/<aid>
+            page["auctions"] = [{**a, **(engine.snapshot(a["id"]) or {})} for a in page["auctions"]]
+            return page
+
+        # Facettes, index et vue suivent les mêmes écritures : la version de la
+        # vue, plus celle du moteur pour les mises pas encore écrites
+        n, changed = view.version()
+        live, live_changed = engine.revision()
+        return http_cache.serve((n, live), max(changed, live_changed), render, stream="auctions")
+
+    @app.get('/api/auctions/facets')
+    def get_auction_facets():
+        return auction_facets(repo, facets,
+                              status=request.args.get('status'),
+                              category=request.args.get('category'),
+                              condition=request.args.get('condition'),
+                              search=request.args.get('search'),
+                              search_index=search_index)
 
     @app.get('/api/auctions/<aid>')
     def get_auction_by_id(aid):
-        result = get_auction(repo, aid)
-        if not result:
+        version = auction_version(aid)
+        if version is None:
             return {"error": "Not found"}, 404
-        return result
+
+        def render():
+            result = get_auction(repo, aid, view)
+            if not result:
+                return {"error": "Not found"}, 404
+            return {**result, **(engine.snapshot(aid) or {})}
+
+        return http_cache.serve(*version, render)
 
     @app.delete('/api/auctions/<aid>')
     @jwt_required()
     def delete_auction(aid):
         uid = get_jwt_identity()
         
-        # Charger l'enchère
-        auctions_doc = repo.load("auctions")
-        auctions = auctions_doc.get("auctions", [])
-        auction = next((a for a in auctions if a["id"] == aid), None)
-        
-        if not auction:
-            return {"error": "Auction not found"}, 404
-        
-        # Vérifier que l'utilisateur est le propriétaire du produit
-        if not product_is_owned_by(repo, auction["product_id"], uid):
-            return {"error": "You can only delete your own auctions"}, 403
-        
-        # Ne pas autoriser la suppression si l'enchère a déjà des enchères
-        bids_doc = repo.load("bids")
-        auction_bids = [b for b in bids_doc.get("bids", []) if b["auction_id"] == aid]
-        
-        if len(auction_bids) > 0:
-            return {"error": "Cannot delete auction with existing bids"}, 400
-        
-        # Supprimer l'enchère
-        auctions_doc["auctions"] = [a for a in auctions if a["id"] != aid]
-        repo.save("auctions", auctions_doc)
-        
-        # Annuler les jobs planifiés pour cette enchère
-        try:
-            scheduler.remove_job(f"open_{aid}")
-        except:
-            pass
+        # Verrou de l'enchère : aucune mise ne peut arriver pendant la suppression
         try:
-            scheduler.remove_job(f"close_{aid}")
-        except:
-            pass
+            with engine.exclusive(aid), repo.transaction(f"auction:{aid}") as tx:
+                # Charger l'enchère
+                auction = tx.get("auctions", aid)
+
+                if not auction:
+                    return {"error": "Auction not found"}, 404
+
+                # Vérifier que l'utilisateur est le propriétaire du produit
+                if not product_is_owned_by(repo, auction["product_id"], uid):
+                    return {"error": "You can only delete your own auctions"}, 403
+
+                # Ne pas autoriser la suppression si l'enchère a déjà des enchères
+                if repo.count("bids", "auction_id", aid) > 0:
+                    return {"error": "Cannot delete auction with existing bids"}, 400
+
+                # Supprimer l'enchère
+                tx.delete("auctions", aid)
+        except EngineUnavailable as e:
+            return {"error": str(e)}, 503, {"Retry-After": "5"}
+        
+        # Annuler l'ouverture/clôture planifiée pour cette enchère
+        scheduler.cancel(aid)
         
         return {"message": "Auction deleted successfully"}, 200
 
@@ -380,47 +547,61 @@ def create_app():
 
         out = create_auction(repo, normalized)  # ne doit PAS reconvertir
 
-        # Recalage + (re)planification
-        ensure_auction_defaults()
-        schedule_jobs_for_all()
+        # Ouverture immédiate si start_at est déjà passé, puis planification
+        if s_utc <= datetime.now(timezone.utc):
+            open_auction_if_due(repo, out["id"])
+            out = get_auction(repo, out["id"], view)
+        scheduler.upsert(out)
         return out, 201
 
 
 
     @app.get('/api/auctions/<aid>/bids')
     def get_auction_bids(aid):
-        """Récupère l'historique de toutes les enchères pour une enchère spécifique"""
-        bids_doc = repo.load("bids")
-        users_doc = repo.load("users")
-        
-        bids = bids_doc.get("bids", [])
-        users = users_doc.get("users", [])
-        user_map = {u["id"]: u for u in users}
-        
-        # Filtrer les bids pour cette enchère et ajouter les infos utilisateur
-        auction_bids = []
-        for b in bids:
-            if b.get("auction_id") == aid:
-                user = user_map.get(b.get("user_id"), {})
-                # Le champ est 'placed_at' dans le YAML, pas 'timestamp'
-                placed_at = b.get("placed_at", "")
-                # Extraire username de l'email si le champ username n'existe pas
-                email = user.get("email", "")
-                username = user.get("username", email.split('@')[0] if email else "Inconnu")
-                auction_bids.append({
-                    "id": b.get("id"),
-                    "amount": b.get("amount"),
-                    "timestamp": placed_at,  # Renommer pour l'API frontend
-                    "user": {
-                        "id": user.get("id"),
-                        "username": username
-                    }
-                })
-        
-        # Trier par timestamp décroissant (plus récent en premier)
-        auction_bids.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        
-        return {"bids": auction_bids}
+        """Historique paginé des mises d'une enchère (plus récentes en premier)"""
+        def render():
+            try:
+                limit = parse_limit(request.args.get('limit'))
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            # Index auction_id -> mises : pas de parcours de tout l'historique
+            bids = repo.find("bids", "auction_id", aid)
+            pending = engine.pending_bids(aid)
+            if pending:
+                # Mises acceptées par le moteur mais pas encore écrites
+                written = {b["id"] for b in bids}
+                bids = bids + [b for b in pending if b["id"] not in written]
+            # Tri stable (placed_at, id) décroissant : plus récent en premier
+            try:
+                page = paginate(bids, lambda b: (b.get("placed_at", ""), b["id"]), limit,
+                                request.args.get('cursor'), reverse=True)
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            # Ajouter les infos utilisateur (noms tenus par la vue, seulement pour la page)
+            auction_bids = []
+            for b in page["items"]:
+                if b.get("auction_id") == aid:
+                    username = view.username(b.get("user_id"))
+                    # Le champ est 'placed_at' dans le YAML, pas 'timestamp'
+                    placed_at = b.get("placed_at", "")
+                    auction_bids.append({
+                        "id": b.get("id"),
+                        "amount": b.get("amount"),
+                        "timestamp": placed_at,  # Renommer pour l'API frontend
+                        "user": {
+                            "id": b.get("user_id") if username else None,
+                            "username": username or "Inconnu"
+                        }
+                    })
+
+            return {"bids": auction_bids, "next_cursor": page["next_cursor"]}
+
+        version = auction_version(aid)
+        if version is None:
+            # Enchère inconnue : pas de version, rien à mettre en cache
+            return render()
+        # Version de l'entrée (mises écrites, noms) + mises acceptées en mémoire
+        return http_cache.serve(*version, render, stream="bids")
 
     @app.post('/api/auctions/<aid>/bids')
     @jwt_required()
@@ -429,39 +610,54 @@ def create_app():
         data = request.get_json() or {}
         payload = BidSchema(**data)
         try:
-            res = place_bid(repo, aid, uid, payload.amount)
+            res = engine.place_bid(aid, uid, payload.amount)
             
-            # Émettre l'événement WebSocket pour tous les clients dans cette enchère
-            auction_data = get_auction(repo, aid)
+            # Delta compact vers la room (regroupé par fenêtre), sans relire l'enchère
             room_name = f'auction_{aid}'
+            snap = engine.snapshot(aid)
+            bids_count = snap["bids_count"] if snap else repo.count("bids", "auction_id", aid)
+            sampled(log, "bid_placed", room=room_name, price=res["current_price"])
             
-            print('\n' + '='*60)
-            print(f'📢 WEBSOCKET: Émission bid_placed vers la room: {room_name}')
-            print(f'💰 Prix actuel: {res["current_price"]} €')
-            print(f'🆔 Enchère ID: {aid}')
-            print('='*60 + '\n')
-            
-            socketio.emit('bid_placed', {
+            bid_events.submit(room_name, {
                 'auction_id': aid,
                 'current_price': res['current_price'],
                 'bid_id': res['bid_id'],
-                'auction': auction_data
-            }, room=room_name)
+                'bids_count': bids_count,
+                'leader': {'id': uid, 'username': view.username(uid) or 'Inconnu'},
+            })
             
             return res, 201
         except ValueError as e:
             return {"error": str(e)}, 400
+        except EngineUnavailable as e:
+            return {"error": str(e)}, 503, {"Retry-After": "5"}
 
     # --- Achats ---
     @app.get('/api/my/purchases')
     @jwt_required()
     def my_purchases():
         uid = get_jwt_identity()
-        users = repo.load("users").get("users", [])
-        products = repo.load("products").get("products", [])
-        user = next(u for u in users if u["id"] == uid)
-        ids = set(user.get("purchases", []))
-        return {"products": [p for p in products if p["id"] in ids]}
+        user = repo.get("users", uid)
+        if not user:
+            return {"error": "User not found"}, 404
+        ids = dict.fromkeys(user.get("purchases", []))
+        products = (repo.get("products", pid) for pid in ids)
+        return {"products": [p for p in products if p]}
+
+    @app.get('/api/my/auctions')
+    @jwt_required()
+    def my_auctions():
+        uid = get_jwt_identity()
+        auctions = owner_auctions(repo, uid)
+        return {"auctions": [{**a, **(engine.snapshot(a["id"]) or {})} for a in auctions]}
+
+    @app.get('/api/my/bids')
+    @jwt_required()
+    def my_bids():
+        """Enchères où l'utilisateur a misé (index user_id des mises, pas de parcours des enchères)"""
+        uid = get_jwt_identity()
+        auctions = bidder_auctions(repo, uid, pending=engine.pending_bids_of(uid))
+        return {"auctions": [{**a, **(engine.snapshot(a["id"]) or {})} for a in auctions]}
 
     # --- Docs Swagger ---
     @app.get("/openapi.yaml")
@@ -486,16 +682,12 @@ def create_app():
     # ------------------- WebSocket Events -------------------
     @socketio.on('connect')
     def handle_connect():
-        print('\n' + '='*60)
-        print(f'✅ WEBSOCKET: Client connecté - SID: {request.sid}')
-        print('='*60 + '\n')
+        sampled(log, "ws connect", sid=request.sid)
         emit('connected', {'message': 'Connected to auction server'})
 
     @socketio.on('disconnect')
     def handle_disconnect():
-        print('\n' + '='*60)
-        print(f'❌ WEBSOCKET: Client déconnecté - SID: {request.sid}')
-        print('='*60 + '\n')
+        sampled(log, "ws disconnect", sid=request.sid)
 
     @socketio.on('join_auction')
     def handle_join_auction(data):
@@ -503,10 +695,25 @@ def create_app():
         if auction_id:
             room_name = f'auction_{auction_id}'
             join_room(room_name)
-            print('\n' + '='*60)
-            print(f'🛋️ WEBSOCKET: Client {request.sid} a rejoint la room: {room_name}')
-            print('='*60 + '\n')
-            emit('joined_auction', {'auction_id': auction_id})
+            sampled(log, "ws join", sid=request.sid, room=room_name)
+            emit('joined_auction', {'auction_id': auction_id, 'seq': bid_events.seq(room_name),
+                                    'origin': bid_events.origin})
+
+    @socketio.on('resync')
+    def handle_resync(data):
+        """Le client a vu un trou dans les seq d'une origine : état complet de
+        l'enchère, et position de ce worker comme nouveau point de départ."""
+        auction_id = data.get('auction_id')
+        repo.refresh()
+        auction = get_auction(repo, auction_id, view) if auction_id else None
+        if not auction:
+            return
+        emit('auction_state', {
+            'auction_id': auction_id,
+            'seq': bid_events.seq(f'auction_{auction_id}'),
+            'origin': bid_events.origin,
+            'auction': {**auction, **(engine.snapshot(auction_id) or {})},
+        })
 
     @socketio.on('leave_auction')
     def handle_leave_auction(data):
@@ -514,9 +721,7 @@ def create_app():
         if auction_id:
             room_name = f'auction_{auction_id}'
             leave_room(room_name)
-            print('\n' + '='*60)
-            print(f'🚪 WEBSOCKET: Client {request.sid} a quitté la room: {room_name}')
-            print('='*60 + '\n')
+            sampled(log, "ws leave", sid=request.sid, room=room_name)
 
     return app, socketio
 
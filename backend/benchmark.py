@@ -0,0 +1,337 @@
+"""
+Benchmark reproductible des chemins chauds (mises et listes).
+
+Remplit un DB_DIR avec un jeu de données généré (graine fixe), pilote
+l'application en process via le client de test Flask (et, en option, des
+clients Socket.IO abonnés aux rooms), puis mesure débit et p50/p95/p99 de :
+
+- POST /api/auctions/<aid>/bids
+- GET  /api/auctions (avec filtres : statut, catégorie, recherche)
+- GET  /api/auctions/<aid>/bids
+
+Les résultats sont écrits en JSON pour comparer deux commits :
+
+    python benchmark.py --out before.json
+    git checkout autre-branche
+    python benchmark.py --out after.json --compare before.json
+
+--compare sort en erreur (code 1) si un p95 ou un débit se dégrade au-delà
+de --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+CATEGORIES = ["vehicule", "immobilier", "electronique", "art", "autre"]
+CONDITIONS = ["new", "used", "like-new", "excellent", "good", "fair"]
+WORDS = ["peugeot", "renault", "tableau", "huile", "appartement", "studio", "iphone",
+         "console", "vélo", "montre", "lampe", "canapé", "guitare", "piano", "livre", "vintage"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark des mises et des listes d'enchères")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--auctions", type=int, default=1000)
+    parser.add_argument("--bids", type=int, default=5000, help="mises déjà en base")
+    parser.add_argument("--requests", type=int, default=500, help="requêtes mesurées par scénario")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads clients par scénario")
+    parser.add_argument("--hot", type=int, default=20, help="enchères visées par les mises")
+    parser.add_argument("--sockets", type=int, default=0, help="clients Socket.IO abonnés aux enchères visées")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--accept-encoding", default="",
+                        help="Accept-Encoding des lectures (ex. gzip, br) ; vide : réponses non compressées")
+    parser.add_argument("--backend", choices=["yaml", "sqlite"], default=os.environ.get("DB_BACKEND", "yaml"))
+    parser.add_argument("--db-dir", help="DB_DIR à utiliser (rempli s'il est vide, réutilisé sinon)")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--compare", help="résultats JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="dégradation tolérée (0.25 = 25 %%)")
+    return parser.parse_args(argv)
+
+
+# ------------------- Jeu de données -------------------
+def seed(repo, rng: random.Random, n_users: int, n_products: int, n_auctions: int, n_bids: int):
+    """Écrit le jeu de données : un put groupé par document."""
+    from services.auth import hash_password
+    from services.ledger import to_cents
+
+    now = datetime.now(timezone.utc)
+    password_hash = hash_password("benchmark")  # un seul hachage, partagé
+    users = [{
+        "id": f"u_{i}", "email": f"user{i}@bench.test", "username": f"user{i}",
+        "password_hash": password_hash, "purchases": [],
+        "created_at": now.isoformat(),
+    } for i in range(1, n_users + 1)]
+
+    products = [{
+        "id": f"p_{i}", "owner_id": rng.choice(users)["id"],
+        "title": " ".join(rng.sample(WORDS, 2)).capitalize(),
+        "description": " ".join(rng.choice(WORDS) for _ in range(8)),
+        "category": rng.choice(CATEGORIES), "condition": rng.choice(CONDITIONS), "images": [],
+    } for i in range(1, n_products + 1)]
+
+    auctions = []
+    for i in range(1, n_auctions + 1):
+        status = rng.choices(["running", "scheduled", "closed"], weights=[7, 2, 1])[0]
+        start = now + (timedelta(days=1) if status == "scheduled" else -timedelta(hours=1))
+        end = now + (-timedelta(minutes=1) if status == "closed" else timedelta(days=2))
+        price = float(rng.randrange(10, 1000))
+        auctions.append({
+            "id": f"a_{i}", "product_id": rng.choice(products)["id"], "start_price": price,
+            "min_increment": 1.0, "start_at": start.isoformat(), "end_at": end.isoformat(),
+            "status": status, "current_price": price, "current_bid_id": None,
+        })
+
+    owners = {p["id"]: p["owner_id"] for p in products}
+    running = [a for a in auctions if a["status"] == "running"]
+    leaders = {}
+    bids = []
+    for i in range(1, (n_bids if running else 0) + 1):
+        a = rng.choice(running)
+        bidder = rng.choice(users)["id"]
+        if bidder == owners[a["product_id"]]:
+            continue
+        a["current_price"] += a["min_increment"]
+        a["current_bid_id"] = f"b_{i}"
+        leaders[a["id"]] = bidder
+        bids.append({"id": f"b_{i}", "auction_id": a["id"], "user_id": bidder,
+                     "amount": a["current_price"],
+                     "placed_at": (now - timedelta(seconds=n_bids - i)).isoformat()})
+    # Grand livre : un crédit par utilisateur, et le leader de chaque enchère
+    # a son montant bloqué, comme après de vraies mises
+    ledger = [{"id": f"l_{i}", "user_id": u["id"], "type": "credit", "cents": to_cents(1e12),
+               "at": now.isoformat()} for i, u in enumerate(users, 1)]
+    for a in running:
+        if a["id"] in leaders:
+            ledger.append({"id": f"l_{len(ledger) + 1}", "user_id": leaders[a["id"]], "type": "hold",
+                           "cents": to_cents(a["current_price"]), "auction_id": a["id"],
+                           "bid_id": a["current_bid_id"], "at": now.isoformat()})
+
+    for name, rows in (("users", users), ("products", products), ("auctions", auctions), ("bids", bids),
+                       ("ledger", ledger)):
+        if rows:
+            repo.put(name, *rows)
+
+
+# ------------------- Mesures -------------------
+def percentile(sorted_ms, p: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    k = (len(sorted_ms) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_ms) - 1)
+    return sorted_ms[lo] + (sorted_ms[hi] - sorted_ms[lo]) * (k - lo)
+
+
+def run_scenario(app, n: int, concurrency: int, make_request, expected: int):
+    """Exécute `make_request(client, i)` n fois ; renvoie les statistiques."""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker(indices):
+        client = app.test_client()
+        local, failed = [], 0
+        for i in indices:
+            start = time.perf_counter()
+            resp = make_request(client, i)
+            # Corps lu dans la mesure : les listes sont envoyées en streaming
+            resp.get_data()
+            local.append((time.perf_counter() - start) * 1000)
+            if resp.status_code != expected:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    chunks = [range(k, n, concurrency) for k in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, chunks))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": n,
+        "errors": errors[0],
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(n / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """Affiche l'écart avec la référence ; False si un scénario régresse."""
+    ok = True
+    print(f"\nComparaison avec {baseline['meta'].get('commit') or 'référence'} (tolérance {tolerance:.0%})")
+    for name, cur in results["scenarios"].items():
+        ref = baseline.get("scenarios", {}).get(name)
+        if not ref:
+            continue
+        p95 = cur["p95_ms"] / ref["p95_ms"] - 1 if ref["p95_ms"] else 0.0
+        rps = cur["throughput_rps"] / ref["throughput_rps"] - 1 if ref["throughput_rps"] else 0.0
+        worse = p95 > tolerance or rps < -tolerance
+        ok = ok and not worse
+        print(f"  {name:<14} p95 {p95:+.0%}  débit {rps:+.0%}  {'RÉGRESSION' if worse else 'ok'}")
+    return ok
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    # Configuration lue à l'import des services : à fixer avant
+    db_dir = Path(args.db_dir or tempfile.mkdtemp(prefix="auctionnet_bench_")).resolve()
+    db_dir.mkdir(parents=True, exist_ok=True)
+    os.environ["DB_DIR"] = str(db_dir)
+    os.environ["DB_BACKEND"] = args.backend
+    os.environ.setdefault("SQLITE_PATH", str(db_dir / "auctionnet.sqlite3"))
+    os.environ.setdefault("MEDIA_ROOT", str(db_dir / "media"))
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret-" + "x" * 32)
+    sys.path.insert(0, str(Path(__file__).parent))
+
+    from services.repo import make_repo, ensure_default_data
+
+    repo = make_repo()
+    ensure_default_data(repo)
+    seeded = not repo.load("auctions").get("auctions")
+    start = time.perf_counter()
+    if seeded:
+        seed(repo, rng, args.users, args.products, args.auctions, args.bids)
+    seed_seconds = time.perf_counter() - start
+    del repo
+
+    from flask_jwt_extended import create_access_token
+    import app as appmod
+
+    start = time.perf_counter()
+    app, socketio = appmod.create_app()
+    startup_seconds = time.perf_counter() - start
+    repo_view = appmod.make_repo()
+    auctions = repo_view.load("auctions").get("auctions", [])
+    users = [u["id"] for u in repo_view.load("users").get("users", [])]
+    owners = {p["id"]: p["owner_id"] for p in repo_view.load("products").get("products", [])}
+    running = [a for a in auctions if a["status"] == "running"]
+    if not running or len(users) < 2:
+        sys.exit("Jeu de données trop petit : il faut des enchères en cours et au moins deux utilisateurs")
+
+    engine = app.extensions["auction_engine"]
+    with app.app_context():
+        tokens = {u: create_access_token(identity=u) for u in users}
+
+    # ---------- Mises ----------
+    hot = rng.sample(running, min(args.hot, len(running)))
+    plan = []  # (auction_id, bidder) par requête, montants calculés à la volée
+    prices = {a["id"]: a["current_price"] for a in hot}
+    price_lock = threading.Lock()
+    for i in range(args.requests):
+        # La requête i part du thread i % concurrency : chaque enchère n'est visée
+        # que par un thread, sinon des montants croissants arriveraient dans le désordre
+        a = rng.choice(hot[i % args.concurrency::args.concurrency] or hot)
+        bidder = rng.choice([u for u in users if u != owners.get(a["product_id"])])
+        plan.append((a["id"], bidder))
+
+    clients = []
+    for i in range(args.sockets):
+        sc = socketio.test_client(app)
+        sc.emit("join_auction", {"auction_id": hot[i % len(hot)]["id"]})
+        sc.get_received()
+        clients.append(sc)
+
+    def bid(client, i):
+        aid, bidder = plan[i]
+        with price_lock:
+            prices[aid] += 1.0
+            amount = prices[aid]
+        return client.post(f"/api/auctions/{aid}/bids", json={"amount": amount},
+                           headers={"Authorization": f"Bearer {tokens[bidder]}"})
+
+    # ---------- Listes ----------
+    read_headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else {}
+    filters = [{}, {"status": "running"}, {"category": "art"},
+               {"status": "running", "category": "vehicule"}, {"search": "peug"},
+               {"search": "vintage", "status": "running"}, {"limit": 200}]
+
+    def list_auctions(client, i):
+        return client.get("/api/auctions", query_string=filters[i % len(filters)], headers=read_headers)
+
+    with_bids = [a["id"] for a in running if a.get("current_bid_id")] or [a["id"] for a in running]
+
+    def list_bids(client, i):
+        return client.get(f"/api/auctions/{with_bids[i % len(with_bids)]}/bids", query_string={"limit": 50},
+                          headers=read_headers)
+
+    scenarios = {}
+    for name, fn, expected in (("place_bid", bid, 201), ("list_auctions", list_auctions, 200),
+                               ("auction_bids", list_bids, 200)):
+        print(f"{name}...", flush=True)
+        scenarios[name] = run_scenario(app, args.requests, args.concurrency, fn, expected)
+        # Mises acceptées en mémoire : attendre leur écriture, sinon elle
+        # tourne pendant le scénario suivant et fausse ses latences
+        start = time.perf_counter()
+        engine.flush()
+        scenarios[name]["flush_seconds"] = round(time.perf_counter() - start, 4)
+
+    received = 0
+    if clients:
+        time.sleep(float(os.environ.get("BID_EVENT_WINDOW_MS", 100)) / 1000 * 3)
+        for sc in clients:
+            received += sum(1 for m in sc.get_received() if m["name"] == "bid_placed")
+            sc.disconnect()
+        scenarios["place_bid"]["socket_messages"] = received
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "bid_engine": appmod.BID_ENGINE,
+            "async_mode": appmod.ASYNC_MODE,
+            "db_dir": str(db_dir),
+            "seeded": seeded,
+            "params": {k: getattr(args, k) for k in
+                       ("users", "products", "auctions", "bids", "requests", "concurrency", "hot", "sockets", "seed",
+                        "accept_encoding")},
+            "seed_seconds": round(seed_seconds, 3),
+            "startup_seconds": round(startup_seconds, 3),
+        },
+        "scenarios": scenarios,
+    }
+    Path(args.out).write_text(json.dumps(results, indent=2))
+
+    print(f"\n{'scénario':<14} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+    for name, s in scenarios.items():
+        print(f"{name:<14} {s['throughput_rps']:>9} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['errors']:>8}")
+    print(f"\nRésultats : {args.out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,4 +29,21 @@ class AuctionCreateSchema(BaseModel):
 
 
 class BidSchema(BaseModel):
-    amount: float
\ No newline at end of file
+    amount: float
+
+
+# Import en masse (services.bulk) : mêmes règles que l'API, plus les champs
+# que la route déduit du contexte (propriétaire, crédit d'inscription).
+# `id` : identifiant dans le fichier importé, remplacé par un id du repo
+class UserImportSchema(RegisterSchema):
+    id: Optional[str] = None
+    balance: float = Field(default=100000.0, ge=0)
+
+
+class ProductImportSchema(ProductSchema):
+    id: Optional[str] = None
+    owner_id: str
+
+
+class AuctionImportSchema(AuctionCreateSchema):
+    id: Optional[str] = None
@@ -1,39 +1,119 @@
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from dateutil.parser import isoparse
-from typing import Optional
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+import time
+
+from services.ledger import entry, from_cents, to_cents
+from services.metrics import LOCK_WAIT_SECONDS, waited
+from services.pagination import DEFAULT_PAGE_SIZE, paginate
+
+log = logging.getLogger(__name__)
+
+# Nouvel essai d'un lot d'écriture en échec : attente doublée à chaque
+# échec, de WRITE_RETRY_MIN_S à WRITE_RETRY_MAX_S
+WRITE_RETRY_MIN_S = 0.05
+WRITE_RETRY_MAX_S = 5.0
+# Attente maximale de flush() : au-delà, l'écriture est considérée bloquée
+FLUSH_TIMEOUT_S = 10.0
 
 # All functions operate on YamlRepo injected from app
 
 def _now_utc():
     return datetime.now(timezone.utc)
 
-def _load_all(repo):
-    return (
-    repo.load("auctions"),
-    repo.load("bids"),
-    repo.load("users"),
-    repo.load("products")
-    )
+def _winner_username(repo, a):
+    # Ajouter le nom du gagnant si l'enchère est terminée
+    if not a.get("winner_id"):
+        return None
+    winner = repo.get("users", a["winner_id"])
+    if not winner:
+        return None
+    return winner.get("username", winner.get("email", "").split("@")[0])
 
 def product_is_owned_by(repo, product_id: str, user_id: str) -> bool:
-    products = repo.load("products").get("products", [])
-    p = next((x for x in products if x["id"] == product_id), None)
+    p = repo.get("products", product_id)
     return bool(p and p.get("owner_id") == user_id)
 
+def end_key(a):
+    # Tri stable : fin d'enchère (instant UTC, les offsets varient avec l'heure d'été) puis id
+    try:
+        ts = isoparse(a["end_at"]).timestamp()
+    except Exception:
+        ts = 0.0
+    return (ts, a["id"])
+
+def _start_key(a):
+    # Plus récentes d'abord : début d'enchère décroissant
+    try:
+        ts = isoparse(a["start_at"]).timestamp()
+    except Exception:
+        ts = 0.0
+    return (-ts, a["id"])
+
+# Tris de GET /api/auctions (?sort=) : clés croissantes, id en dernier pour
+# l'unicité du curseur. Le prix est celui écrit dans le repo
+SORTS = {
+    "ending": end_key,
+    "recent": _start_key,
+    "price_asc": lambda a: (float(a.get("current_price", 0)), a["id"]),
+    "price_desc": lambda a: (-float(a.get("current_price", 0)), a["id"]),
+}
+DEFAULT_SORT = "ending"
+
+
 def list_auctions(repo, status: Optional[str] = None,
                   category: Optional[str] = None,
                   search: Optional[str] = None,
-                  condition: Optional[str] = None):
-    auctions, bids, users, products = _load_all(repo)
-    auctions_list = auctions.get("auctions", [])
-    products_list = products.get("products", [])
-    users_list = users.get("users", [])
-    prod_map = {p["id"]: p for p in products_list}
-    user_map = {u["id"]: u for u in users_list}
-
-    out: List[Dict[str, Any]] = []
+                  condition: Optional[str] = None,
+                  limit: int = DEFAULT_PAGE_SIZE,
+                  cursor: Optional[str] = None,
+                  search_index=None,
+                  sort: Optional[str] = None,
+                  facets=None,
+                  view=None):
+    relevance = sort == "relevance"
+    if relevance or not sort:
+        sort = DEFAULT_SORT
+    elif sort not in SORTS:
+        raise ValueError("Invalid sort")
+    sort_key = SORTS[sort]
+    scores = None
+    if search and search_index is not None:
+        # Index plein texte : seuls les produits trouvés et leurs enchères sont lus
+        scores = search_index.search(search)
+
+    if facets is not None and (not search or scores is not None):
+        # Index de facettes : intersection d'ensembles d'ids, tri sur les clés
+        # de l'index ; seules les enchères de la page sont lues
+        within = facets.auctions_of(scores) if scores is not None else None
+        keys = facets.keys(facets.select(within, status=status, category=category, condition=condition), sort)
+        if scores is not None and relevance:
+            page = paginate(keys, lambda aid: (-scores[keys[aid][0]],) + keys[aid][1], limit, cursor)
+        else:
+            page = paginate(keys, lambda aid: keys[aid][1], limit, cursor)
+        if view is not None:
+            # Vue matérialisée : entrées déjà jointes, aucune lecture du repo
+            return {"auctions": view.entries(page["items"]), "next_cursor": page["next_cursor"]}
+        rows = [a for a in (repo.get("auctions", aid) for aid in page["items"]) if a]
+        return {"auctions": _with_products(repo, rows, {}), "next_cursor": page["next_cursor"]}
+
+    if scores is not None:
+        auctions_list = [a for pid in scores for a in repo.find("auctions", "product_id", pid)]
+    elif status:
+        # Index par statut : seules les enchères concernées sont lues
+        auctions_list = repo.find("auctions", "status", status)
+    else:
+        auctions_list = repo.load("auctions").get("auctions", [])
+    prod_map = {}
+
+    matched = []
     for a in auctions_list:
-        p = prod_map.get(a["product_id"])
+        if a["product_id"] not in prod_map:
+            prod_map[a["product_id"]] = repo.get("products", a["product_id"])
+        p = prod_map[a["product_id"]]
         if not p:
             continue
 
@@ -44,74 +124,91 @@ def list_auctions(repo, status: Optional[str] = None,
             continue
         if condition and p.get("condition") != condition:
             continue
-        if search:
+        if search and scores is None:
             s = search.lower()
             if s not in p.get("title", "").lower() and s not in p.get("description", "").lower():
                 continue
+        matched.append(a)
 
-        # Ajouter le nom du gagnant si l'enchère est terminée
-        winner_username = None
-        if a.get("winner_id"):
-            winner = user_map.get(a["winner_id"])
-            if winner:
-                winner_username = winner.get("username", winner.get("email", "").split("@")[0])
-
-        # ⚠️ NE PAS convertir les dates ici
-        out.append({**a, "product": p, "winner_username": winner_username})
+    if scores is not None and relevance:
+        page = paginate(matched, lambda a: (-scores[a["product_id"]],) + sort_key(a), limit, cursor)
+    else:
+        page = paginate(matched, sort_key, limit, cursor)
+    return {"auctions": _with_products(repo, page["items"], prod_map), "next_cursor": page["next_cursor"]}
 
-    return {"auctions": out}
 
+def _with_products(repo, rows, prod_map) -> List[Dict[str, Any]]:
+    # Produit et gagnant ne sont joints que pour la page renvoyée
+    out: List[Dict[str, Any]] = []
+    for a in rows:
+        if a["product_id"] not in prod_map:
+            prod_map[a["product_id"]] = repo.get("products", a["product_id"])
+        if not prod_map[a["product_id"]]:
+            continue
+        # ⚠️ NE PAS convertir les dates ici
+        out.append({**a, "product": prod_map[a["product_id"]], "winner_username": _winner_username(repo, a)})
+    return out
+
+
+def owner_auctions(repo, user_id: str) -> List[Dict[str, Any]]:
+    """Enchères des produits de `user_id` (index owner_id puis product_id)."""
+    rows = [a for p in repo.find("products", "owner_id", user_id)
+            for a in repo.find("auctions", "product_id", p["id"])]
+    rows.sort(key=end_key, reverse=True)
+    return _with_products(repo, rows, {})
+
+
+def bidder_auctions(repo, user_id: str, pending=()) -> List[Dict[str, Any]]:
+    """Enchères où `user_id` a misé, avec sa plus haute mise et son nombre de mises.
+
+    `pending` : mises acceptées par le moteur mais pas encore écrites.
+    """
+    bids = {b["id"]: b for b in repo.find("bids", "user_id", user_id)}
+    bids.update((b["id"], b) for b in pending if b["user_id"] == user_id)
+    mine: Dict[str, Dict[str, Any]] = {}
+    for b in bids.values():
+        m = mine.setdefault(b["auction_id"], {"my_bid": 0.0, "my_bids_count": 0})
+        m["my_bid"] = max(m["my_bid"], float(b["amount"]))
+        m["my_bids_count"] += 1
+    rows = [a for a in (repo.get("auctions", aid) for aid in mine) if a]
+    rows.sort(key=end_key, reverse=True)
+    return [{**a, **mine[a["id"]]} for a in _with_products(repo, rows, {})]
+
+
+def auction_facets(repo, facets, status: Optional[str] = None,
+                   category: Optional[str] = None,
+                   condition: Optional[str] = None,
+                   search: Optional[str] = None,
+                   search_index=None):
+    """Comptes par statut/catégorie/état pour la barre de filtres."""
+    within = None
+    if search and search_index is not None:
+        within = facets.auctions_of(search_index.search(search))
+    filters = {"status": status, "category": category, "condition": condition}
+    return {
+        "total": len(facets.select(within, **filters)),
+        "facets": facets.counts(within, **filters),
+    }
 
-    def match(a):
-        if status and a.get("status") != status:
-            return False
-        prod = products_map.get(a["product_id"]) or {}
-        if category and prod.get("category") != category:
-            return False
-        if search:
-            s = search.lower()
-            text = (prod.get("title", "") + " " + prod.get("description", "")).lower()
-            return s in text
-        return True
 
-    out = []
-    for a in auctions:
-        if not match(a):
-            continue
-        prod = products_map.get(a["product_id"], {})
-        out.append({**a, "product": prod})
-    return {"auctions": out}
-
-def get_auction(repo, auction_id: str):
-    auctions = repo.load("auctions").get("auctions", [])
-    bids = repo.load("bids").get("bids", [])
-    products = repo.load("products").get("products", [])
-    users = repo.load("users").get("users", [])
-    prod_map = {p["id"]: p for p in products}
-    user_map = {u["id"]: u for u in users}
-    a = next((x for x in auctions if x["id"] == auction_id), None)
+def get_auction(repo, auction_id: str, view=None):
+    if view is not None:
+        return view.get(auction_id)
+    a = repo.get("auctions", auction_id)
     if not a:
         return None
     
     # Compter le nombre d'enchères (bids) pour cette enchère
-    bids_count = len([b for b in bids if b["auction_id"] == auction_id])
+    bids_count = repo.count("bids", "auction_id", auction_id)
     
-    # Ajouter le nom du gagnant si l'enchère est terminée
-    winner_username = None
-    if a.get("winner_id"):
-        winner = user_map.get(a["winner_id"])
-        if winner:
-            winner_username = winner.get("username", winner.get("email", "").split("@")[0])
-    
-    return {**a, "product": prod_map.get(a["product_id"]), "bids_count": bids_count, "winner_username": winner_username}
+    return {**a, "product": repo.get("products", a["product_id"]), "bids_count": bids_count,
+            "winner_username": _winner_username(repo, a)}
 
 
 def create_auction(repo, payload):
-    doc = repo.load("auctions")
-    items = doc.get("auctions", [])
-    new_id = repo.next_id(doc, "auctions", prefix="a_")
+    new_id = repo.new_id("auctions", prefix="a_")
 
-    items.append({
+    repo.insert("auctions", {
         "id": new_id,
         "product_id": payload.product_id,
         "start_price": float(payload.start_price),
@@ -123,7 +220,6 @@ def create_auction(repo, payload):
         "current_bid_id": None,
     })
 
-    repo.save("auctions", {"auctions": items})
     return get_auction(repo, new_id)
 
 
@@ -148,100 +244,459 @@ def create_auction(repo, payload):
     repo.save("auctions", auctions_doc)
     return auction
     
-def _find_user(users, uid):
-    return next(u for u in users.get("users", []) if u["id"] == uid)
-
-def _find_bid(bids, bid_id):
-    return next((b for b in bids.get("bids", []) if b["id"] == bid_id), None)
-    
-def place_bid(repo, auction_id: str, user_id: str, amount: float):
-    auctions_doc, bids_doc, users_doc, products_doc = _load_all(repo)
-
-    auction = next(a for a in auctions_doc.get("auctions", []) if a["id"] == auction_id)
-
-    # status & time guards
-    now = _now_utc()
-    if auction["status"] != "running":
-        raise ValueError("Auction not running")
-    if isoparse(auction["end_at"]).astimezone(timezone.utc) <= now:
-        raise ValueError("Auction already ended")
-
-    if amount < auction["current_price"] + auction["min_increment"]:
-        raise ValueError("Bid too low")
-
-    # prevent self-bid
-    product = next(p for p in products_doc.get("products", []) if p["id"] == auction["product_id"])
-    if product.get("owner_id") == user_id:
-        raise ValueError("Owner cannot bid on own product")
-    
-    user = _find_user(users_doc, user_id)
-    available = user.get("balance", 0.0) - user.get("held", 0.0)
-    if amount > available:
-        raise ValueError("Insufficient funds (available < amount)")
-    
-    # Release previous leader hold
-    if auction.get("current_bid_id"):
-        old_bid = _find_bid(bids_doc, auction["current_bid_id"])
+def place_bid(repo, ledger, auction_id: str, user_id: str, amount: float):
+    # Verrou par enchère : les mises sur des enchères différentes restent
+    # parallèles, celles sur la même enchère sont sérialisées
+    with repo.transaction(f"auction:{auction_id}") as tx:
+        auction = tx.get("auctions", auction_id)
+        if not auction:
+            raise ValueError("Auction not found")
+
+        # status & time guards
+        now = _now_utc()
+        if auction["status"] != "running":
+            raise ValueError("Auction not running")
+        if isoparse(auction["end_at"]).astimezone(timezone.utc) <= now:
+            raise ValueError("Auction already ended")
+
+        if amount < auction["current_price"] + auction["min_increment"]:
+            raise ValueError("Bid too low")
+
+        # prevent self-bid
+        product = tx.get("products", auction["product_id"])
+        if product.get("owner_id") == user_id:
+            raise ValueError("Owner cannot bid on own product")
+
+        # Le solde de l'enchérisseur et celui de l'ancien leader peuvent
+        # bouger via d'autres enchères : on les verrouille avant de les lire
+        old_bid = tx.get("bids", auction["current_bid_id"]) if auction.get("current_bid_id") else None
+        tx.lock(f"user:{user_id}", *([f"user:{old_bid['user_id']}"] if old_bid else []))
+
+        wallet = ledger.totals(user_id)
+        if to_cents(amount) > wallet["balance"] - wallet["held"]:
+            raise ValueError("Insufficient funds (available < amount)")
+
+        # Create new bid
+        bid_id = repo.new_id("bids", prefix="b_")
+        tx.insert("bids", {
+            "id": bid_id,
+            "auction_id": auction_id,
+            "user_id": user_id,
+            "amount": float(amount),
+            "placed_at": now.isoformat()
+            })
+
+        # Libérer le blocage de l'ancien leader, bloquer le nouveau
+        entries = []
         if old_bid:
-            old_user = _find_user(users_doc, old_bid["user_id"])
-            old_user["held"] = float(old_user.get("held", 0.0)) - float(old_bid["amount"])
-
-    # Create new bid
-    bid_id = repo.next_id(bids_doc, "bids", prefix="b_")
-    new_bid = {
-        "id": bid_id,
-        "auction_id": auction_id,
-        "user_id": user_id,
-        "amount": float(amount),
-        "placed_at": now.isoformat()
-        }
-    bids_doc.setdefault("bids", []).append(new_bid)
-
-    # Reserve funds for new leader
-    user["held"] = float(user.get("held", 0.0)) + float(amount)
-
-    auction["current_price"] = float(amount)
-    auction["current_bid_id"] = bid_id
-
-    repo.save("bids", bids_doc)
-    repo.save("users", users_doc)
-    repo.save("auctions", auctions_doc)
+            entries.append(entry(repo, "release", old_bid["user_id"], to_cents(old_bid["amount"]),
+                                 auction_id=auction_id, bid_id=old_bid["id"]))
+        entries.append(entry(repo, "hold", user_id, to_cents(amount), auction_id=auction_id, bid_id=bid_id))
+        tx.insert("ledger", *entries)
+
+        auction["current_price"] = float(amount)
+        auction["current_bid_id"] = bid_id
+        tx.put("auctions", auction)
 
     return {"ok": True, "bid_id": bid_id, "current_price": auction["current_price"]}
 
 def open_auction_if_due(repo, auction_id: str):
-    auctions_doc = repo.load("auctions")
-    auction = next((a for a in auctions_doc.get("auctions", []) if a["id"] == auction_id), None)
-    if not auction:
-        return
-    if auction["status"] != "scheduled":
-        return
-    if isoparse(auction["start_at"]).astimezone(timezone.utc) <= _now_utc():
-        auction["status"] = "running"
-        repo.save("auctions", auctions_doc)
+    with repo.transaction(f"auction:{auction_id}") as tx:
+        auction = tx.get("auctions", auction_id)
+        if not auction:
+            return
+        if auction["status"] != "scheduled":
+            return
+        if isoparse(auction["start_at"]).astimezone(timezone.utc) <= _now_utc():
+            auction["status"] = "running"
+            tx.put("auctions", auction)
+            return auction
 
 def close_auction_if_due(repo, auction_id: str):
-    auctions_doc, bids_doc, users_doc, products_doc = _load_all(repo)
-    a = next((x for x in auctions_doc.get("auctions", []) if x["id"] == auction_id), None)
-    if not a:
-        return
-    if a["status"] == "closed":
-        return
-    if isoparse(a["end_at"]).astimezone(timezone.utc) <= _now_utc():
-        a["status"] = "closed"
-        if a.get("current_bid_id"):
-            win = next(b for b in bids_doc.get("bids", []) if b["id"] == a["current_bid_id"])
-            buyer = next(u for u in users_doc.get("users", []) if u["id"] == win["user_id"])
-            # Débiter le compte et ajouter l'achat
-            buyer["held"] = float(buyer.get("held", 0.0)) - float(win["amount"])
-            buyer["balance"] = float(buyer.get("balance", 0.0)) - float(win["amount"])
+    closed = close_due_auctions(repo, [auction_id])
+    return closed[0] if closed else None
+
+def close_due_auctions(repo, auction_ids: Optional[List[str]] = None):
+    """Clôture d'un bloc toutes les enchères échues parmi `auction_ids`
+    (toutes les enchères non clôturées si None).
+
+    Une seule transaction : chaque gagnant est débité et chaque vendeur
+    crédité une fois même s'il est concerné par plusieurs enchères, et
+    chaque document n'est écrit qu'une fois. Renvoie les enchères clôturées.
+    """
+    if auction_ids is None:
+        auction_ids = [a["id"] for st in ("scheduled", "running") for a in repo.find("auctions", "status", st)]
+    if not auction_ids:
+        return []
+    now = _now_utc()
+    with repo.transaction(*(f"auction:{aid}" for aid in auction_ids)) as tx:
+        due, wins = [], []
+        for aid in auction_ids:
+            a = tx.get("auctions", aid)
+            if not a or a["status"] == "closed":
+                continue
+            if isoparse(a["end_at"]).astimezone(timezone.utc) > now:
+                continue
+            if a.get("current_bid_id"):
+                win = tx.get("bids", a["current_bid_id"])
+                product = tx.get("products", a["product_id"])
+                if not win or not product or not tx.get("users", win["user_id"]):
+                    # Données incohérentes : ni règlement ni clôture pour
+                    # cette enchère, le reste du lot est clôturé
+                    log.error("clôture de %s impossible : mise %s, produit %s ou gagnant introuvable",
+                              aid, a["current_bid_id"], a["product_id"])
+                    continue
+                wins.append((a, win, product))
+            due.append(a)
+        if not due:
+            return []
+
+        # Verrous utilisateurs en un seul appel (ordre auction -> user)
+        tx.lock(*{f"user:{u}" for _, win, product in wins for u in (win["user_id"], product["owner_id"])})
+        buyers, entries = {}, []
+        for a, win, product in wins:
+            cents = to_cents(win["amount"])
+            # Débiter le gagnant (montant bloqué), créditer le vendeur
+            entries.append(entry(repo, "settle", win["user_id"], cents, auction_id=a["id"], bid_id=win["id"]))
+            entries.append(entry(repo, "credit", product["owner_id"], cents, auction_id=a["id"], reason="sale"))
+            buyer = buyers.get(win["user_id"]) or tx.get("users", win["user_id"])
             buyer.setdefault("purchases", []).append(a["product_id"])
-            # Ajouter le montant au compte du vendeur
-            product = next(p for p in products_doc.get("products", []) if p["id"] == a["product_id"])
-            seller = next(u for u in users_doc.get("users", []) if u["id"] == product["owner_id"])
-            seller["balance"] = float(seller.get("balance", 0.0)) + float(win["amount"])
+            buyers[buyer["id"]] = buyer
             # Ajouter le winner_id à l'enchère
             a["winner_id"] = win["user_id"]
-        # Save
-        repo.save("users", users_doc)
-        repo.save("auctions", auctions_doc)
\ No newline at end of file
+        for a in due:
+            a["status"] = "closed"
+        tx.put("auctions", *due)
+        if buyers:
+            tx.put("users", *buyers.values())
+        if entries:
+            tx.insert("ledger", *entries)
+    return due
+
+def credit_user(repo, ledger, user_id: str, amount: float):
+    """Crédite le solde ; renvoie (ancien solde, nouveau solde)."""
+    with repo.transaction(f"user:{user_id}") as tx:
+        if not tx.get("users", user_id):
+            raise ValueError("User not found")
+        previous = ledger.totals(user_id)["balance"]
+        tx.insert("ledger", entry(repo, "credit", user_id, to_cents(amount)))
+    return from_cents(previous), from_cents(previous + to_cents(amount))
+
+
+class EngineUnavailable(Exception):
+    """Le moteur n'arrive plus à écrire ses lots : nouvelles mises et
+    crédits refusés jusqu'à ce qu'une écriture réussisse."""
+
+
+class AuctionEngine:
+    """Moteur d'enchères en mémoire : un carnet par enchère en cours.
+
+    Prix courant, leader, montant bloqué et nombre de mises vivent en mémoire
+    sous un verrou par enchère, les soldes (centimes, chargés depuis le grand
+    livre) sous un verrou par utilisateur. Une mise acceptée est persistée en
+    arrière-plan par un thread d'écriture qui regroupe les mises et leurs
+    écritures du grand livre dans une seule transaction repo.
+
+    L'état mémoire fait foi pour ce process : avec plusieurs workers
+    partageant la base, désactiver le moteur (enabled=False) pour revenir
+    à place_bid() transactionnel.
+    """
+
+    def __init__(self, repo, ledger, enabled: bool = True, batch_size: int = 256):
+        self.repo = repo
+        self.ledger = ledger
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self._books = {}
+        self._wallets = {}
+        self._locks = {}
+        self._meta_lock = threading.Lock()
+        # File d'écriture : opérations numérotées, flush() attend un numéro
+        self._pending = []
+        self._unwritten = {}  # auction_id -> mises acceptées pas encore écrites
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._persisted = 0
+        self._changed_at = 0.0
+        self._writer = None
+        # Dernière erreur d'écriture, tant que le lot en tête n'est pas écrit
+        self.failure: Optional[Exception] = None
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._meta_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _book(self, auction_id: str):
+        # Appelé sous le verrou de l'enchère ; seules les enchères en cours
+        # sont gardées en mémoire (l'ouverture n'a donc pas à nous prévenir)
+        book = self._books.get(auction_id)
+        if book is None:
+            a = self.repo.get("auctions", auction_id)
+            if not a:
+                raise ValueError("Auction not found")
+            if a["status"] != "running":
+                raise ValueError("Auction not running")
+            product = self.repo.get("products", a["product_id"]) or {}
+            leader = self.repo.get("bids", a["current_bid_id"]) if a.get("current_bid_id") else None
+            book = self._books[auction_id] = {
+                "end_at": isoparse(a["end_at"]).astimezone(timezone.utc),
+                "owner_id": product.get("owner_id"),
+                "min_increment": float(a["min_increment"]),
+                "current_price": float(a["current_price"]),
+                "leader_id": leader["user_id"] if leader else None,
+                "leader_bid_id": a.get("current_bid_id"),
+                "bids_count": self.repo.count("bids", "auction_id", auction_id),
+                "changed_at": 0.0,
+            }
+        return book
+
+    def _wallet(self, user_id: str):
+        # Appelé sous le verrou de l'utilisateur
+        wallet = self._wallets.get(user_id)
+        if wallet is None:
+            if not self.repo.get("users", user_id):
+                raise ValueError("User not found")
+            wallet = self._wallets[user_id] = self.ledger.totals(user_id)
+        return wallet
+
+    @contextmanager
+    def _users(self, *user_ids):
+        locks = [self._lock(f"user:{u}") for u in sorted(set(user_ids) - {None})]
+        for lock in locks:
+            with LOCK_WAIT_SECONDS.time(lock="engine:user"):
+                lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def place_bid(self, auction_id: str, user_id: str, amount: float):
+        if not self.enabled:
+            return place_bid(self.repo, self.ledger, auction_id, user_id, amount)
+
+        self._check_writer()
+        amount = float(amount)
+        cents = to_cents(amount)
+        with waited(self._lock(f"auction:{auction_id}"), "engine:auction"):
+            book = self._book(auction_id)
+            now = _now_utc()
+            if book["end_at"] <= now:
+                raise ValueError("Auction already ended")
+            if amount < book["current_price"] + book["min_increment"]:
+                raise ValueError("Bid too low")
+            if book["owner_id"] == user_id:
+                raise ValueError("Owner cannot bid on own product")
+
+            leader_id = book["leader_id"]
+            with self._users(user_id, leader_id):
+                wallet = self._wallet(user_id)
+                if cents > wallet["balance"] - wallet["held"]:
+                    raise ValueError("Insufficient funds (available < amount)")
+                # Libérer le blocage de l'ancien leader, bloquer le nouveau
+                bid_id = self.repo.new_id("bids", prefix="b_")
+                entries = []
+                if leader_id:
+                    released = to_cents(book["current_price"])
+                    self._wallet(leader_id)["held"] -= released
+                    entries.append(entry(self.repo, "release", leader_id, released,
+                                         auction_id=auction_id, bid_id=book["leader_bid_id"]))
+                wallet["held"] += cents
+                entries.append(entry(self.repo, "hold", user_id, cents, auction_id=auction_id, bid_id=bid_id))
+
+            bid = {
+                "id": bid_id,
+                "auction_id": auction_id,
+                "user_id": user_id,
+                "amount": amount,
+                "placed_at": now.isoformat()
+            }
+            book.update(current_price=amount, leader_id=user_id, leader_bid_id=bid_id,
+                        bids_count=book["bids_count"] + 1, changed_at=time.time())
+            self._enqueue({"bid": bid, "entries": entries})
+
+        return {"ok": True, "bid_id": bid_id, "current_price": amount}
+
+    def credit(self, user_id: str, amount: float):
+        """Crédite le solde ; renvoie (ancien solde, nouveau solde)."""
+        if not self.enabled:
+            return credit_user(self.repo, self.ledger, user_id, amount)
+        self._check_writer()
+        with self._users(user_id):
+            wallet = self._wallet(user_id)
+            previous = wallet["balance"]
+            wallet["balance"] += to_cents(amount)
+            self._enqueue({"entries": [entry(self.repo, "credit", user_id, to_cents(amount))]})
+            return from_cents(previous), from_cents(wallet["balance"])
+
+    @contextmanager
+    def exclusive(self, *auction_ids: str):
+        """Bloque les mises sur les enchères, persiste ce qui est en attente et
+        oublie leurs carnets : le repo est à jour pour ces enchères dans le bloc."""
+        if not self.enabled:
+            yield
+            return
+        # Ordre trié : deux appels concurrents ne peuvent pas s'interbloquer
+        locks = [self._lock(f"auction:{aid}") for aid in sorted(set(auction_ids))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            self.flush()
+            for aid in auction_ids:
+                self._books.pop(aid, None)
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def settle(self, auction_id: str):
+        closed = self.settle_many([auction_id])
+        return closed[0] if closed else None
+
+    def settle_many(self, auction_ids):
+        """Clôture d'un bloc les enchères échues et répercute le règlement
+        sur les soldes en mémoire. Renvoie les enchères clôturées."""
+        with self.exclusive(*auction_ids):
+            closed = close_due_auctions(self.repo, list(auction_ids))
+            if not self.enabled:
+                return closed
+            for a in closed:
+                if not a.get("winner_id"):
+                    continue
+                amount = to_cents(a["current_price"])
+                seller_id = (self.repo.get("products", a["product_id"]) or {}).get("owner_id")
+                with self._users(a["winner_id"], seller_id):
+                    buyer = self._wallets.get(a["winner_id"])
+                    if buyer:
+                        buyer["held"] -= amount
+                        buyer["balance"] -= amount
+                    seller = self._wallets.get(seller_id)
+                    if seller:
+                        seller["balance"] += amount
+            return closed
+
+    def snapshot(self, auction_id: str):
+        """Champs vivants d'une enchère en mémoire (ou None)."""
+        with self._lock(f"auction:{auction_id}"):
+            book = self._books.get(auction_id)
+            if not book:
+                return None
+            return {"current_price": book["current_price"], "current_bid_id": book["leader_bid_id"],
+                    "bids_count": book["bids_count"]}
+
+    def version(self, auction_id: str):
+        """(nombre de mises, heure de la dernière) d'une enchère en mémoire,
+        ou None : change à chaque mise acceptée, avant même son écriture."""
+        with self._lock(f"auction:{auction_id}"):
+            book = self._books.get(auction_id)
+            return (book["bids_count"], book["changed_at"]) if book else None
+
+    def revision(self):
+        """(opérations acceptées, heure de la dernière) pour tout le moteur :
+        change à chaque mise ou crédit, avant même son écriture."""
+        with self._cond:
+            return self._enqueued, self._changed_at
+
+    def wallet(self, user_id: str):
+        """{"balance", "held"} en centimes si ce compte est en mémoire, sinon None."""
+        with self._users(user_id):
+            wallet = self._wallets.get(user_id)
+            return dict(wallet) if wallet else None
+
+    # ---------- Persistance asynchrone ----------
+    def pending_bids(self, auction_id: str):
+        with self._cond:
+            return list(self._unwritten.get(auction_id, ()))
+
+    def pending_bids_of(self, user_id: str):
+        """Mises de `user_id` acceptées mais pas encore écrites, toutes enchères confondues."""
+        with self._cond:
+            return [b for bids in self._unwritten.values() for b in bids if b["user_id"] == user_id]
+
+    def _enqueue(self, op):
+        with self._cond:
+            if "bid" in op:
+                self._unwritten.setdefault(op["bid"]["auction_id"], []).append(op["bid"])
+            self._pending.append(op)
+            self._enqueued += 1
+            self._changed_at = time.time()
+            self._cond.notify_all()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="auction-engine-writer", daemon=True)
+                self._writer.start()
+
+    def flush(self, timeout: Optional[float] = None):
+        """Attend que toutes les opérations déjà acceptées soient écrites.
+        EngineUnavailable si elles ne le sont pas au bout de timeout secondes
+        (FLUSH_TIMEOUT_S par défaut) : l'écriture échoue en boucle."""
+        timeout = FLUSH_TIMEOUT_S if timeout is None else timeout
+        with self._cond:
+            target = self._enqueued
+            if not self._cond.wait_for(lambda: self._persisted >= target, timeout):
+                raise EngineUnavailable(f"Bid engine cannot persist: {self.failure or 'write timed out'}")
+
+    def _check_writer(self):
+        # Une mise acceptée doit pouvoir être écrite : pas de nouvelles
+        # opérations en mémoire tant que l'écriture échoue
+        if self.failure is not None:
+            raise EngineUnavailable(f"Bid engine cannot persist: {self.failure}")
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                ops = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+            # Le lot n'est jamais abandonné : il est réessayé jusqu'à ce
+            # qu'il passe (disque plein, base verrouillée...)
+            delay = WRITE_RETRY_MIN_S
+            while True:
+                try:
+                    self._persist(ops, retry=self.failure is not None)
+                    break
+                except Exception as e:
+                    if self.failure is None:
+                        log.exception("écriture du moteur d'enchères en échec (%d opérations), nouvel essai", len(ops))
+                    self.failure = e
+                    time.sleep(delay)
+                    delay = min(delay * 2, WRITE_RETRY_MAX_S)
+            if self.failure is not None:
+                log.warning("écriture du moteur d'enchères rétablie")
+                self.failure = None
+            with self._cond:
+                for op in ops:
+                    if "bid" in op:
+                        unwritten = self._unwritten[op["bid"]["auction_id"]]
+                        unwritten.remove(op["bid"])
+                        if not unwritten:
+                            del self._unwritten[op["bid"]["auction_id"]]
+                self._persisted += len(ops)
+                self._cond.notify_all()
+
+    def _persist(self, ops, retry: bool = False):
+        # Un lot = une transaction : dernier état par enchère, toutes les
+        # nouvelles mises et écritures du grand livre (ajouts seuls).
+        # retry : un essai précédent a pu écrire une partie des lignes ; leurs
+        # ids viennent de new_id, une ligne existante est donc la nôtre
+        bids, leaders, entries = [], {}, []
+        for op in ops:
+            if "bid" in op:
+                bids.append(op["bid"])
+                leaders[op["bid"]["auction_id"]] = op["bid"]
+            entries.extend(op["entries"])
+
+        with self.repo.transaction(*(f"auction:{aid}" for aid in leaders)) as tx:
+            for aid, bid in leaders.items():
+                a = tx.get("auctions", aid)
+                a["current_price"] = bid["amount"]
+                a["current_bid_id"] = bid["id"]
+                tx.put("auctions", a)
+            # Réessai : mêmes lignes, identiques, réécrites à leur place
+            write = tx.put if retry else tx.insert
+            if entries:
+                write("ledger", *entries)
+            if bids:
+                write("bids", *bids)
@@ -1,12 +1,134 @@
+"""Mots de passe et connexion.
+
+- KDF configurable (PASSWORD_METHOD, au format werkzeug : "scrypt",
+  "scrypt:16384:8:1", "pbkdf2:sha256:600000"...). Un hash produit avec
+  d'autres paramètres reste valide ; il est recalculé avec les paramètres
+  courants à la connexion suivante (needs_rehash) ;
+- le calcul, volontairement lent, tourne dans un pool de PASSWORD_WORKERS
+  processus : une rafale de connexions occupe ces processus, pas les
+  threads/greenlets qui servent les enchères. 0 : pool de threads du hub
+  (offload), hashlib relâchant le GIL pendant le calcul ;
+- LoginThrottle borne les tentatives par email et par IP sur une fenêtre
+  glissante : au-delà, 429 sans aucun calcul de hash.
+"""
+from collections import OrderedDict, deque
+import functools
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, List, Optional, Tuple
+
 from werkzeug.security import generate_password_hash, check_password_hash as _check
 
+from services.metrics import LOGIN_THROTTLED, PASSWORD_SECONDS
+from services.serving import offload
+
+PASSWORD_METHOD = os.environ.get("PASSWORD_METHOD", "scrypt")
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", min(2, os.cpu_count() or 1)))
+
+LOGIN_WINDOW_S = int(os.environ.get("LOGIN_WINDOW_S", 300))
+LOGIN_MAX_PER_EMAIL = int(os.environ.get("LOGIN_MAX_PER_EMAIL", 5))
+LOGIN_MAX_PER_IP = int(os.environ.get("LOGIN_MAX_PER_IP", 100))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> Optional[ProcessPoolExecutor]:
+    # Créé au premier appel : dans le worker gunicorn, après le fork.
+    # spawn : un fork d'un process qui a des threads (ou un hub gevent) n'est pas sûr
+    global _pool
+    if PASSWORD_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _run(op: str, fn, *args):
+    with PASSWORD_SECONDS.time(op=op):
+        pool = _executor()
+        if pool is None:
+            return offload(fn, *args)
+        return pool.submit(fn, *args).result()
+
 
 def hash_password(password: str) -> str:
-    return generate_password_hash(password)
+    return _run("hash", generate_password_hash, password, PASSWORD_METHOD)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """hash_password sur un lot (import en masse) : réparti sur tout le pool."""
+    with PASSWORD_SECONDS.time(op="hash_batch"):
+        pool = _executor()
+        if pool is None:
+            return [offload(generate_password_hash, p, PASSWORD_METHOD) for p in passwords]
+        return list(pool.map(generate_password_hash, passwords, itertools.repeat(PASSWORD_METHOD)))
 
 def check_password(password: str, hashed: str) -> bool:
-    return _check(hashed, password)
+    return _run("check", _check, hashed, password)
+
+@functools.lru_cache(maxsize=None)
+def _method_prefix(method: str) -> str:
+    # Paramètres complets tels que werkzeug les écrit ("scrypt" -> "scrypt:32768:8:1")
+    return generate_password_hash("", method, salt_length=1).split("$", 1)[0]
+
+def needs_rehash(hashed: str) -> bool:
+    """Vrai si `hashed` n'a pas été produit avec PASSWORD_METHOD."""
+    return hashed.split("$", 1)[0] != _method_prefix(PASSWORD_METHOD)
+
+def ensure_user_uniqueness(repo, email: str):
+    if repo.count("users", "email", email):
+        raise ValueError("Email already registered")
+
+
+class LoginThrottle:
+    """Tentatives de connexion par email et par IP sur LOGIN_WINDOW_S secondes.
+
+    Une tentative est comptée avant la vérification du mot de passe : des
+    requêtes simultanées ne passent pas toutes entre le contrôle et l'échec.
+    Une connexion réussie remet à zéro le compteur de l'email. En mémoire,
+    par worker ; au plus `maxsize` clés (les plus anciennes oubliées)."""
+
+    def __init__(self, per_email: int = LOGIN_MAX_PER_EMAIL, per_ip: int = LOGIN_MAX_PER_IP,
+                 window: float = LOGIN_WINDOW_S, maxsize: int = 100_000):
+        self.limits = {"email": per_email, "ip": per_ip}
+        self.window = window
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # (portée, valeur) -> instants des dernières tentatives (au plus la limite)
+        self._attempts: "OrderedDict[Tuple[str, str], Deque[float]]" = OrderedDict()
+
+    def attempt(self, email: str, ip: str) -> int:
+        """Compte une tentative ; renvoie 0 si elle est permise, sinon les
+        secondes à attendre (la tentative refusée n'est pas comptée)."""
+        now = time.monotonic()
+        keys = [("email", email.lower()), ("ip", ip or "")]
+        with self._lock:
+            for key in keys:
+                seen = self._attempts.get(key)
+                if seen is None:
+                    continue
+                while seen and seen[0] <= now - self.window:
+                    seen.popleft()
+                if len(seen) >= self.limits[key[0]]:
+                    LOGIN_THROTTLED.inc(scope=key[0])
+                    return max(1, math.ceil(seen[0] + self.window - now))
+            for key in keys:
+                seen = self._attempts.get(key)
+                if seen is None:
+                    seen = self._attempts[key] = deque(maxlen=self.limits[key[0]])
+                seen.append(now)
+                self._attempts.move_to_end(key)
+            while len(self._attempts) > self.maxsize:
+                self._attempts.popitem(last=False)
+        return 0
 
-def ensure_user_uniqueness(users_doc, email: str):
-    if any(u["email"] == email for u in users_doc.get("users", [])):
-        raise ValueError("Email already registered")
\ No newline at end of file
+    def succeeded(self, email: str):
+        with self._lock:
+            self._attempts.pop(("email", email.lower()), None)
@@ -0,0 +1,330 @@
+"""Import / export en masse des utilisateurs, produits et enchères.
+
+L'API crée une ligne par requête (products.yaml réécrit à chaque produit,
+recalage et planification à chaque enchère). Ici les fichiers CSV ou
+JSON-lines sont lus au fil de l'eau, par lots de --batch lignes :
+
+- chaque ligne est validée par le schéma pydantic de la route équivalente
+  (models.schemas) ; une ligne invalide est signalée (fichier:ligne) et
+  écartée, le reste du lot est importé ;
+- un lot = une transaction : chaque document est écrit une fois par lot ;
+- le solde d'un utilisateur importé est une écriture credit du grand livre,
+  les mots de passe d'un lot sont hachés ensemble dans le pool de
+  services.auth ;
+- la colonne `id` sert de référence entre les fichiers d'un même import
+  (produit -> owner_id, enchère -> product_id) ; les lignes reçoivent des
+  ids neufs du repo. Une référence absente du fichier désigne une ligne
+  déjà en base ;
+- le statut des enchères (scheduled / running) est fixé à l'import ; au
+  démarrage, l'application planifie toutes les enchères en un seul lot
+  (LifecycleScheduler.load) et règle celles déjà échues.
+
+À lancer application arrêtée : les index en mémoire d'un serveur en marche
+(recherche, facettes, planificateur) ne verraient pas ces écritures.
+
+    python -m services.bulk import --users users.csv --products products.jsonl --auctions auctions.csv
+    python -m services.bulk export bids --format csv --out bids.csv
+"""
+import argparse
+import csv
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from dateutil.parser import isoparse
+from pydantic import ValidationError
+
+from models.schemas import AuctionImportSchema, ProductImportSchema, UserImportSchema
+from services.auth import hash_passwords
+from services.ledger import Ledger, entry, from_cents, to_cents
+
+# Heure locale des enchères, comme dans app.py
+LOCAL_TZ = ZoneInfo(os.environ.get("APP_TZ", "Europe/Paris"))
+
+# YAML : le document entier est réécrit à chaque lot, de gros lots en
+# réduisent le nombre (quelques Mo de lignes en mémoire au plus)
+BATCH_ROWS = 5000
+FORMATS = ("csv", "jsonl")
+# CSV : une liste (images, purchases) tient dans une cellule, éléments séparés par "|"
+LIST_SEP = "|"
+LIST_FIELDS = {"images", "purchases"}
+
+# Colonnes de l'export CSV (JSON-lines : lignes complètes), ordre d'import
+COLUMNS = {
+    "users": ("id", "email", "username", "balance", "held", "created_at"),
+    "products": ("id", "owner_id", "title", "description", "category", "condition", "images"),
+    "auctions": ("id", "product_id", "start_price", "min_increment", "start_at", "end_at",
+                 "status", "current_price", "current_bid_id", "winner_id"),
+    "bids": ("id", "auction_id", "user_id", "amount", "placed_at"),
+    "ledger": ("id", "user_id", "type", "cents", "auction_id", "bid_id", "reason", "at"),
+}
+IMPORTABLE = ("users", "products", "auctions")
+# Jamais exportés
+PRIVATE_FIELDS = {"password_hash"}
+
+
+def _format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    ext = Path(path).suffix.lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"{path}: format inconnu, préciser --format csv|jsonl")
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _reason(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+    return str(exc)
+
+
+class Importer:
+    """Import par lots ; garde entre les fichiers les correspondances
+    id du fichier -> id du repo et les compteurs (importées, rejetées)."""
+
+    def __init__(self, repo, batch: int = BATCH_ROWS, dry_run: bool = False, errors=sys.stderr):
+        self.repo = repo
+        self.batch = batch
+        self.dry_run = dry_run
+        self.errors = errors
+        self.ids: Dict[str, Dict[str, str]] = {kind: {} for kind in IMPORTABLE}
+        self.stats: Dict[str, List[int]] = {}
+        self._emails = set()
+        self._placeholders = 0
+
+    def run(self, kind: str, path: str, fmt: Optional[str] = None) -> List[int]:
+        prepare, write = {
+            "users": (self._user, self._write_users),
+            "products": (self._product, self._write),
+            "auctions": (self._auction, self._write),
+        }[kind]
+        stats = self.stats.setdefault(kind, [0, 0])
+        f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            for chunk in _chunks(self._rows(path, f, _format(path, fmt), stats), self.batch):
+                rows = []
+                for where, raw in chunk:
+                    try:
+                        rows.append(prepare(raw))
+                    except ValueError as e:
+                        self._reject(stats, where, _reason(e))
+                if rows and not self.dry_run:
+                    write(kind, rows)
+                stats[0] += len(rows)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        return stats
+
+    def _reject(self, stats, where: str, reason: str):
+        stats[1] += 1
+        print(f"{where}: {reason}", file=self.errors)
+
+    def _rows(self, path: str, f, fmt: str, stats) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(position, ligne) au fil de la lecture. Cellule CSV vide : champ
+        absent (valeur par défaut du schéma)."""
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                row = {k: v for k, v in row.items() if k and v not in ("", None)}
+                for k in LIST_FIELDS & row.keys():
+                    row[k] = row[k].split(LIST_SEP)
+                yield f"{path}:{reader.line_num}", row
+            return
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                self._reject(stats, f"{path}:{n}", f"JSON invalide ({e})")
+                continue
+            if not isinstance(row, dict):
+                self._reject(stats, f"{path}:{n}", "objet JSON attendu")
+                continue
+            yield f"{path}:{n}", row
+
+    def _map(self, kind: str, ref: Optional[str], prefix: str) -> str:
+        if self.dry_run:
+            # new_id réserve ses ids dans la base : ids provisoires, locaux
+            self._placeholders += 1
+            new_id = f"{prefix}dry-run-{self._placeholders}"
+        else:
+            new_id = self.repo.new_id(kind, prefix=prefix)
+        if ref:
+            self.ids[kind][ref] = new_id
+        return new_id
+
+    def _resolve(self, kind: str, ref: str) -> str:
+        if ref in self.ids[kind]:
+            return self.ids[kind][ref]
+        if self.repo.get(kind, ref):
+            self.ids[kind][ref] = ref
+            return ref
+        raise ValueError(f"{ref} introuvable ({kind})")
+
+    # ---------- Lignes ----------
+    def _user(self, raw) -> Dict[str, Any]:
+        payload = UserImportSchema(**raw)
+        if payload.email in self._emails or self.repo.count("users", "email", payload.email):
+            raise ValueError("Email already registered")
+        self._emails.add(payload.email)
+        return {
+            "id": self._map("users", payload.id, "u_"),
+            "email": payload.email,
+            "username": payload.email.split("@")[0],
+            "password": payload.password,     # haché par lot à l'écriture
+            "balance": payload.balance,
+        }
+
+    def _product(self, raw) -> Dict[str, Any]:
+        payload = ProductImportSchema(**raw)
+        owner_id = self._resolve("users", payload.owner_id)
+        return {
+            "id": self._map("products", payload.id, "p_"),
+            "owner_id": owner_id,
+            "title": payload.title,
+            "description": payload.description,
+            "category": payload.category,
+            "condition": payload.condition,
+            "images": payload.images,
+        }
+
+    def _auction(self, raw) -> Dict[str, Any]:
+        payload = AuctionImportSchema(**raw)
+        product_id = self._resolve("products", payload.product_id)
+        # Mêmes règles que POST /api/auctions : sans offset = heure locale,
+        # enregistrée en heure locale avec offset
+        try:
+            s_in, e_in = isoparse(payload.start_at), isoparse(payload.end_at)
+        except Exception:
+            raise ValueError("Invalid datetime format. Use ISO-8601.")
+        s_local = s_in.replace(tzinfo=LOCAL_TZ) if s_in.tzinfo is None else s_in.astimezone(LOCAL_TZ)
+        e_local = e_in.replace(tzinfo=LOCAL_TZ) if e_in.tzinfo is None else e_in.astimezone(LOCAL_TZ)
+        if e_local <= s_local:
+            raise ValueError("end_at must be after start_at")
+        now = datetime.now(timezone.utc)
+        return {
+            "id": self._map("auctions", payload.id, "a_"),
+            "product_id": product_id,
+            "start_price": float(payload.start_price),
+            "min_increment": float(payload.min_increment),
+            "start_at": s_local.isoformat(),
+            "end_at": e_local.isoformat(),
+            # Échue : reste scheduled, réglée par le planificateur au démarrage
+            "status": "running" if s_local <= now < e_local else "scheduled",
+            "current_price": float(payload.start_price),
+            "current_bid_id": None,
+        }
+
+    # ---------- Écriture : une transaction par lot ----------
+    def _write(self, kind: str, rows: List[Dict[str, Any]]):
+        with self.repo.transaction() as tx:
+            tx.insert(kind, *rows)
+
+    def _write_users(self, kind: str, rows: List[Dict[str, Any]]):
+        hashes = hash_passwords([u.pop("password") for u in rows])
+        created_at = datetime.now(timezone.utc).isoformat()
+        credits = []
+        for u, password_hash in zip(rows, hashes):
+            cents = to_cents(u.pop("balance"))
+            u.update(password_hash=password_hash, purchases=[], created_at=created_at)
+            if cents:
+                credits.append(entry(self.repo, "credit", u["id"], cents, reason="import"))
+        # Verrou sur les emails, comme l'inscription
+        with self.repo.transaction(*(f"email:{u['email']}" for u in rows)) as tx:
+            tx.insert("users", *rows)
+            if credits:
+                tx.insert("ledger", *credits)
+
+
+# ---------- Export ----------
+def export_rows(repo, kind: str) -> Iterator[Dict[str, Any]]:
+    """Lignes du document `kind` telles qu'exportées : sans champ privé,
+    utilisateurs avec solde et bloqué du grand livre (en unités)."""
+    accounts = Ledger(repo).accounts() if kind == "users" else None
+    for row in repo.load(kind).get(kind, []):
+        row = {k: v for k, v in row.items() if k not in PRIVATE_FIELDS}
+        if accounts is not None and "balance" not in row:
+            balance, held = accounts.get(row["id"], (0, 0))
+            row["balance"], row["held"] = from_cents(balance), from_cents(held)
+        yield row
+
+
+def export(repo, kind: str, out, fmt: str = "jsonl") -> int:
+    """Écrit le document `kind` ligne à ligne dans `out` ; renvoie le nombre de lignes."""
+    n = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, COLUMNS[kind], extrasaction="ignore")
+        writer.writeheader()
+        for row in export_rows(repo, kind):
+            writer.writerow({k: LIST_SEP.join(map(str, v)) if isinstance(v, list) else v
+                             for k, v in row.items()})
+            n += 1
+    else:
+        for row in export_rows(repo, kind):
+            out.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            n += 1
+    return n
+
+
+if __name__ == "__main__":
+    from services.repo import ensure_default_data, make_repo
+
+    parser = argparse.ArgumentParser(description="Import / export en masse")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="Importer des fichiers CSV ou JSON-lines (application arrêtée)")
+    for kind in IMPORTABLE:
+        imp.add_argument(f"--{kind}", metavar="FICHIER", help="'-' : entrée standard (avec --format)")
+    imp.add_argument("--format", choices=FORMATS, help="par défaut : d'après l'extension")
+    imp.add_argument("--batch", type=int, default=BATCH_ROWS, help="lignes par transaction")
+    imp.add_argument("--dry-run", action="store_true", help="valider sans rien écrire")
+    exp = sub.add_parser("export", help="Exporter un document ligne à ligne")
+    exp.add_argument("kind", choices=list(COLUMNS))
+    exp.add_argument("--format", choices=FORMATS, default="jsonl")
+    exp.add_argument("--out", default="-", help="fichier (défaut : sortie standard)")
+    args = parser.parse_args()
+
+    repo = make_repo()
+    if args.cmd == "export":
+        out = sys.stdout if args.out == "-" else open(args.out, "w", newline="", encoding="utf-8")
+        try:
+            n = export(repo, args.kind, out, args.format)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"{args.kind}: {n} ligne(s)", file=sys.stderr)
+    else:
+        paths = {kind: getattr(args, kind) for kind in IMPORTABLE if getattr(args, kind)}
+        if not paths:
+            parser.error("au moins un de --users, --products, --auctions")
+        try:
+            for path in paths.values():
+                _format(path, args.format)
+        except ValueError as e:
+            parser.error(str(e))
+        if not args.dry_run:
+            ensure_default_data(repo)
+        importer = Importer(repo, batch=args.batch, dry_run=args.dry_run)
+        # Utilisateurs, puis produits, puis enchères : les références se suivent
+        for kind, path in paths.items():
+            done, rejected = importer.run(kind, path, args.format)
+            print(f"{kind}: {done} importée(s), {rejected} rejetée(s)", file=sys.stderr)
+        sys.exit(1 if any(rejected for _, rejected in importer.stats.values()) else 0)
@@ -0,0 +1,137 @@
+"""Diffusion des événements temps réel (bid_placed, auction_closed, ...).
+
+Deux backends, choisis par EVENTS_URL :
+
+- vide (défaut) : en process, `socketio.emit` ne touche que les clients
+  connectés à ce worker ;
+- redis://, rediss:// ou unix:///chemin/redis.sock : chaque publication
+  passe par le broker (pub/sub Redis ou serveur compatible) et chaque
+  worker la relaie à ses propres clients. Plusieurs workers derrière nginx
+  livrent ainsi chaque mise à toutes les rooms.
+
+Un autre schéma (amqp://, ...) passe par kombu, s'il est installé.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import socketio as sio
+
+from services.metrics import EVENTS_EMITTED
+
+EVENTS_URL = os.environ.get("EVENTS_URL", "")
+EVENTS_CHANNEL = os.environ.get("EVENTS_CHANNEL", "auctionnet")
+
+_REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+
+
+def client_manager(url: str = EVENTS_URL, write_only: bool = False):
+    """Gestionnaire de clients Socket.IO pour `url` (None = en process)."""
+    if not url:
+        return None
+    if url.startswith(_REDIS_SCHEMES):
+        return sio.RedisManager(url, channel=EVENTS_CHANNEL, write_only=write_only)
+    return sio.KombuManager(url, channel=EVENTS_CHANNEL, write_only=write_only)
+
+
+def socketio_options(url: str = EVENTS_URL) -> Dict[str, Any]:
+    """Options à passer à SocketIO(app, ...) pour le backend choisi."""
+    manager = client_manager(url)
+    return {"client_manager": manager} if manager else {}
+
+
+class EventBus:
+    """Publie un événement vers une room (ou tous les clients si room=None)."""
+
+    def __init__(self, socketio=None, url: str = EVENTS_URL):
+        self.socketio = socketio
+        self.backend = "broker" if url else "local"
+        # Sans serveur Socket.IO (script, CLI) : publication seule via le broker
+        self._publisher = client_manager(url, write_only=True) if socketio is None else None
+
+    def publish(self, event: str, data: Dict[str, Any], room: Optional[str] = None):
+        EVENTS_EMITTED.inc(event=event)
+        if self.socketio is not None:
+            self.socketio.emit(event, data, to=room)
+        elif self._publisher is not None:
+            self._publisher.emit(event, data, namespace="/", room=room)
+
+
+class Coalescer:
+    """Regroupe les événements d'une room sur une fenêtre de `window` secondes.
+
+    Le premier événement d'une room part tout de suite ; ceux qui arrivent
+    pendant la fenêtre sont fusionnés et seul le dernier état part à la fin
+    de la fenêtre. Une rafale de 50 mises en 100 ms donne donc deux messages.
+
+    Chaque message porte `seq`, compteur par room des messages réellement
+    envoyés par ce process, et `origin`, l'identifiant du process : avec
+    plusieurs workers derrière un broker, chacun numérote ses messages et le
+    client suit les seq par origine. Un trou pour une même origine signifie
+    un message perdu (reconnexion) et déclenche une resynchronisation,
+    jamais un simple regroupement. `newer(a, b)` choisit l'état à garder
+    entre deux en attente.
+    """
+
+    def __init__(self, bus: EventBus, event: str, window: float = 0.1,
+                 newer=lambda old, new: new):
+        self.bus = bus
+        self.event = event
+        self.window = window
+        self.newer = newer
+        # Unique par process et par démarrage : un worker relancé repart à 1
+        # sous une nouvelle origine, sans faux trou chez les clients
+        self.origin = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Dict[str, Any]] = {}   # room -> dernier état
+        self._open_until: Dict[str, float] = {}         # room -> fin de fenêtre
+        self._seq: Dict[str, int] = {}
+        self._thread = threading.Thread(target=self._loop, name=f"coalesce-{event}", daemon=True)
+        self._thread.start()
+
+    def seq(self, room: str) -> int:
+        with self._cond:
+            return self._seq.get(room, 0)
+
+    def submit(self, room: str, data: Dict[str, Any]):
+        now = time.monotonic()
+        with self._cond:
+            if self._open_until.get(room, 0.0) > now:
+                old = self._pending.get(room)
+                self._pending[room] = data if old is None else self.newer(old, data)
+                return
+            self._open_until[room] = now + self.window
+            self._cond.notify()
+            message = self._stamp(room, data)
+        self.bus.publish(self.event, message, room=room)
+
+    def _stamp(self, room: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Appelé sous self._cond
+        self._seq[room] = self._seq.get(room, 0) + 1
+        return {**data, "seq": self._seq[room], "origin": self.origin}
+
+    def _loop(self):
+        while True:
+            out = []
+            with self._cond:
+                now = time.monotonic()
+                for room, until in list(self._open_until.items()):
+                    if until > now:
+                        continue
+                    data = self._pending.pop(room, None)
+                    if data is None:
+                        del self._open_until[room]
+                    else:
+                        # Fin de fenêtre avec un état en attente : il part,
+                        # et une nouvelle fenêtre commence
+                        self._open_until[room] = now + self.window
+                        out.append((room, self._stamp(room, data)))
+                if not out:
+                    delay = min(self._open_until.values(), default=now + 1.0) - now
+                    self._cond.wait(max(delay, 0.001))
+                    continue
+            for room, message in out:
+                self.bus.publish(self.event, message, room=room)
@@ -0,0 +1,118 @@
+"""Index de facettes des enchères : statut, catégorie et état du produit.
+
+Pour chaque facette, valeur -> ensemble d'ids d'enchères. Filtrer revient
+à intersecter des ensembles, et les comptes par valeur (« 12 enchères en
+cours dans art ») s'obtiennent sans relire les documents.
+
+Construit au démarrage puis tenu à jour par `repo.add_listener` : toute
+écriture d'enchère ou de produit y est répercutée, celles des autres
+process dès que `repo.refresh()` les découvre.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+FACETS = ("status", "category", "condition")
+
+
+class FacetIndex:
+    def __init__(self, sort_keys: Dict[str, Callable[[Dict[str, Any]], Tuple]]):
+        self._lock = threading.Lock()
+        self._sort_keys = sort_keys
+        self._sets: Dict[str, Dict[Any, Set[str]]] = {f: {} for f in FACETS}
+        self._values: Dict[str, Dict[str, Any]] = {}    # auction_id -> {facette: valeur}
+        self._keys: Dict[str, Dict[str, Tuple]] = {}    # auction_id -> {tri: clé}
+        self._product_of: Dict[str, str] = {}           # auction_id -> product_id
+        self._by_product: Dict[str, Set[str]] = {}      # product_id -> auction_ids
+        self._products: Dict[str, Dict[str, Any]] = {}  # product_id -> {category, condition}
+
+    @classmethod
+    def from_repo(cls, repo, sort_keys) -> "FacetIndex":
+        index = cls(sort_keys)
+        index.apply({
+            "products": {p["id"]: p for p in repo.load("products").get("products", [])},
+            "auctions": {a["id"]: a for a in repo.load("auctions").get("auctions", [])},
+        }, {})
+        repo.add_listener(index.apply)
+        return index
+
+    # ---------- Mise à jour ----------
+    def apply(self, puts, deletes):
+        """Listener du repo : répercute les écritures d'enchères/produits."""
+        with self._lock:
+            for p in puts.get("products", {}).values():
+                self._products[p["id"]] = {"category": p.get("category"), "condition": p.get("condition")}
+                for aid in list(self._by_product.get(p["id"], ())):
+                    self._file(aid, self._values[aid]["status"])
+            for a in puts.get("auctions", {}).values():
+                self._product_of[a["id"]] = a["product_id"]
+                self._by_product.setdefault(a["product_id"], set()).add(a["id"])
+                self._keys[a["id"]] = {name: key(a) for name, key in self._sort_keys.items()}
+                self._file(a["id"], a.get("status"))
+            for aid in deletes.get("auctions", ()):
+                self._unfile(aid)
+                pid = self._product_of.pop(aid, None)
+                self._keys.pop(aid, None)
+                if pid is not None:
+                    self._by_product.get(pid, set()).discard(aid)
+
+    def _file(self, aid: str, status):
+        self._unfile(aid)
+        prod = self._products.get(self._product_of[aid], {})
+        values = {"status": status, "category": prod.get("category"), "condition": prod.get("condition")}
+        for f, v in values.items():
+            self._sets[f].setdefault(v, set()).add(aid)
+        self._values[aid] = values
+
+    def _unfile(self, aid: str):
+        for f, v in self._values.pop(aid, {}).items():
+            ids = self._sets[f].get(v)
+            if ids is not None:
+                ids.discard(aid)
+                if not ids:
+                    del self._sets[f][v]
+
+    # ---------- Lecture ----------
+    def _match(self, filters: Dict[str, Any], skip: Optional[str] = None) -> Optional[Set[str]]:
+        # None = aucun filtre (toutes les enchères)
+        ids = None
+        for f in sorted((f for f in FACETS if filters.get(f) and f != skip),
+                        key=lambda f: len(self._sets[f].get(filters[f], ()))):
+            ids = set(self._sets[f].get(filters[f], ())) if ids is None else ids & self._sets[f].get(filters[f], set())
+        return ids
+
+    def select(self, within: Optional[Set[str]] = None, **filters) -> Set[str]:
+        """Ids des enchères qui passent tous les filtres (et `within` s'il est donné)."""
+        with self._lock:
+            ids = self._match(filters)
+            if ids is None:
+                ids = set(self._values)
+            return ids & within if within is not None else ids
+
+    def counts(self, within: Optional[Set[str]] = None, **filters) -> Dict[str, Dict[str, int]]:
+        """Comptes par valeur pour chaque facette.
+
+        Chaque facette est comptée avec les autres filtres appliqués (pas le
+        sien), comme une barre de filtres : changer de catégorie montre
+        combien d'enchères on obtiendrait.
+        """
+        out = {}
+        with self._lock:
+            for f in FACETS:
+                base = self._match(filters, skip=f)
+                if within is not None:
+                    base = within if base is None else base & within
+                out[f] = {}
+                for v, ids in self._sets[f].items():
+                    n = len(ids) if base is None else len(ids & base)
+                    if n and v is not None:
+                        out[f][v] = n
+        return out
+
+    def auctions_of(self, product_ids) -> Set[str]:
+        with self._lock:
+            return {aid for pid in product_ids for aid in self._by_product.get(pid, ())}
+
+    def keys(self, auction_ids, sort: str) -> Dict[str, Tuple[str, Tuple]]:
+        """auction_id -> (product_id, clé du tri `sort`), pour trier sans lire les documents."""
+        with self._lock:
+            return {aid: (self._product_of[aid], self._keys[aid][sort]) for aid in auction_ids if aid in self._keys}
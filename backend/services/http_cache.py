@@ -0,0 +1,204 @@
+"""Requêtes conditionnelles et cache des réponses des endpoints de lecture.
+
+Le frontend interroge en boucle les mêmes lectures (liste, détail, mises,
+catégories). Chaque endpoint fournit une version bon marché de ce qu'il
+renverrait (`repo.version`, `ListingView.version`, `AuctionEngine.version`) :
+
+- ETag fort (version + jeton du process + encodage) et Last-Modified ; un
+  client qui renvoie l'ETag (If-None-Match) ou une date à jour
+  (If-Modified-Since) reçoit un 304 sans que le corps de l'endpoint ne
+  soit exécuté ;
+- sinon le corps déjà sérialisé et compressé pour (route, query string,
+  ETag) est resservi depuis un LRU de HTTP_CACHE_SIZE entrées (0 : désactivé).
+
+Compression négociée sur Accept-Encoding : br si le paquet `brotli` est
+installé, sinon gzip ; les corps de moins de COMPRESS_MIN_BYTES partent
+tels quels. Les listes (`stream=`) sont encodées élément par élément et
+envoyées au fil de l'eau : ni chaîne JSON complète en mémoire avant le
+premier octet, ni attente de la sérialisation de toute la page.
+
+Comme la vue et les index, les versions suivent les écritures de ce
+process et celles des autres rattrapées par `repo.refresh()`. Le jeton
+change à chaque démarrage et diffère d'un worker à l'autre : un ETag émis
+ailleurs n'est jamais reconnu (200 complet).
+
+Last-Modified est à la seconde : il n'est envoyé, et If-Modified-Since
+n'est honoré, que pour une version antérieure à la seconde en cours. Un
+deuxième changement dans la même seconde ne donne donc jamais de 304 périmé.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+import functools
+import itertools
+import os
+import secrets
+import threading
+import time
+import zlib
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, current_app, request
+
+from services.metrics import HTTP_CACHE
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+HTTP_CACHE_SIZE = int(os.environ.get("HTTP_CACHE_SIZE", 256))
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+
+ENCODINGS = ("br", "gzip") if HAS_BROTLI else ("gzip",)
+# Niveaux rapides : un corps est compressé à chaque nouvelle version
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Taille des morceaux envoyés (et passés au compresseur) en streaming
+CHUNK_BYTES = 16 * 1024
+
+# Distingue les ETags de ce process de ceux d'un autre worker ou d'un redémarrage
+_TOKEN = secrets.token_hex(4)
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = HTTP_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # (route, query, etag) -> (corps, Content-Encoding)
+        self._bodies: "OrderedDict[Tuple, Tuple[bytes, Optional[str]]]" = OrderedDict()
+
+    def serve(self, version: Tuple, modified: float, render: Callable[[], Any],
+              stream: Optional[str] = None) -> Response:
+        """Réponse de `render()` (dict, ou (dict, status)) pour `version`.
+
+        `modified` : heure (epoch) du dernier changement de cette version.
+        `stream` : clé de la liste à envoyer élément par élément.
+        Seules les réponses 200 sont mises en cache."""
+        route = request.url_rule.rule if request.url_rule else request.path
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        # Un ETag par représentation : gzip et identité n'ont pas les mêmes octets
+        etag = "-".join([_TOKEN] + [str(v) for v in version] + ([encoding] if encoding else []))
+        if _not_modified(etag, modified):
+            HTTP_CACHE.inc(route=route, result="not_modified")
+            return _headers(Response(status=304), etag, modified)
+
+        key = (request.path, request.query_string, etag)
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached is not None:
+                self._bodies.move_to_end(key)
+        if cached is not None:
+            HTTP_CACHE.inc(route=route, result="hit")
+            return _headers(_response(*cached), etag, modified)
+
+        HTTP_CACHE.inc(route=route, result="miss")
+        out = render()
+        status = 200
+        if isinstance(out, tuple):
+            out, status = out
+        if status != 200:
+            response = current_app.json.response(out)
+            response.status_code = status
+            return response
+
+        dumps = functools.partial(current_app.json.dumps, separators=(",", ":"))
+        if stream:
+            chunks = _json_chunks(dumps, out, stream)
+            head = []
+            for chunk in chunks:
+                head.append(chunk)
+                if sum(map(len, head)) >= COMPRESS_MIN_BYTES:
+                    break
+            else:
+                # Corps entier déjà produit et trop petit : envoyé tel quel
+                body = b"".join(self._store(key, head, None))
+                return _headers(_response(body, None), etag, modified)
+            chunks = self._store(key, _compress(itertools.chain(head, chunks), encoding), encoding)
+            return _headers(_response(chunks, encoding), etag, modified)
+
+        body = dumps(out).encode()
+        if len(body) < COMPRESS_MIN_BYTES:
+            # ETag de la représentation négociée, corps laissé tel quel
+            encoding = None
+        body = b"".join(self._store(key, _compress([body], encoding), encoding))
+        return _headers(_response(body, encoding), etag, modified)
+
+    def _store(self, key, chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+        # Mis en cache seulement si le corps a été produit en entier
+        # (client déconnecté en cours de streaming : rien n'est gardé)
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        if self.maxsize > 0:
+            with self._lock:
+                self._bodies[key] = (b"".join(parts), encoding)
+                self._bodies.move_to_end(key)
+                while len(self._bodies) > self.maxsize:
+                    self._bodies.popitem(last=False)
+
+
+def _json_chunks(dumps: Callable[[Any], str], obj: dict, key: str) -> Iterator[bytes]:
+    """JSON de `obj` par morceaux d'environ CHUNK_BYTES, éléments de
+    obj[key] sérialisés un à un (la liste est émise en premier)."""
+    rest = dumps({k: v for k, v in obj.items() if k != key})
+    buf = [f'{{{dumps(key)}:[']
+    size = 0
+    for i, item in enumerate(obj[key]):
+        piece = ("," if i else "") + dumps(item)
+        buf.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buf).encode()
+            buf, size = [], 0
+    buf.append("]" + ("," + rest[1:] if rest != "{}" else "}"))
+    yield "".join(buf).encode()
+
+
+def _compress(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == "br":
+        comp = brotli.Compressor(quality=BROTLI_QUALITY)
+        feed, finish = comp.process, comp.finish
+    else:
+        comp = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # en-tête gzip
+        feed, finish = comp.compress, comp.flush
+    for chunk in chunks:
+        out = feed(chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+def _response(body, encoding: Optional[str]) -> Response:
+    response = Response(body, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _not_modified(etag: str, modified: float) -> bool:
+    # If-None-Match prime sur If-Modified-Since (RFC 9110 §13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since: Optional[datetime] = request.if_modified_since
+    return since is not None and _settled(modified) and int(modified) <= since.timestamp()
+
+
+def _settled(modified: float) -> bool:
+    # Seconde de `modified` écoulée : plus aucun changement ne peut porter
+    # la même date à la seconde
+    return int(modified) < int(time.time())
+
+
+def _headers(response: Response, etag: str, modified: float) -> Response:
+    response.set_etag(etag)
+    if _settled(modified):
+        response.last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+    # Le navigateur garde la réponse mais revalide à chaque appel (polling)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
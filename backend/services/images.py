@@ -0,0 +1,309 @@
+"""Images produit : stockage par empreinte et variantes redimensionnées.
+
+- le fichier téléversé est écrit sur disque au fil de la lecture du corps
+  (Upload), puis renommé `<sha256 tronqué><ext>` : le même fichier
+  téléversé deux fois pour un produit n'est stocké (et listé) qu'une fois ;
+- un pool de fond décode l'image une seule fois puis produit, pour chaque
+  largeur de IMAGE_WIDTHS plus petite que l'original, une variante WebP
+  `<nom>@<largeur>.webp` et une variante au format d'origine (clients sans
+  WebP), chacune réduite depuis la précédente ;
+- `/media/<pid>/<fichier>?size=<px>` sert la plus petite variante d'au moins
+  `px` de large, l'original tant qu'elle n'existe pas ; les noms dérivés de
+  l'empreinte servent d'ETag fort.
+
+Pillow est optionnel : sans lui, seuls l'empreinte et l'original sont gérés.
+Variantes des images existantes : `python -m services.images variants`.
+"""
+import argparse
+import hashlib
+import logging
+import mimetypes
+import os
+from pathlib import Path
+import re
+import tempfile
+import threading
+from typing import Optional, Set, Tuple
+from urllib.parse import quote
+
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from werkzeug.security import safe_join
+
+from services.metrics import IMAGE_SECONDS
+from services.serving import blocking, worker_pool
+
+try:
+    from PIL import Image, ImageOps
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+log = logging.getLogger(__name__)
+
+IMAGE_WIDTHS = tuple(sorted(int(w) for w in os.environ.get("IMAGE_WIDTHS", "160,480,1200").split(",")))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+# Préfixe d'une location nginx `internal` qui sert MEDIA_ROOT (vide : Flask envoie le fichier)
+MEDIA_ACCEL_REDIRECT = os.environ.get("MEDIA_ACCEL_REDIRECT", "")
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+# Format Pillow de la variante « d'origine » (None : le WebP suffit)
+_FALLBACK = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": None}
+# Assez d'octets pour reconnaître JPEG, PNG et WebP (RIFF....WEBP)
+_SNIFF_BYTES = 12
+# <empreinte>.<ext> ou <empreinte>@<largeur>.<ext>
+_HASHED = re.compile(r"^[0-9a-f]{32}(@\d+)?\.[a-z]+$")
+
+
+class ImagePipeline:
+    def __init__(self, media_root: Path, workers: int = IMAGE_WORKERS):
+        self.media_root = Path(media_root)
+        self._pool = worker_pool(workers, "images") if HAS_PIL else None
+        self._pending: Set[Path] = set()
+        self._pending_lock = threading.Condition()
+
+    # ---------- Import ----------
+    def receive(self, pid: str, max_bytes: int) -> "Upload":
+        """Réceptacle d'un fichier téléversé pour le produit `pid` (voir Upload)."""
+        return Upload(self.media_root / pid, max_bytes)
+
+    def commit(self, upload: "Upload") -> str:
+        """Publie un fichier reçu sous son empreinte ; renvoie le nom stocké.
+        Un contenu déjà présent n'est ni réécrit ni retraité."""
+        name, created = self._publish(upload)
+        if created:
+            self.schedule(Path(upload.path).parent / name)
+        return name
+
+    @blocking
+    def _publish(self, upload: "Upload") -> Tuple[str, bool]:
+        ext = upload.finish()
+        name = f"{upload.hexdigest()[:32]}{ext}"
+        path = Path(upload.path).parent / name
+        if path.exists():
+            os.unlink(upload.path)
+            return name, False
+        os.replace(upload.path, path)
+        return name, True
+
+    def schedule(self, path: Path):
+        """Variantes de `path` en arrière-plan (sans effet sans Pillow)."""
+        if self._pool is None:
+            return
+        with self._pending_lock:
+            self._pending.add(path)
+        self._pool.submit(self._run, path)
+
+    def _run(self, path: Path):
+        try:
+            make_variants(path)
+        except Exception:
+            log.exception("variantes de %s impossibles", path)
+        finally:
+            with self._pending_lock:
+                self._pending.discard(path)
+                self._pending_lock.notify_all()
+
+    def join(self):
+        """Attend la fin des variantes en cours."""
+        with self._pending_lock:
+            self._pending_lock.wait_for(lambda: not self._pending)
+
+    # ---------- Lecture ----------
+    def resolve(self, pid: str, filename: str, size: Optional[int], webp: bool) -> Tuple[str, str]:
+        """(fichier à servir, état) pour une demande `?size=` :
+        "variant" trouvée, "pending" en cours de calcul, "original" sinon."""
+        width = next((w for w in IMAGE_WIDTHS if size and w >= size), None)
+        if width is None:
+            return filename, "original"
+        stem, ext = os.path.splitext(filename)
+        candidates = [f"{stem}@{width}.webp"] if webp else []
+        if _FALLBACK.get(ext.lower()):
+            candidates.append(f"{stem}@{width}{ext}")
+        base = str(self.media_root / pid)
+        for name in candidates:
+            path = safe_join(base, name)
+            if path and os.path.isfile(path):
+                return name, "variant"
+        with self._pending_lock:
+            pending = (self.media_root / pid / filename) in self._pending
+        return filename, "pending" if pending else "original"
+
+    def serve(self, pid: str, name: str, max_age: int) -> Response:
+        """Réponse pour le fichier `name` du produit `pid` (404 s'il n'existe pas).
+
+        Avec MEDIA_ACCEL_REDIRECT, seuls les en-têtes partent d'ici : nginx
+        envoie le fichier lui-même. Sinon send_file : Range/If-Range (206),
+        requêtes conditionnelles (304) et wsgi.file_wrapper (sendfile) quand
+        le serveur en fournit un."""
+        path = safe_join(str(self.media_root / pid), name)
+        # Les fichiers cachés sont des téléversements ou variantes en cours d'écriture
+        if path is None or name.startswith(".") or not os.path.isfile(path):
+            raise NotFound()
+        etag = content_etag(name)
+        if not MEDIA_ACCEL_REDIRECT:
+            return send_file(path, max_age=max_age, etag=etag or True, conditional=True)
+
+        response = Response(mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream")
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if etag:
+            response.set_etag(etag)
+            if request.if_none_match.contains(etag):
+                response.status_code = 304
+                return response
+        response.headers["X-Accel-Redirect"] = f"{MEDIA_ACCEL_REDIRECT.rstrip('/')}/{quote(pid)}/{quote(name, safe='@')}"
+        return response
+
+
+class UnsupportedImage(Exception):
+    """Contenu téléversé qui n'est ni JPEG, ni PNG, ni WebP.
+    (Pas une ValueError : le parseur multipart de werkzeug les ignore.)"""
+
+
+class Upload:
+    """Fichier en cours de réception, utilisé comme stream_factory du parseur
+    multipart : chaque morceau lu sur la socket est écrit dans un fichier
+    temporaire du dossier produit et haché aussitôt. La taille est bornée
+    au fil de l'eau (413) et le type reconnu sur les premiers octets, sans
+    croire le nom ni le Content-Type du client : un contenu refusé
+    interrompt la lecture du corps."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        self._file = os.fdopen(fd, "w+b")
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.ext: Optional[str] = None
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge()
+        if self.ext is None and len(self._head) < _SNIFF_BYTES:
+            self._head += data[:_SNIFF_BYTES - len(self._head)]
+            if len(self._head) == _SNIFF_BYTES:
+                self._identify()
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def _identify(self):
+        self.ext = sniff(self._head)
+        if self.ext is None:
+            raise UnsupportedImage()
+
+    # Le parseur rembobine le fichier et l'enveloppe dans un FileStorage
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+    def finish(self) -> str:
+        """Ferme le fichier reçu ; renvoie son extension (type reconnu)."""
+        if self.ext is None:
+            self._identify()    # fichier plus court que _SNIFF_BYTES
+        self._file.close()
+        return self.ext
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    def discard(self):
+        """Supprime le fichier temporaire (sans effet une fois publié)."""
+        self._file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Extension d'après les octets magiques, None si le type n'est pas accepté."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def content_etag(name: str) -> Optional[str]:
+    """ETag fort d'un fichier nommé par son empreinte (original ou variante) :
+    le nom suffit, le contenu ne change jamais. None pour les anciens noms."""
+    return name if _HASHED.match(name) else None
+
+
+def variant_name(path: Path, width: int, ext: str) -> Path:
+    return path.with_name(f"{path.stem}@{width}{ext}")
+
+
+def is_variant(path: Path) -> bool:
+    return "@" in path.stem
+
+
+def make_variants(path: Path):
+    """Décode `path` une fois et écrit ses variantes, de la plus large à la
+    plus étroite (chacune réduite depuis la précédente)."""
+    with IMAGE_SECONDS.time(), Image.open(path) as img:
+        fallback = _FALLBACK.get(path.suffix.lower())
+        # Orientation EXIF appliquée : les variantes n'ont plus de métadonnées
+        src = ImageOps.exif_transpose(img)
+        if src.mode not in ("RGB", "RGBA"):
+            src = src.convert("RGBA" if "transparency" in src.info or src.mode in ("LA", "PA") else "RGB")
+        for width in sorted((w for w in IMAGE_WIDTHS if w < src.width), reverse=True):
+            src = src.resize((width, max(1, round(src.height * width / src.width))), Image.LANCZOS)
+            _save(src, variant_name(path, width, ".webp"), "WEBP", quality=WEBP_QUALITY, method=4)
+            if fallback == "JPEG":
+                _save(src.convert("RGB"), variant_name(path, width, path.suffix), "JPEG",
+                      quality=JPEG_QUALITY, optimize=True, progressive=True)
+            elif fallback:
+                _save(src, variant_name(path, width, path.suffix), fallback, optimize=True)
+
+
+def _save(img, dest: Path, fmt: str, **options):
+    # Fichier temporaire puis rename : /media ne sert jamais une variante à moitié écrite
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".variant-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            img.save(out, fmt, **options)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def backfill(media_root: Path) -> int:
+    """Calcule les variantes manquantes des originaux déjà stockés."""
+    done = 0
+    for path in sorted(Path(media_root).glob("*/*")):
+        if path.name.startswith(".") or is_variant(path) or path.suffix.lower() not in _FALLBACK:
+            continue
+        if variant_name(path, IMAGE_WIDTHS[0], ".webp").exists():
+            continue
+        try:
+            make_variants(path)
+            done += 1
+        except Exception as e:
+            print(f"{path}: {e}")
+    return done
+
+
+if __name__ == "__main__":
+    from app import MEDIA_ROOT
+
+    parser = argparse.ArgumentParser(description="Outils des images produit")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    var = sub.add_parser("variants", help="Calculer les variantes des images existantes")
+    var.add_argument("--media-root", default=str(MEDIA_ROOT))
+    args = parser.parse_args()
+
+    if not HAS_PIL:
+        raise SystemExit("Pillow n'est pas installé (pip install Pillow)")
+    print(f"{backfill(Path(args.media_root))} image(s) traitée(s)")
@@ -0,0 +1,217 @@
+"""Grand livre des comptes : écritures typées en ajout seul, en centimes.
+
+Chaque mouvement d'argent est une ligne du document `ledger`, journalisé
+comme les mises (une écriture = une ligne ajoutée, users.yaml n'est plus
+réécrit pour un solde) :
+
+- credit  : solde + montant (crédit du compte, produit d'une vente, ouverture) ;
+- hold    : bloqué + montant (l'utilisateur prend la tête d'une enchère) ;
+- release : bloqué - montant (il est dépassé) ;
+- settle  : solde et bloqué - montant (il remporte l'enchère).
+
+Les totaux (solde, bloqué) de chaque utilisateur sont tenus en mémoire en
+centimes entiers : une écriture coûte O(1). Avant chaque lecture, ils
+rattrapent la queue du document (repo.tail), lignes écrites par un autre
+worker comprises. Les lignes sont ajoutées par insert, jamais remplacées
+(IdConflict sinon) : une position dans le document suffit comme curseur.
+
+`reconcile()` recalcule le bloqué attendu d'après les mises en tête des
+enchères en cours et renvoie les écarts ; un thread de fond le lance toutes
+les LEDGER_RECONCILE_S secondes et journalise les écarts confirmés.
+À la main : `python -m services.ledger reconcile [--fix]`.
+"""
+import argparse
+from datetime import datetime, timezone
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Secondes entre deux vérifications du bloqué (0 : pas de thread)
+LEDGER_RECONCILE_S = float(os.environ.get("LEDGER_RECONCILE_S", 300))
+
+# type -> effet sur (solde, bloqué)
+EFFECTS = {
+    "credit": (1, 0),
+    "hold": (0, 1),
+    "release": (0, -1),
+    "settle": (-1, -1),
+}
+
+
+def to_cents(amount: float) -> int:
+    return int(round(float(amount) * 100))
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+def entry(repo, kind: str, user_id: str, cents: int, **refs) -> Dict[str, Any]:
+    """Nouvelle ligne du grand livre (à écrire avec tx.insert("ledger", ...) :
+    une ligne n'est jamais remplacée, sync() suit le document par position).
+    `refs` : auction_id, bid_id, reason..."""
+    if kind not in EFFECTS:
+        raise ValueError(f"Type d'écriture inconnu: {kind}")
+    return {
+        "id": refs.pop("id", None) or repo.new_id("ledger", prefix="l_"),
+        "user_id": user_id,
+        "type": kind,
+        "cents": int(cents),
+        **refs,
+        "at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class Ledger:
+    def __init__(self, repo):
+        self.repo = repo
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[int]] = {}   # user_id -> [solde, bloqué] en centimes
+        self._cursor = None                       # position dans le document (repo.tail)
+        # Écarts confirmés par deux passes : user_id -> (bloqué, bloqué attendu)
+        self.drift: Dict[str, Tuple[int, int]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_repo(cls, repo) -> "Ledger":
+        ledger = cls(repo)
+        ledger.open_accounts()
+        ledger.sync()
+        return ledger
+
+    # ---------- Totaux ----------
+    def sync(self):
+        """Applique les lignes écrites depuis la dernière lecture."""
+        with self._lock:
+            rows, self._cursor = self.repo.tail("ledger", self._cursor)
+            for row in rows:
+                balance, held = EFFECTS[row["type"]]
+                totals = self._totals.setdefault(row["user_id"], [0, 0])
+                totals[0] += balance * row["cents"]
+                totals[1] += held * row["cents"]
+
+    def totals(self, user_id: str) -> Dict[str, int]:
+        """{"balance", "held"} en centimes (zéros si aucune écriture)."""
+        self.sync()
+        with self._lock:
+            balance, held = self._totals.get(user_id, (0, 0))
+        return {"balance": balance, "held": held}
+
+    def accounts(self) -> Dict[str, Tuple[int, int]]:
+        """user_id -> (solde, bloqué) en centimes pour tous les comptes (export)."""
+        self.sync()
+        with self._lock:
+            return {uid: (t[0], t[1]) for uid, t in self._totals.items()}
+
+    # ---------- Ouverture ----------
+    def open_accounts(self):
+        """Base d'avant le grand livre : le solde des utilisateurs devient une
+        écriture credit, chaque mise en tête d'une enchère en cours un hold
+        (le champ held n'est pas repris : il n'a pas d'historique), puis les
+        champs balance/held disparaissent des utilisateurs. Ids déterministes :
+        une ouverture interrompue puis rejouée n'écrit rien en double."""
+        users = [u for u in self.repo.load("users").get("users", []) if "balance" in u or "held" in u]
+        if not users:
+            return
+        rows = [entry(self.repo, "credit", u["id"], to_cents(u.get("balance", 0.0)),
+                      id=f"open_{u['id']}", reason="opening")
+                for u in users if to_cents(u.get("balance", 0.0))]
+        for aid, bid in leading_bids(self.repo):
+            rows.append(entry(self.repo, "hold", bid["user_id"], to_cents(bid["amount"]),
+                              id=f"open_{aid}", auction_id=aid, bid_id=bid["id"], reason="opening"))
+        with self.repo.transaction(*(f"user:{u['id']}" for u in users)) as tx:
+            # Rejouée : les écritures déjà faites ne sont ni remplacées ni doublées
+            rows = [r for r in rows if tx.get("ledger", r["id"]) is None]
+            if rows:
+                tx.insert("ledger", *rows)
+            for u in users:
+                u.pop("balance", None)
+                u.pop("held", None)
+            tx.put("users", *users)
+        log.info("grand livre ouvert : %d utilisateur(s), %d écriture(s)", len(users), len(rows))
+
+    # ---------- Réconciliation ----------
+    def reconcile(self) -> Dict[str, Tuple[int, int]]:
+        """user_id -> (bloqué au grand livre, bloqué attendu), en centimes,
+        pour les utilisateurs dont les deux diffèrent."""
+        expected: Dict[str, int] = {}
+        for _, bid in leading_bids(self.repo):
+            expected[bid["user_id"]] = expected.get(bid["user_id"], 0) + to_cents(bid["amount"])
+        self.sync()
+        with self._lock:
+            held = {uid: t[1] for uid, t in self._totals.items() if t[1]}
+        return {uid: (held.get(uid, 0), expected.get(uid, 0))
+                for uid in set(held) | set(expected) if held.get(uid, 0) != expected.get(uid, 0)}
+
+    def check(self, confirm_after: float = 1.0) -> Dict[str, Tuple[int, int]]:
+        """reconcile() deux fois : une mise écrite entre la lecture des
+        enchères et celle du grand livre ne fait qu'un écart passager."""
+        first = self.reconcile()
+        if first:
+            time.sleep(confirm_after)
+            second = self.reconcile()
+            first = {uid: d for uid, d in second.items() if first.get(uid) == d}
+        for uid, (held, expected) in sorted(first.items()):
+            log.warning("bloqué incohérent pour %s : grand livre %.2f, mises en tête %.2f",
+                        uid, from_cents(held), from_cents(expected))
+        self.drift = first
+        return first
+
+    def start(self, interval: float = LEDGER_RECONCILE_S):
+        """Vérification périodique en arrière-plan (sans effet si interval <= 0)."""
+        if interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="ledger-reconcile", daemon=True)
+        self._thread.start()
+
+    def _run(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.check()
+            except Exception:
+                log.exception("réconciliation du grand livre impossible")
+
+
+def leading_bids(repo):
+    """(auction_id, mise en tête) des enchères en cours : les montants bloqués."""
+    for a in repo.find("auctions", "status", "running"):
+        bid = repo.get("bids", a["current_bid_id"]) if a.get("current_bid_id") else None
+        if bid:
+            yield a["id"], bid
+
+
+def fix(ledger: Ledger, drift: Dict[str, Tuple[int, int]]) -> int:
+    """Ramène le bloqué de chaque utilisateur en écart à sa valeur attendue
+    (hold ou release de la différence) ; renvoie le nombre d'écritures."""
+    rows = []
+    for uid, (held, expected) in drift.items():
+        kind = "hold" if expected > held else "release"
+        rows.append(entry(ledger.repo, kind, uid, abs(expected - held), reason="reconcile"))
+    if rows:
+        with ledger.repo.transaction(*(f"user:{uid}" for uid in drift)) as tx:
+            tx.insert("ledger", *rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from services.repo import make_repo
+
+    parser = argparse.ArgumentParser(description="Outils du grand livre")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("reconcile", help="Comparer le bloqué aux mises en tête")
+    rec.add_argument("--fix", action="store_true", help="écrire les hold/release qui corrigent les écarts")
+    args = parser.parse_args()
+
+    # Application arrêtée : pas de mise en cours d'écriture, une passe suffit
+    ledger = Ledger.from_repo(make_repo())
+    drift = ledger.reconcile()
+    for uid, (held, expected) in sorted(drift.items()):
+        print(f"{uid}: grand livre {from_cents(held):.2f}, mises en tête {from_cents(expected):.2f}")
+    print(f"{len(drift)} écart(s)")
+    if drift and args.fix:
+        print(f"{fix(ledger, drift)} écriture(s) de correction")
@@ -0,0 +1,157 @@
+"""Vue matérialisée des enchères pour les endpoints de lecture.
+
+Une entrée par enchère, déjà jointe : champs de l'enchère, `product`,
+`bids_count` et `winner_username`. Les listes et le détail servent ces
+entrées telles quelles, sans relire produits, mises ni utilisateurs.
+
+Construite au démarrage puis tenue à jour par `repo.add_listener`, comme
+l'index de facettes : création/modification de produit, mise écrite,
+ouverture, clôture et suppression d'enchère. Les écritures des autres
+workers arrivent par le même listener quand `repo.refresh()` les découvre
+(avant chaque lecture HTTP). Une entrée n'est jamais
+modifiée en place (remplacée à chaque changement) : un lecteur garde un
+état cohérent, mais ne doit pas la modifier lui-même.
+
+Chaque changement prend un numéro de version (avec son heure) : celui de
+la vue entière et celui de chaque entrée servent d'ETag aux lectures.
+"""
+import copy
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _name(user: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not user:
+        return None
+    return user.get("username", user.get("email", "").split("@")[0])
+
+
+class ListingView:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}    # auction_id -> entrée jointe
+        self._products: Dict[str, Dict[str, Any]] = {}   # product_id -> produit
+        self._by_product: Dict[str, Set[str]] = {}       # product_id -> auction_ids
+        self._names: Dict[str, Optional[str]] = {}       # user_id -> nom affiché
+        self._by_winner: Dict[str, Set[str]] = {}        # user_id -> auction_ids gagnées
+        self._bids: Dict[str, int] = {}                  # auction_id -> nombre de mises
+        self._bid_auction: Dict[str, str] = {}           # bid_id -> auction_id (mises comptées)
+        # Versions (numéro, heure) : de la vue, par entrée, des noms affichés
+        self._version: Tuple[int, float] = (0, time.time())
+        self._changed: Dict[str, Tuple[int, float]] = {}
+        self._names_changed = self._version
+
+    @classmethod
+    def from_repo(cls, repo) -> "ListingView":
+        view = cls()
+        view.apply({
+            "bids": {b["id"]: b for b in repo.load("bids").get("bids", [])},
+            "users": {u["id"]: u for u in repo.load("users").get("users", [])},
+            "products": {p["id"]: p for p in repo.load("products").get("products", [])},
+            "auctions": {a["id"]: a for a in repo.load("auctions").get("auctions", [])},
+        }, {})
+        repo.add_listener(view.apply)
+        return view
+
+    # ---------- Mise à jour ----------
+    def apply(self, puts, deletes):
+        """Listener du repo."""
+        with self._lock:
+            touched: Set[str] = set()
+            names = False
+            for u in puts.get("users", {}).values():
+                name = _name(u)
+                if self._names.get(u["id"]) != name:
+                    self._names[u["id"]] = name
+                    names = True
+                    for aid in self._by_winner.get(u["id"], ()):
+                        self._entries[aid] = {**self._entries[aid], "winner_username": name}
+            for p in puts.get("products", {}).values():
+                product = self._products[p["id"]] = copy.deepcopy(p)
+                for aid in self._by_product.get(p["id"], ()):
+                    self._entries[aid] = {**self._entries[aid], "product": product}
+                    touched.add(aid)
+            for b in puts.get("bids", {}).values():
+                # Une mise déjà comptée peut revenir (nouvel essai d'écriture,
+                # journal relu, save()) : compter les ids, pas les puts
+                if b["id"] in self._bid_auction:
+                    continue
+                aid = self._bid_auction[b["id"]] = b.get("auction_id")
+                self._count_bids(aid, 1)
+                touched.add(aid)
+            for bid_id in deletes.get("bids", ()):
+                aid = self._bid_auction.pop(bid_id, None)
+                if aid is not None:
+                    self._count_bids(aid, -1)
+                    touched.add(aid)
+            for a in puts.get("auctions", {}).values():
+                touched.add(a["id"])
+                self._drop(a["id"])
+                self._by_product.setdefault(a["product_id"], set()).add(a["id"])
+                if a.get("winner_id"):
+                    self._by_winner.setdefault(a["winner_id"], set()).add(a["id"])
+                self._entries[a["id"]] = {
+                    **copy.deepcopy(a),
+                    "product": self._products.get(a["product_id"]),
+                    "bids_count": self._bids.get(a["id"], 0),
+                    "winner_username": self._names.get(a["winner_id"]) if a.get("winner_id") else None,
+                }
+            for aid in deletes.get("auctions", ()):
+                self._drop(aid)
+                self._bids.pop(aid, None)
+                self._changed.pop(aid, None)
+                touched.discard(aid)
+            for pid in deletes.get("products", ()):
+                self._products.pop(pid, None)
+
+            # Numéroté après coup, sous le verrou : une version lue correspond
+            # toujours à des entrées déjà à jour
+            if touched or names or puts.get("products") or deletes.get("auctions") or deletes.get("products"):
+                self._version = (self._version[0] + 1, time.time())
+                for aid in touched:
+                    self._changed[aid] = self._version
+                if names:
+                    self._names_changed = self._version
+
+    def _count_bids(self, aid: str, delta: int):
+        self._bids[aid] = self._bids.get(aid, 0) + delta
+        if aid in self._entries:
+            self._entries[aid] = {**self._entries[aid], "bids_count": self._bids[aid]}
+
+    def _drop(self, aid: str):
+        old = self._entries.pop(aid, None)
+        if old is None:
+            return
+        self._by_product.get(old["product_id"], set()).discard(aid)
+        if old.get("winner_id"):
+            self._by_winner.get(old["winner_id"], set()).discard(aid)
+
+    # ---------- Lecture ----------
+    def get(self, auction_id: str) -> Optional[Dict[str, Any]]:
+        """Entrée jointe (product None si le produit a disparu), ou None."""
+        with self._lock:
+            return self._entries.get(auction_id)
+
+    def entries(self, auction_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Entrées des ids donnés, dans cet ordre (ids inconnus et enchères
+        sans produit ignorés, comme la liste l'a toujours fait)."""
+        with self._lock:
+            rows = [self._entries.get(aid) for aid in auction_ids]
+        return [e for e in rows if e is not None and e["product"]]
+
+    def version(self, auction_id: Optional[str] = None) -> Optional[Tuple[int, float]]:
+        """(numéro, heure epoch) du dernier changement de la vue, ou de
+        l'entrée `auction_id` (None si elle n'existe pas). Un nom affiché
+        modifié compte pour toutes les entrées : l'historique des mises
+        les affiche."""
+        with self._lock:
+            if auction_id is None:
+                return self._version
+            changed = self._changed.get(auction_id)
+            return max(changed, self._names_changed) if changed else None
+
+    def username(self, user_id: str) -> Optional[str]:
+        """Nom affiché d'un utilisateur (None s'il est inconnu)."""
+        with self._lock:
+            return self._names.get(user_id)
@@ -0,0 +1,78 @@
+"""Journalisation du backend : niveaux, sortie non bloquante, échantillonnage.
+
+- LOG_LEVEL (INFO par défaut) filtre avant tout formatage : un log.debug()
+  sous le niveau ne coûte qu'une comparaison ;
+- les threads de requête ne font que déposer l'enregistrement dans une file
+  (QueueHandler) ; un thread dédié formate et écrit sur stderr ;
+- LOG_FORMAT=json : une ligne JSON par événement, champs structurés inclus ;
+- les événements fréquents (connexion, room, mise) passent par `sampled()` :
+  en DEBUG, seule une fraction LOG_SAMPLE_RATE est écrite ;
+- SOCKETIO_LOGS=1 réactive les logs paquet par paquet de socket.io et
+  engine.io (désactivés par défaut, bien trop verbeux en production).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from typing import Any
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 0.01))
+SOCKETIO_LOGS = os.environ.get("SOCKETIO_LOGS", "0") != "0"
+
+_listener = None
+
+
+class _TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+def setup_logging():
+    """Configure le logger racine (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(_JsonFormatter() if LOG_FORMAT == "json" else _TextFormatter())
+    q = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(q)]
+    root.setLevel(LOG_LEVEL)
+    # Paquets socket.io/engine.io : seulement sur demande
+    for name in ("socketio", "engineio"):
+        logging.getLogger(name).setLevel(logging.INFO if SOCKETIO_LOGS else logging.WARNING)
+    _listener = logging.handlers.QueueListener(q, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def sampled(log: logging.Logger, msg: str, **fields: Any):
+    """log.debug() d'un événement fréquent, pour une fraction LOG_SAMPLE_RATE d'entre eux."""
+    if log.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE:
+        log.debug(msg, extra={"fields": fields})
@@ -0,0 +1,170 @@
+"""Métriques en process, exposées au format texte Prometheus (GET /api/metrics).
+
+Compteurs, jauges et histogrammes minimalistes, sans dépendance ni service
+externe : une observation = un verrou, une recherche dichotomique du bucket
+et deux additions. Les buckets sont cumulés seulement au moment du rendu.
+
+Chaque process a ses propres valeurs : avec plusieurs workers, Prometheus
+scrape chaque worker (label `instance`) et agrège avec sum().
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Secondes : de la milliseconde (mise en mémoire) à 10 s (gros document YAML)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        # Même nom = même métrique : la dernière déclarée remplace (create_app rappelé)
+        _REGISTRY[:] = [m for m in _REGISTRY if m.name != name]
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valeur instantanée ; `collect()` -> {labels: valeur} est appelé au rendu."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), collect: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _samples(self):
+        try:
+            items = sorted((self.collect() if self.collect else {}).items())
+        except Exception:
+            items = []
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}  # labels -> [n par bucket..., +Inf, somme]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = []
+        for key, series in items:
+            total = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                total += n
+                le = 'le="%s"' % _number(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {total}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {total}")
+        return out
+
+
+def render() -> str:
+    return "\n".join(line for m in _REGISTRY for line in m.render()) + "\n"
+
+
+# ------------------- Métriques du backend -------------------
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "Durée des requêtes HTTP par route",
+                         ("method", "route", "status"))
+REPO_IO_SECONDS = Histogram("repo_io_duration_seconds",
+                            "Durée des lectures/écritures de documents sur disque (YamlRepo)", ("op", "doc"))
+REPO_IO_BYTES = Counter("repo_io_bytes_total", "Octets lus/écrits par YamlRepo", ("op", "doc"))
+LOCK_WAIT_SECONDS = Histogram("lock_wait_seconds", "Attente d'acquisition des verrous", ("lock",),
+                              buckets=(0.00001, 0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+SCHEDULER_LAG_SECONDS = Histogram("scheduler_lag_seconds",
+                                  "Retard de l'ouverture/clôture effective sur l'heure prévue", ("kind",))
+EVENTS_EMITTED = Counter("socketio_events_emitted_total",
+                         "Événements Socket.IO publiés (rate() = événements/s)", ("event",))
+IMAGE_SECONDS = Histogram("image_processing_seconds",
+                          "Décodage d'une image importée et écriture de ses variantes")
+PASSWORD_SECONDS = Histogram("password_hash_seconds",
+                             "Hash/vérification d'un mot de passe, attente du pool comprise", ("op",))
+LOGIN_THROTTLED = Counter("login_throttled_total", "Connexions refusées (429) par limite", ("scope",))
+HTTP_CACHE = Counter("http_response_cache_total",
+                     "Lectures conditionnelles : not_modified (304), hit (LRU) ou miss", ("route", "result"))
+
+
+@contextmanager
+def waited(lock, name: str):
+    """`with waited(lock, "engine:auction"):` — comme `with lock:`, en mesurant l'attente."""
+    start = time.perf_counter()
+    lock.acquire()
+    LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, lock=name)
+    try:
+        yield
+    finally:
+        lock.release()
@@ -0,0 +1,64 @@
+"""Pagination par curseur pour les listes de l'API.
+
+Le curseur est opaque pour le client : c'est la clé de tri du dernier
+élément renvoyé (JSON puis base64 urlsafe). La page suivante reprend
+strictement après cette clé, donc une insertion entre deux appels ne
+décale ni ne duplique les éléments déjà vus.
+"""
+import base64
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", 50))
+# Plafond serveur : un client ne peut pas demander plus d'éléments par page
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 200))
+
+
+def encode_cursor(key) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def parse_limit(value: Optional[str], default: int = DEFAULT_PAGE_SIZE,
+                cap: int = MAX_PAGE_SIZE) -> int:
+    """Taille de page demandée, bornée à [1, cap]."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, cap))
+
+
+def paginate(items: List[Any], key: Callable[[Any], Tuple], limit: int,
+             cursor: Optional[str] = None, reverse: bool = False) -> Dict[str, Any]:
+    """Trie `items` par `key` (unique, id en dernier) et renvoie une page.
+
+    Retourne {"items": [...], "next_cursor": str | None}.
+    """
+    keyed = sorted(((key(x), x) for x in items), key=lambda kx: kx[0], reverse=reverse)
+    if cursor:
+        after = decode_cursor(cursor)
+        try:
+            if reverse:
+                keyed = [kx for kx in keyed if list(kx[0]) < list(after)]
+            else:
+                keyed = [kx for kx in keyed if list(kx[0]) > list(after)]
+        except TypeError:
+            raise ValueError("Invalid cursor")
+    page = keyed[:limit]
+    next_cursor = encode_cursor(page[-1][0]) if len(keyed) > limit else None
+    return {"items": [x for _, x in page], "next_cursor": next_cursor}
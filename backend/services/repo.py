@@ -1,10 +1,20 @@
 from pathlib import Path
+from contextlib import contextmanager
+import copy
+import json
+import logging
 import os
 import sys
 import tempfile
-from typing import Any, Dict
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from ruamel.yaml import YAML
 
+from services.metrics import LOCK_WAIT_SECONDS, REPO_IO_BYTES, REPO_IO_SECONDS, waited
+from services.serving import blocking, offload
+
 # fcntl n'est pas disponible sur Windows
 try:
     import fcntl
@@ -20,47 +30,799 @@ DEFAULT_DB = BASE / "local_data" / "db"
 
 DB_DIR = Path(os.environ.get("DB_DIR", str(DEFAULT_DB))).resolve()
 DB_DIR.mkdir(parents=True, exist_ok=True)
-yaml = YAML()
+# YAML() garde l'état de son lecteur/émetteur : une instance par thread
+# (lectures et écritures tournent en parallèle, cf. pool de services.serving)
+_yaml = threading.local()
+log = logging.getLogger(__name__)
+
+# Nombre de verrous par type de clé (auction, user, ...)
+LOCK_STRIPES = 64
+
+# Ids réservés par blocs : un accès au compteur partagé pour ID_BLOCK ids
+ID_BLOCK = 32
+
+# Documents qui ne font que grossir : snapshot YAML + journal JSON-lines en
+# ajout seul, compacté dans le snapshot au-delà de JOURNAL_COMPACT_ROWS lignes
+JOURNALED = {"bids", "ledger"}
+JOURNAL_COMPACT_ROWS = int(os.environ.get("JOURNAL_COMPACT_ROWS", 5000))
+
+# Index secondaires maintenus par document (en plus de l'id)
+INDEXES = {
+    "users": ("email",),
+    "products": ("owner_id",),
+    "auctions": ("product_id", "status"),
+    "bids": ("auction_id", "user_id"),
+    "ledger": ("user_id",),
+}
+
+
+def _yaml_instance() -> YAML:
+    inst = getattr(_yaml, "inst", None)
+    if inst is None:
+        inst = _yaml.inst = YAML()
+    return inst
+
+
+def _copy(obj):
+    """Copie profonde d'un document en dict/list ordinaires. deepcopy d'une
+    liste ruamel (CommentedSeq) est quadratique en nombre de lignes : plus
+    d'une minute pour quelques milliers de produits."""
+    if isinstance(obj, dict):
+        return {k: _copy(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_copy(v) for v in obj]
+    return obj
+
+
+def _id_number(item_id: str) -> int:
+    # "b_42" -> 42 ; 0 pour un id sans suffixe numérique ("open_u_1")
+    suffix = str(item_id).partition("_")[2]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+class IdConflict(Exception):
+    """Insertion (insert) d'une ligne dont l'id existe déjà : rien n'est écrit."""
+
+
+def _diff(name: str, old: Dict[str, Any], new: Dict[str, Any]):
+    """(lignes nouvelles ou modifiées par id, ids disparus) entre deux
+    versions du document `name`."""
+    before = {x["id"]: x for x in old.get(name, []) if isinstance(x, dict) and "id" in x}
+    puts = {}
+    for x in new.get(name, []):
+        if isinstance(x, dict) and "id" in x and before.pop(x["id"], None) != x:
+            puts[x["id"]] = x
+    return puts, set(before)
+
+
+def _signature(st: os.stat_result) -> Tuple[int, int, int]:
+    # mtime + inode + taille : os.replace() change l'inode, donc une écriture
+    # faite par un autre process partageant DB_DIR invalide toujours le cache
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class _RowIndex:
+    """Index d'un document : id -> ligne, champ -> valeur -> ids.
+
+    Mis à jour par (ancienne ligne, nouvelle ligne) au lieu d'être reconstruit ;
+    le rang d'insertion conserve l'ordre du document pour find().
+    """
+
+    def __init__(self, fields, rows):
+        self.fields = fields
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.rank: Dict[str, int] = {}
+        self.by = {f: {} for f in fields}
+        self.top = 0  # plus grand suffixe numérique d'id vu (new_id)
+        self._next = 0
+        self.apply((None, row) for row in rows)
+
+    def apply(self, changes):
+        for old, new in changes:
+            if old is not None:
+                for f in self.fields:
+                    ids = self.by[f].get(old.get(f))
+                    if ids is not None:
+                        ids.discard(old["id"])
+                        if not ids:
+                            del self.by[f][old.get(f)]
+                if new is None:
+                    self.rows.pop(old["id"], None)
+                    self.rank.pop(old["id"], None)
+            if new is not None:
+                if new["id"] not in self.rank:
+                    self.rank[new["id"]] = self._next
+                    self._next += 1
+                    self.top = max(self.top, _id_number(new["id"]))
+                self.rows[new["id"]] = new
+                for f in self.fields:
+                    self.by[f].setdefault(new.get(f), set()).add(new["id"])
+
+    def find(self, field: str, value) -> List[Dict[str, Any]]:
+        ids = sorted(self.by[field].get(value, ()), key=self.rank.__getitem__)
+        return [self.rows[i] for i in ids]
+
+    def count(self, field: str, value) -> int:
+        return len(self.by[field].get(value, ()))
+
+
+class Transaction:
+    """Écritures par ligne mises en attente, appliquées d'un bloc au commit.
+
+    Obtenue via `repo.transaction(*keys)`. Les clés sont de la forme
+    "auction:a_1" ou "user:u_2" ; chaque type de clé a son propre jeu de
+    verrous. Pour éviter les interblocages, verrouiller les clés par type
+    dans l'ordre auction -> user -> autres, un appel à lock() par type.
+    """
+
+    def __init__(self, repo: "BaseRepo"):
+        self.repo = repo
+        self._puts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._deletes: Dict[str, set] = {}
+        self._inserts: Dict[str, set] = {}
+        self._held: List["_Stripe"] = []
+
+    def lock(self, *keys: str):
+        self._held.extend(self.repo._acquire(keys))
+
+    def get(self, name: str, item_id: str) -> Optional[Dict[str, Any]]:
+        # On relit ses propres écritures
+        if item_id in self._deletes.get(name, ()):
+            return None
+        staged = self._puts.get(name, {}).get(item_id)
+        if staged is not None:
+            return staged
+        return self.repo.get(name, item_id)
+
+    def put(self, name: str, *items: Dict[str, Any]):
+        for item in items:
+            self._puts.setdefault(name, {})[item["id"]] = item
+            self._deletes.get(name, set()).discard(item["id"])
 
+    def insert(self, name: str, *items: Dict[str, Any]):
+        """Comme put, mais le commit échoue (IdConflict) si l'id existe déjà."""
+        self.put(name, *items)
+        self._inserts.setdefault(name, set()).update(item["id"] for item in items)
 
+    def delete(self, name: str, *item_ids: str):
+        for item_id in item_ids:
+            self._deletes.setdefault(name, set()).add(item_id)
+            self._puts.get(name, {}).pop(item_id, None)
+            self._inserts.get(name, set()).discard(item_id)
 
+    def _release(self):
+        for lock in reversed(self._held):
+            lock.release()
+        self._held.clear()
 
-class YamlRepo:
-    def __init__(self):
-        self.db_dir = DB_DIR
+
+class _Stripe:
+    """Verrou d'une tranche de clés : RLock entre les threads du process,
+    flock sur `path` entre les process (workers gunicorn, CLI) qui partagent
+    la base. Le flock est pris au premier niveau de réentrance seulement."""
+
+    def __init__(self, path: Optional[Path]):
+        self._lock = threading.RLock()
+        self._path = path
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth > 1 or self._path is None:
+            return
+        try:
+            # Ouvert à chaque prise : pas de descripteur hérité d'un fork,
+            # dont le verrou serait partagé avec le parent
+            self._file = open(self._path, "a")
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Tenu par un autre process : attente hors de la boucle d'événements
+                offload(fcntl.flock, self._file, fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._depth -= 1
+            self._lock.release()
+            raise
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            # Fermer le fichier libère le flock
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+class BaseRepo:
+    """Verrous par clé, transactions et ids communs aux backends.
+
+    Un backend fournit load/save, get, `tail(name, cursor)`,
+    `_reserve_ids(name, count)` et `_commit(puts, deletes, inserts)` qui
+    applique toutes les écritures ou aucune (IdConflict si un id inséré
+    existe déjà).
+    """
+
+    def __init__(self, lock_dir: Optional[Path] = None):
+        # Fichiers des verrous par clé, partagés avec les autres process
+        # (None : verrous internes au process seulement)
+        self._lock_dir = lock_dir if HAS_FCNTL else None
+        if self._lock_dir is not None:
+            self._lock_dir.mkdir(parents=True, exist_ok=True)
+        self._pools: Dict[str, List[_Stripe]] = {}
+        self._pools_lock = threading.Lock()
+        # Blocs d'ids réservés par ce process : name -> [prochain, fin]
+        self._id_blocks: Dict[str, List[int]] = {}
+        self._ids_lock = threading.Lock()
+        self._listeners: List[Callable] = []
+        # Versions des documents : name -> (numéro, heure du dernier changement)
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._versions_lock = threading.Lock()
+        self._started_at = time.time()
+
+    def _acquire(self, keys: Iterable[str]) -> List[_Stripe]:
+        stripes = set()
+        for key in keys:
+            kind, _, ident = key.partition(":")
+            stripes.add((kind, zlib.crc32(ident.encode()) % LOCK_STRIPES))
+        held = []
+        for kind, idx in sorted(stripes):
+            with self._pools_lock:
+                pool = self._pools.get(kind)
+                if pool is None:
+                    pool = self._pools[kind] = [
+                        _Stripe(self._lock_dir / f"{kind}.{i}.lock" if self._lock_dir else None)
+                        for i in range(LOCK_STRIPES)]
+            start = time.perf_counter()
+            pool[idx].acquire()
+            LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, lock=f"repo:{kind}")
+            held.append(pool[idx])
+        return held
+
+    @contextmanager
+    def transaction(self, *keys: str):
+        """Verrou exclusif sur `keys` ; tout est écrit à la sortie, ou rien
+        si le bloc lève une exception."""
+        tx = Transaction(self)
+        try:
+            tx.lock(*keys)
+            yield tx
+            self._commit(tx._puts, tx._deletes, tx._inserts)
+            # Encore sous verrou : les index dérivés voient les écritures dans l'ordre
+            self._notify(tx._puts, tx._deletes)
+        finally:
+            tx._release()
+
+    def put(self, name: str, *items: Dict[str, Any]):
+        """Insère ou remplace (par id) des éléments du document `name`."""
+        puts = {name: {x["id"]: x for x in items}}
+        self._commit(puts, {}, {})
+        self._notify(puts, {})
+
+    def insert(self, name: str, *items: Dict[str, Any]):
+        """Ajoute des éléments nouveaux ; IdConflict (et rien d'écrit) si
+        l'un des ids existe déjà."""
+        puts = {name: {x["id"]: x for x in items}}
+        self._commit(puts, {}, {name: set(puts[name])})
+        self._notify(puts, {})
+
+    def delete(self, name: str, *item_ids: str):
+        deletes = {name: set(item_ids)}
+        self._commit({}, deletes, {})
+        self._notify({}, deletes)
+
+    def add_listener(self, fn: Callable):
+        """`fn(puts, deletes)` est appelé après chaque put/delete/transaction
+        réussi de ce process, et pour les lignes écrites ailleurs (save(),
+        autre process) dès que refresh() ou une lecture les découvre."""
+        self._listeners.append(fn)
+
+    def refresh(self):
+        """Revalide l'état connu auprès du stockage : les écritures des autres
+        process (workers, CLI) passent aux listeners et aux versions. À
+        appeler avant de servir une lecture tirée d'une vue en mémoire."""
+
+    def version(self, name: str) -> Tuple[int, float]:
+        """(numéro, heure epoch) du dernier changement du document `name`
+        écrit par ce process ; (0, démarrage) s'il n'a pas changé depuis.
+        Base des ETags des endpoints de lecture."""
+        with self._versions_lock:
+            return self._versions.get(name, (0, self._started_at))
+
+    def _bump(self, *names: str):
+        now = time.time()
+        with self._versions_lock:
+            for name in names:
+                self._versions[name] = (self._versions.get(name, (0, 0.0))[0] + 1, now)
+
+    def _notify(self, puts, deletes):
+        self._bump(*(set(puts) | set(deletes)))
+        self._emit(puts, deletes)
+
+    def _emit(self, puts, deletes):
+        for fn in self._listeners:
+            try:
+                fn(puts, deletes)
+            except Exception:
+                log.exception("listener %r a échoué", fn)
+
+    def new_id(self, name: str, prefix: str) -> str:
+        """Id jamais distribué, même par un autre process ni pour une ligne
+        supprimée depuis : les blocs viennent d'un compteur persistant
+        (au moins le plus grand suffixe numérique stocké). Un redémarrage
+        abandonne la fin du bloc en cours : les ids ne sont pas contigus."""
+        with self._ids_lock:
+            block = self._id_blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                first = self._reserve_ids(name, ID_BLOCK)
+                block = self._id_blocks[name] = [first, first + ID_BLOCK]
+            n = block[0]
+            block[0] += 1
+        return f"{prefix}{n}"
+
+    def next_id(self, root: Dict[str, Any], key: str, prefix: str) -> str:
+        arr = root.get(key, [])
+        return f"{prefix}{len(arr)+1}"
+
+
+class YamlRepo(BaseRepo):
+    def __init__(self, db_dir: Optional[Path] = None):
+        db_dir = Path(db_dir).resolve() if db_dir else DB_DIR
+        super().__init__(lock_dir=db_dir / ".locks")
+        self.db_dir = db_dir
+        # Cache write-through : name -> (signature du fichier, document parsé)
+        self._cache: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+        self._cache_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._ids_file_lock = threading.Lock()
+        # Journaux : verrou de relecture, position des ids, lignes depuis le snapshot
+        self._journal_lock = threading.RLock()
+        self._journal_ids: Dict[str, Dict[str, int]] = {}
+        self._journal_rows: Dict[str, int] = {}
+        # Index : name -> [document indexé, _RowIndex]
+        self._indexes: Dict[str, List[Any]] = {}
+        self._index_lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
 
     def _path(self, name: str) -> Path:
-        return DB_DIR / f"{name}.yaml"
+        return self.db_dir / f"{name}.yaml"
 
+    def _counters_path(self) -> Path:
+        return self.db_dir / ".ids.json"
 
-    def load(self, name: str) -> Dict[str, Any]:
-        p = self._path(name)
-        if not p.exists():
-            return {}
-        with open(p, "r") as f:
+    def _journal_path(self, name: str) -> Path:
+        return self.db_dir / f"{name}.jsonl"
+
+
+    @blocking
+    def _parse(self, p: Path):
+        with REPO_IO_SECONDS.time(op="load", doc=p.stem), open(p, "r") as f:
             if HAS_FCNTL:
                 fcntl.flock(f, fcntl.LOCK_SH)
-            data = yaml.load(f) or {}
+            # fstat sur le descripteur ouvert : la signature correspond
+            # exactement au contenu lu, même si le fichier a été remplacé
+            sig = _signature(os.fstat(f.fileno()))
+            data = _yaml_instance().load(f) or {}
             if HAS_FCNTL:
                 fcntl.flock(f, fcntl.LOCK_UN)
+        REPO_IO_BYTES.inc(sig[2], op="load", doc=p.stem)
+        return sig, data
+
+
+    def _doc(self, name: str) -> Dict[str, Any]:
+        """Document en cache (revalidé sur le fichier). Ne jamais le modifier :
+        save() remplace l'entrée au lieu de la muter, les lecteurs concurrents
+        gardent donc un instantané cohérent."""
+        if name in JOURNALED:
+            return self._journaled_doc(name)
+        p = self._path(name)
+        try:
+            sig = _signature(os.stat(p))
+        except FileNotFoundError:
+            sig = None
+
+        with self._cache_lock:
+            entry = self._cache.get(name)
+            if entry and entry[0] == sig:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if sig is None:
+            # Absent aussi mis en cache : refresh() verra le fichier apparaître
+            self._set_doc(name, None, {})
+            return {}
+
+        sig, data = self._parse(p)
+        self._set_doc(name, sig, data)
+        return data
+
+
+    def _set_doc(self, name: str, sig, data: Dict[str, Any], changes=None, foreign=False):
+        """Installe une version du document dans le cache. `changes` liste les
+        (ancienne, nouvelle) lignes depuis la version en cache : l'index est
+        alors mis à jour sur place, sinon il sera reconstruit au prochain accès.
+
+        Les lignes qui ne viennent pas d'une transaction de ce process vont aux
+        listeners : `changes` lus dans le journal d'un autre process (foreign),
+        ou, sans `changes`, écart avec la version précédente (save(), fichier
+        réécrit par un autre process). Toujours sous le verrou d'index : les
+        listeners les reçoivent dans l'ordre des versions."""
+        with self._index_lock:
+            with self._cache_lock:
+                prev = self._cache.get(name)
+                self._cache[name] = (sig, data)
+            outside = None
+            if prev and prev[0] != sig:
+                # save(), autre process ou fichier modifié à la main : nouvelle version
+                self._bump(name)
+                if changes is None:
+                    outside = _diff(name, prev[1], data)
+            if foreign and changes:
+                outside = ({new["id"]: new for _, new in changes}, set())
+            entry = self._indexes.get(name)
+            if entry and changes is not None and prev and entry[0] is prev[1]:
+                entry[1].apply(changes)
+                entry[0] = data
+            else:
+                self._indexes.pop(name, None)
+            if outside and (outside[0] or outside[1]):
+                self._emit({name: outside[0]} if outside[0] else {},
+                           {name: outside[1]} if outside[1] else {})
+
+
+    def _index(self, name: str) -> _RowIndex:
+        doc = self._doc(name)
+        with self._index_lock:
+            entry = self._indexes.get(name)
+            if entry is None or entry[0] is not doc:
+                entry = self._indexes[name] = [doc, _RowIndex(INDEXES.get(name, ()), doc.get(name, []))]
+            return entry[1]
+
+
+    def _journaled_doc(self, name: str) -> Dict[str, Any]:
+        # Signature : (snapshot, inode du journal, position lue dans le journal)
+        try:
+            snap_sig = _signature(os.stat(self._path(name)))
+        except FileNotFoundError:
+            snap_sig = None
+        try:
+            jst = os.stat(self._journal_path(name))
+            jino, jsize = jst.st_ino, jst.st_size
+        except FileNotFoundError:
+            jino, jsize = None, 0
+
+        with self._cache_lock:
+            entry = self._cache.get(name)
+            if entry and entry[0] == (snap_sig, jino, jsize):
+                self.hits += 1
+                return entry[1]
+
+        with self._journal_lock:
+            with self._cache_lock:
+                entry = self._cache.get(name)
+                self.misses += 1
+            if entry and entry[0][:2] == (snap_sig, jino) and entry[0][2] <= jsize:
+                # Même snapshot, journal plus long : on ne lit que la queue
+                data, offset = entry[1], entry[0][2]
+            else:
+                if snap_sig is None and jino is None:
+                    self._set_doc(name, (None, None, 0), {})
+                    return {}
+                data, offset = {}, 0
+                if snap_sig is not None:
+                    snap_sig, data = self._parse(self._path(name))
+                self._journal_ids[name] = {x["id"]: i for i, x in enumerate(data.get(name, []))}
+                self._journal_rows[name] = 0
+                entry = None
+            rows, offset = self._read_journal(name, offset)
+            data, changes = self._apply_rows(name, data, rows)
+            # Queue du journal : lignes ajoutées par un autre process (les
+            # nôtres sont déjà en cache, cf. _append_cached)
+            self._set_doc(name, (snap_sig, jino, offset), data, changes if entry else None, foreign=True)
             return data
 
 
-    def save(self, name: str, data: Dict[str, Any]):
+    @blocking
+    def _read_journal(self, name: str, offset: int):
+        try:
+            with REPO_IO_SECONDS.time(op="load", doc=name), open(self._journal_path(name), "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], 0
+        REPO_IO_BYTES.inc(len(chunk), op="load", doc=name)
+        end = chunk.rfind(b"\n") + 1
+        rows = []
+        for line in chunk[:end].splitlines():
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue  # ligne tronquée par un arrêt brutal
+        return rows, offset + end
+
+
+    def _apply_rows(self, name: str, doc: Dict[str, Any], rows):
+        # Rejouer le journal = upsert par id, donc idempotent (un journal
+        # rejoué par-dessus un snapshot qui le contient déjà ne change rien)
+        if not rows:
+            return doc, []
+        arr = list(doc.get(name, []))
+        ids = self._journal_ids.setdefault(name, {})
+        changes = []
+        for row in rows:
+            if row["id"] in ids:
+                changes.append((arr[ids[row["id"]]], row))
+                arr[ids[row["id"]]] = row
+            else:
+                changes.append((None, row))
+                ids[row["id"]] = len(arr)
+                arr.append(row)
+        self._journal_rows[name] = self._journal_rows.get(name, 0) + len(rows)
+        return {**doc, name: arr}, changes
+
+
+    def _append_cached(self, name: str, data: Dict[str, Any], rows, jino: int, offset: int):
+        """Reporte dans le cache (version `data`, lue avant l'écriture) des
+        lignes que l'on vient d'ajouter au journal : coût proportionnel aux
+        lignes écrites, pas à l'historique. Appelé sous _exclusive() et
+        _journal_lock."""
+        data, changes = self._apply_rows(name, data, rows)
+        with self._cache_lock:
+            snap_sig = self._cache[name][0][0] if name in self._cache else None
+        self._set_doc(name, (snap_sig, jino, offset), data, changes)
+        if self._journal_rows[name] >= JOURNAL_COMPACT_ROWS:
+            tmp_path, sig = self._write_temp(name, data)
+            self._install(name, data, tmp_path, sig, [])
+
+
+    @blocking
+    def _write_journal(self, name: str, rows) -> Tuple[int, int, int]:
+        """Ajoute les lignes au journal ; renvoie (inode, taille avant, taille après)."""
+        payload = "".join(json.dumps(r, default=str) + "\n" for r in rows).encode()
+        with REPO_IO_SECONDS.time(op="save", doc=name), open(self._journal_path(name), "a+b") as f:
+            start = f.tell()
+            try:
+                if start > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")  # isole une ligne tronquée
+                f.write(payload)
+                f.flush(); os.fsync(f.fileno())
+            except Exception:
+                f.truncate(start)  # pas de lignes écrites à moitié
+                raise
+            REPO_IO_BYTES.inc(len(payload), op="save", doc=name)
+            return os.fstat(f.fileno()).st_ino, start, f.tell()
+
+
+    @blocking
+    def _cut_journal(self, name: str, size: int):
+        # Annule un ajout : le journal revient à sa taille d'avant
+        with open(self._journal_path(name), "r+b") as f:
+            f.truncate(size)
+            f.flush(); os.fsync(f.fileno())
+
+
+    def version(self, name: str) -> Tuple[int, float]:
+        self._doc(name)  # revalide le cache : détecte une modification du fichier
+        return super().version(name)
+
+    def refresh(self):
+        # Un stat par document déjà chargé ; relecture de ceux qui ont changé
+        with self._cache_lock:
+            names = list(self._cache)
+        for name in names:
+            self._doc(name)
+
+    def load(self, name: str) -> Dict[str, Any]:
+        # Copie : les appelants modifient le document avant save()
+        return _copy(self._doc(name))
+
+
+    @contextmanager
+    def _exclusive(self):
+        # Verrou d'écriture : threads du process + autres process sur DB_DIR
+        with self._flocked(self._write_lock, ".write.lock", "repo:write", "repo:flock"):
+            yield
+
+    @contextmanager
+    def _flocked(self, lock, filename: str, lock_name: str, flock_name: str):
+        with waited(lock, lock_name):
+            if not HAS_FCNTL:
+                yield
+                return
+            with open(self.db_dir / filename, "w") as lock_file:
+                # Peut attendre un autre process : hors de la boucle d'événements
+                with LOCK_WAIT_SECONDS.time(lock=flock_name):
+                    offload(fcntl.flock, lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    @blocking
+    def _write_temp(self, name: str, data: Dict[str, Any]) -> Tuple[str, Tuple[int, int, int]]:
         p = self._path(name)
         p.parent.mkdir(parents=True, exist_ok=True)
-        with tempfile.NamedTemporaryFile("w", delete=False, dir=p.parent) as tmp:
-            yaml.dump(data, tmp)
-            tmp.flush(); os.fsync(tmp.fileno())
-            tmp_path = tmp.name
-        os.replace(tmp_path, p)
+        with REPO_IO_SECONDS.time(op="save", doc=name), \
+                tempfile.NamedTemporaryFile("w", delete=False, dir=p.parent) as tmp:
+            try:
+                _yaml_instance().dump(data, tmp)
+                tmp.flush(); os.fsync(tmp.fileno())
+            except Exception:
+                os.unlink(tmp.name)
+                raise
+            # os.replace() conserve inode et mtime du fichier temporaire
+            sig = _signature(os.fstat(tmp.fileno()))
+        REPO_IO_BYTES.inc(sig[2], op="save", doc=name)
+        return tmp.name, sig
 
 
-    def next_id(self, root: Dict[str, Any], key: str, prefix: str) -> str:
-        arr = root.get(key, [])
-        return f"{prefix}{len(arr)+1}"
+    def _install(self, name: str, data: Dict[str, Any], tmp_path: str, sig, changes=None):
+        offload(os.replace, tmp_path, self._path(name))
+        if name in JOURNALED:
+            # Le snapshot contient tout le journal : on peut le vider
+            with self._journal_lock:
+                jino = self._truncate_journal(name)
+                self._journal_ids[name] = {x["id"]: i for i, x in enumerate(data.get(name, []))}
+                self._journal_rows[name] = 0
+                sig = (sig, jino, 0)
+        self._set_doc(name, sig, data, changes)
+
+
+    @blocking
+    def _truncate_journal(self, name: str) -> int:
+        with open(self._journal_path(name), "wb") as f:
+            os.fsync(f.fileno())
+            return os.fstat(f.fileno()).st_ino
+
+
+    def save(self, name: str, data: Dict[str, Any]):
+        with self._exclusive():
+            tmp_path, sig = self._write_temp(name, data)
+            self._install(name, _copy(data), tmp_path, sig)
+
+
+    def _commit(self, puts, deletes, inserts):
+        names = sorted(set(puts) | set(deletes))
+        if not names:
+            return
+        # Sans suppression, un document journalisé ne prend que des ajouts
+        appends = [n for n in names if n in JOURNALED and not deletes.get(n)]
+        with self._exclusive():
+            # 0) Documents relus sous le verrou : un insert sur un id écrit
+            #    entre-temps (autre process compris) échoue avant toute écriture
+            for name, ids in inserts.items():
+                taken = ids & self._index(name).rows.keys()
+                if taken:
+                    raise IdConflict(f"{name}: {', '.join(sorted(taken))} existe(nt) déjà")
+            # 1) Fusion des lignes dans l'état courant et écriture des fichiers
+            #    temporaires ; au moindre échec (ici ou en 2), rien n'est installé
+            staged = []
+            try:
+                for name in names:
+                    if name in appends:
+                        continue
+                    # Les lignes en cache ne sont jamais modifiées : la nouvelle
+                    # version les partage, seules les lignes écrites sont copiées
+                    doc = self._doc(name)
+                    drop = deletes.get(name, set())
+                    rows = {i: copy.deepcopy(x) for i, x in puts.get(name, {}).items()}
+                    arr, changes = [], []
+                    for x in doc.get(name, []):
+                        if x["id"] in drop:
+                            changes.append((x, None))
+                        elif x["id"] in rows:
+                            changes.append((x, rows[x["id"]]))
+                            arr.append(rows.pop(x["id"]))
+                        else:
+                            arr.append(x)
+                    for x in rows.values():
+                        changes.append((None, x))
+                        arr.append(x)
+                    doc = {**doc, name: arr}
+                    staged.append((name, doc, changes) + self._write_temp(name, doc))
+            except Exception:
+                for _, _, _, tmp_path, _ in staged:
+                    os.unlink(tmp_path)
+                raise
+            # 2) Journaux : tous écrits avant d'en exposer un seul dans le cache
+            #    (les lecteurs du process attendent _journal_lock) ; au moindre
+            #    échec, ceux déjà écrits reviennent à leur taille d'avant
+            with self._journal_lock:
+                written = []
+                try:
+                    for name in appends:
+                        data = self._doc(name)  # relit la queue écrite par un autre process
+                        # Le cache ne doit pas partager les objets de l'appelant
+                        rows = copy.deepcopy(list(puts[name].values()))
+                        written.append((name, data, rows) + self._write_journal(name, rows))
+                except Exception:
+                    for name, _, _, _, start, _ in written:
+                        try:
+                            self._cut_journal(name, start)
+                        except OSError:
+                            log.exception("journal %s : annulation de l'ajout impossible", name)
+                    for _, _, _, tmp_path, _ in staged:
+                        os.unlink(tmp_path)
+                    raise
+                for name, data, rows, jino, _, end in written:
+                    self._append_cached(name, data, rows, jino, end)
+            # 3) Installation : une série de renames, sans I/O de sérialisation
+            for name, doc, changes, tmp_path, sig in staged:
+                self._install(name, doc, tmp_path, sig, changes)
 
 
+    def cache_stats(self) -> Dict[str, int]:
+        with self._cache_lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+    # ---------- Accès par ligne (même surface que SqliteRepo) ----------
+    def get(self, name: str, item_id: str) -> Optional[Dict[str, Any]]:
+        item = self._index(name).rows.get(item_id)
+        return copy.deepcopy(item) if item is not None else None
+
+    def find(self, name: str, field: str, value) -> List[Dict[str, Any]]:
+        """Lignes dont `field` vaut `value` (champ de INDEXES), dans l'ordre du document."""
+        index = self._index(name)
+        with self._index_lock:
+            rows = index.find(field, value)
+        return copy.deepcopy(rows)
+
+    def count(self, name: str, field: str, value) -> int:
+        return self._index(name).count(field, value)
+
+    def _reserve_ids(self, name: str, count: int) -> int:
+        # Verrou propre au compteur : une réservation n'attend pas une écriture
+        with self._flocked(self._ids_file_lock, ".ids.lock", "repo:ids", "repo:ids_flock"):
+            counters = self._read_counters()
+            last = max(counters.get(name, 0), self._index(name).top)
+            counters[name] = last + count
+            self._write_counters(counters)
+        return last + 1
+
+    @blocking
+    def _read_counters(self) -> Dict[str, int]:
+        try:
+            with open(self._counters_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @blocking
+    def _write_counters(self, counters: Dict[str, int]):
+        # Sans fsync : un compteur perdu est rattrapé par le plus grand id stocké
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=self.db_dir) as tmp:
+            json.dump(counters, tmp)
+        os.replace(tmp.name, self._counters_path())
+
+    def tail(self, name: str, cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Lignes ajoutées depuis `cursor` (None : toutes) et le nouveau
+        curseur. Pour les documents en ajout seul (JOURNALED) : l'ordre des
+        lignes ne change jamais, une position suffit."""
+        rows = self._doc(name).get(name, [])
+        return copy.deepcopy(rows[cursor or 0:]), len(rows)
+
+
+
+
+def make_repo():
+    """Backend de stockage choisi par DB_BACKEND (yaml par défaut, ou sqlite)."""
+    backend = os.environ.get("DB_BACKEND", "yaml").lower()
+    if backend == "sqlite":
+        from services.sqlite_repo import SqliteRepo
+        return SqliteRepo()
+    if backend != "yaml":
+        raise ValueError(f"Unknown DB_BACKEND: {backend}")
+    return YamlRepo()
 
 
 def ensure_default_data(repo: YamlRepo):
@@ -93,4 +855,10 @@ def ensure_default_data(repo: YamlRepo):
     # bids
     bids = repo.load("bids")
     if not bids:
-        repo.save("bids", {"bids": []})
\ No newline at end of file
+        repo.save("bids", {"bids": []})
+
+
+    # ledger
+    ledger = repo.load("ledger")
+    if not ledger:
+        repo.save("ledger", {"ledger": []})
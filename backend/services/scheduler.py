@@ -0,0 +1,179 @@
+"""Planificateur du cycle de vie des enchères (ouverture / clôture).
+
+Un seul tas (min-heap) d'échéances et un seul thread, au lieu de deux
+jobs APScheduler par enchère :
+
+- `upsert(auction)` (re)planifie l'ouverture et la clôture d'une enchère ;
+  rappeler upsert remplace l'échéance précédente (idempotent) ;
+- `cancel(auction_id)` retire l'enchère ;
+- toutes les échéances atteintes au réveil sont traitées d'un coup :
+  `on_open(ids)` et `on_close(ids)` reçoivent des lots, ce qui compte
+  quand des centaines d'enchères finissent à la même heure.
+
+Les entrées remplacées ou annulées restent dans le tas et sont ignorées
+au moment où elles en sortent (invalidation paresseuse) : upsert et cancel
+sont en O(log n) / O(1), sans parcours du tas.
+
+Si un handler lève, son lot est replanifié après RETRY_MIN_S secondes, puis
+un délai doublé à chaque nouvel échec (au plus RETRY_MAX_S), sauf pour les
+enchères replanifiées ou annulées entre-temps.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from dateutil.parser import isoparse
+
+from services.metrics import SCHEDULER_LAG_SECONDS
+
+log = logging.getLogger(__name__)
+
+# Réveil au moins toutes les MAX_SLEEP secondes (changement d'heure système, etc.)
+MAX_SLEEP = 60.0
+
+# Nouvel essai d'un lot dont le handler a levé
+RETRY_MIN_S = 1.0
+RETRY_MAX_S = 300.0
+
+
+def _ts(value: str) -> float:
+    return isoparse(value).timestamp()
+
+
+class LifecycleScheduler:
+    def __init__(self, on_open: Callable[[List[str]], None],
+                 on_close: Callable[[List[str]], None],
+                 clock: Callable[[], float] = time.time):
+        self.on_open = on_open
+        self.on_close = on_close
+        self.clock = clock
+        self._heap: List[Tuple[float, int, str, str]] = []   # (échéance, seq, kind, auction_id)
+        self._live: Dict[Tuple[str, str], int] = {}          # (kind, auction_id) -> seq valide
+        self._seq = itertools.count()
+        self._failures: Dict[Tuple[str, str], int] = {}     # (kind, auction_id) -> échecs consécutifs
+        self._running: Set[Tuple[str, str]] = set()         # sorties du tas, handler en cours
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    # ---------- Planification ----------
+    def _entries(self, auction) -> List[Tuple[float, str]]:
+        status = auction.get("status", "scheduled")
+        if status == "closed":
+            return []
+        out = [(_ts(auction["end_at"]), "close")]
+        if status == "scheduled":
+            out.append((_ts(auction["start_at"]), "open"))
+        return out
+
+    def _push(self, when: float, kind: str, auction_id: str):
+        seq = next(self._seq)
+        self._live[(kind, auction_id)] = seq
+        heapq.heappush(self._heap, (when, seq, kind, auction_id))
+
+    def load(self, auctions: Iterable[dict]):
+        """Planifie un lot d'enchères (démarrage) : un seul heapify."""
+        with self._cond:
+            for a in auctions:
+                try:
+                    entries = self._entries(a)
+                except Exception:
+                    continue
+                for kind in ("open", "close"):
+                    self._live.pop((kind, a["id"]), None)
+                for when, kind in entries:
+                    seq = next(self._seq)
+                    self._live[(kind, a["id"])] = seq
+                    self._heap.append((when, seq, kind, a["id"]))
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def upsert(self, auction: dict):
+        """(Re)planifie une enchère à partir de son statut et de ses dates."""
+        entries = self._entries(auction)
+        with self._cond:
+            for kind in ("open", "close"):
+                self._live.pop((kind, auction["id"]), None)
+                self._running.discard((kind, auction["id"]))
+            for when, kind in entries:
+                self._push(when, kind, auction["id"])
+            self._cond.notify()
+
+    def cancel(self, auction_id: str):
+        with self._cond:
+            for kind in ("open", "close"):
+                self._live.pop((kind, auction_id), None)
+                self._failures.pop((kind, auction_id), None)
+                self._running.discard((kind, auction_id))
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._live)
+
+    # ---------- Exécution ----------
+    def _pop_due(self, now: float) -> Dict[str, List[str]]:
+        due = {"open": [], "close": []}
+        while self._heap and self._heap[0][0] <= now:
+            when, seq, kind, aid = heapq.heappop(self._heap)
+            if self._live.get((kind, aid)) != seq:
+                continue  # remplacée ou annulée
+            del self._live[(kind, aid)]
+            self._running.add((kind, aid))
+            due[kind].append(aid)
+            SCHEDULER_LAG_SECONDS.observe(max(now - when, 0.0), kind=kind)
+        return due
+
+    def run_due(self) -> Dict[str, List[str]]:
+        """Traite tout ce qui est échu maintenant (ouvertures avant clôtures)."""
+        with self._cond:
+            due = self._pop_due(self.clock())
+        for kind, handler in (("open", self.on_open), ("close", self.on_close)):
+            if due[kind]:
+                try:
+                    handler(due[kind])
+                except Exception:
+                    log.exception("%s %s a échoué, nouvel essai planifié", kind, due[kind])
+                    self._retry(kind, due[kind])
+                else:
+                    with self._cond:
+                        for aid in due[kind]:
+                            self._failures.pop((kind, aid), None)
+                            self._running.discard((kind, aid))
+        return due
+
+    def _retry(self, kind: str, auction_ids: List[str]):
+        with self._cond:
+            now = self.clock()
+            for aid in auction_ids:
+                if (kind, aid) not in self._running:
+                    continue  # replanifiée ou annulée pendant le traitement
+                self._running.discard((kind, aid))
+                failures = self._failures.get((kind, aid), 0)
+                self._failures[(kind, aid)] = failures + 1
+                self._push(now + min(RETRY_MIN_S * 2 ** failures, RETRY_MAX_S), kind, aid)
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                delay = MAX_SLEEP
+                if self._heap:
+                    delay = min(max(self._heap[0][0] - self.clock(), 0.0), MAX_SLEEP)
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.run_due()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="auction-lifecycle", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
@@ -0,0 +1,117 @@
+"""Index inversé plein texte sur le titre et la description des produits.
+
+Jetons : mots en minuscules, sans accents. Une requête « peug 208 » renvoie
+les produits qui contiennent, pour chaque mot de la requête, au moins un
+jeton commençant par ce mot (ET entre les mots, préfixe sur chacun).
+Le coût d'une recherche dépend du nombre de jetons/produits trouvés, pas
+de la taille du catalogue.
+
+L'index vit en mémoire, par processus : il est construit au démarrage
+depuis le repo puis tenu à jour par `repo.add_listener` (création, import
+en masse, modification ou suppression de produit), y compris pour les
+écritures des autres process rattrapées par `repo.refresh()`.
+"""
+from bisect import bisect_left, insort
+from collections import Counter
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set
+
+_WORD = re.compile(r"\w+")
+
+# Un mot du titre compte plus qu'un mot de la description
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}  # jeton -> {product_id: poids}
+        self._terms: List[str] = []                       # jetons triés (recherche par préfixe)
+        self._docs: Dict[str, Set[str]] = {}              # product_id -> jetons
+
+    @classmethod
+    def from_repo(cls, repo) -> "SearchIndex":
+        index = cls()
+        for p in repo.load("products").get("products", []):
+            index.add(p)
+        repo.add_listener(index.apply)
+        return index
+
+    def apply(self, puts, deletes) -> None:
+        """Listener du repo : répercute les écritures de produits."""
+        for p in puts.get("products", {}).values():
+            self.add(p)
+        for pid in deletes.get("products", ()):
+            self.remove(pid)
+
+    def add(self, product: Dict) -> None:
+        """Indexe (ou ré-indexe) un produit."""
+        weights = Counter()
+        for tok in tokenize(product.get("title", "")):
+            weights[tok] += TITLE_WEIGHT
+        for tok in tokenize(product.get("description", "")):
+            weights[tok] += DESCRIPTION_WEIGHT
+        pid = product["id"]
+        with self._lock:
+            self._remove(pid)
+            for tok, w in weights.items():
+                posting = self._postings.get(tok)
+                if posting is None:
+                    posting = self._postings[tok] = {}
+                    insort(self._terms, tok)
+                posting[pid] = w
+            self._docs[pid] = set(weights)
+
+    def remove(self, product_id: str) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, pid: str) -> None:
+        for tok in self._docs.pop(pid, ()):
+            posting = self._postings[tok]
+            posting.pop(pid, None)
+            if not posting:
+                del self._postings[tok]
+                del self._terms[bisect_left(self._terms, tok)]
+
+    def _expand(self, prefix: str) -> Iterable[str]:
+        i = bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            yield self._terms[i]
+            i += 1
+
+    def search(self, query: str) -> Dict[str, int]:
+        """Renvoie {product_id: score} des produits qui correspondent à tous les mots.
+
+        Le score (somme des poids des jetons trouvés) sert au tri par pertinence.
+        """
+        words = tokenize(query)
+        if not words:
+            return {}
+        with self._lock:
+            per_word = []
+            for word in words:
+                hits: Dict[str, int] = {}
+                for tok in self._expand(word):
+                    for pid, w in self._postings[tok].items():
+                        hits[pid] = hits.get(pid, 0) + w
+                if not hits:
+                    return {}
+                per_word.append(hits)
+        # Mot le plus sélectif d'abord : l'intersection rétrécit vite
+        per_word.sort(key=len)
+        scores = dict(per_word[0])
+        for hits in per_word[1:]:
+            scores = {pid: s + hits[pid] for pid, s in scores.items() if pid in hits}
+            if not scores:
+                break
+        return scores
@@ -0,0 +1,67 @@
+"""Mode de service du serveur Socket.IO (ASYNC_MODE).
+
+- threading (défaut) : un thread par connexion, suffisant en développement ;
+- gevent : serveur coopératif, une greenlet par connexion. Quelques Ko par
+  client au lieu d'un thread : des milliers de WebSockets par worker.
+  Point d'entrée de production : wsgi.py (gunicorn, worker gevent).
+
+En gevent toutes les greenlets partagent un seul thread : un appel qui
+bloque (lecture/parse YAML, fsync, requête SQLite, flock) gèlerait tous les
+clients du worker. Les fonctions marquées `@blocking` s'exécutent alors dans
+le pool de threads natifs du hub ; la greenlet appelante attend sans bloquer
+les autres. En threading, `@blocking` appelle directement la fonction.
+Le travail de fond (CPU) passe par un `worker_pool()` dédié.
+"""
+from concurrent.futures import Executor, ThreadPoolExecutor
+import functools
+import os
+
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "threading")
+ASYNC_MODES = ("threading", "gevent")
+
+if ASYNC_MODE not in ASYNC_MODES:
+    raise ValueError(f"ASYNC_MODE inconnu: {ASYNC_MODE} (attendu: {', '.join(ASYNC_MODES)})")
+
+_hub_thread = None  # ident natif du thread qui fait tourner le hub gevent
+
+
+def monkey_patch():
+    """À appeler avant tout autre import (threading, socket, time.sleep...).
+    Sans effet en mode threading ; idempotent."""
+    global _hub_thread
+    if ASYNC_MODE != "gevent" or _hub_thread is not None:
+        return
+    from gevent import monkey
+    monkey.patch_all()
+    _hub_thread = monkey.get_original("threading", "get_ident")()
+
+
+def offload(fn, *args, **kwargs):
+    """Exécute `fn` hors de la boucle d'événements (gevent), sinon directement."""
+    if _hub_thread is None:
+        return fn(*args, **kwargs)
+    from gevent import get_hub, monkey
+    if monkey.get_original("threading", "get_ident")() != _hub_thread:
+        # Déjà dans un thread natif (pool) : pas de boucle à protéger
+        return fn(*args, **kwargs)
+    return get_hub().threadpool.apply(fn, args, kwargs)
+
+
+def blocking(fn):
+    """Décorateur : `fn` fait des I/O bloquantes, voir offload()."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return offload(fn, *args, **kwargs)
+    return wrapper
+
+
+def worker_pool(size: int, name: str) -> Executor:
+    """Pool de threads natifs pour du travail de fond (submit/shutdown).
+
+    En gevent, threading est patché : les threads d'un ThreadPoolExecutor
+    seraient des greenlets et un calcul bloquerait la boucle. On prend
+    alors le pool natif de gevent, distinct de celui du hub (offload)."""
+    if _hub_thread is None:
+        return ThreadPoolExecutor(max_workers=size, thread_name_prefix=name)
+    from gevent.threadpool import ThreadPoolExecutor as NativePoolExecutor
+    return NativePoolExecutor(max_workers=size)
@@ -0,0 +1,287 @@
+"""Backend SQLite (DB_BACKEND=sqlite), même surface que YamlRepo.
+
+Une table par entité, avec les colonnes filtrées indexées et le document
+complet en JSON dans `body`. Les écritures par ligne (put) ne touchent que
+les lignes modifiées, au lieu de réécrire tout le fichier YAML.
+
+Chaque écriture incrémente la révision de la base (table `revision`) et
+marque ses lignes (`rev`, `writer`) ; une suppression laisse une ligne dans
+`tombstones`. refresh() relit ce qui a changé depuis la dernière révision
+vue et le passe aux listeners, sauf les écritures de ce process.
+
+Migration d'un DB_DIR YAML existant :
+    python -m services.sqlite_repo migrate [--from DIR] [--to FICHIER]
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.repo import DB_DIR, BaseRepo, IdConflict, YamlRepo
+from services.serving import blocking
+
+SQLITE_PATH = Path(os.environ.get("SQLITE_PATH", str(DB_DIR / "auctionnet.sqlite3"))).resolve()
+
+# Suffixe numérique d'un id ("b_42" -> 42, "open_u_1" -> 0), indexé : MAX() en O(log n)
+ID_NUMBER = "CAST(substr(id, instr(id, '_') + 1) AS INTEGER)"
+
+# entité -> colonnes indexées (extraites du document à chaque écriture)
+TABLES = {
+    "users": ("email",),
+    "products": ("owner_id", "category"),
+    "auctions": ("product_id", "status"),
+    "bids": ("auction_id", "user_id"),
+    "ledger": ("user_id",),
+}
+
+
+class SqliteRepo(BaseRepo):
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path).resolve() if path else SQLITE_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Verrous par clé partagés entre process : une transaction relit et
+        # réécrit ses lignes sans qu'un autre worker s'intercale
+        super().__init__(lock_dir=self.path.with_name(self.path.name + ".locks"))
+        # Une connexion par thread (sqlite3 n'aime pas le partage) ; en
+        # ASYNC_MODE=gevent les requêtes passent par @blocking, donc par les
+        # threads du pool
+        self._local = threading.local()
+        # Auteur des écritures de ce process, et dernière révision relue
+        self._writer = uuid.uuid4().hex
+        self._refresh_lock = threading.Lock()
+        self._init_schema()
+        (self._seen,) = self._conn().execute("SELECT n FROM revision").fetchone()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, body TEXT NOT NULL)")
+        # Dernier id réservé par entité (new_id)
+        conn.execute("CREATE TABLE IF NOT EXISTS ids (name TEXT PRIMARY KEY, last INTEGER NOT NULL)")
+        # Révision de la base et lignes supprimées (refresh des autres process)
+        conn.execute("CREATE TABLE IF NOT EXISTS revision (n INTEGER NOT NULL)")
+        conn.execute("INSERT INTO revision (n) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM revision)")
+        conn.execute("CREATE TABLE IF NOT EXISTS tombstones "
+                     "(name TEXT NOT NULL, id TEXT NOT NULL, rev INTEGER NOT NULL, writer TEXT, "
+                     "PRIMARY KEY (name, id))")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tombstones_rev ON tombstones(rev)")
+        for table, cols in TABLES.items():
+            extra = "".join(f", {c} TEXT" for c in cols)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                f"(seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL{extra}, body TEXT NOT NULL, "
+                f"rev INTEGER NOT NULL DEFAULT 0, writer TEXT)"
+            )
+            # Base créée avant le suivi des révisions
+            have = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+            if "rev" not in have:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN writer TEXT")
+            for c in cols:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{c} ON {table}({c})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_id_number ON {table}({ID_NUMBER})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_rev ON {table}(rev)")
+
+    def _upsert(self, conn, name: str, item: Dict[str, Any], rev: int, writer: Optional[str],
+                insert: bool = False):
+        # insert : INSERT simple, un id existant lève IntegrityError
+        cols = TABLES[name] + ("body", "rev", "writer")
+        names = ", ".join(("id",) + cols)
+        marks = ", ".join("?" * (len(cols) + 1))
+        updates = ", ".join(f"{c}=excluded.{c}" for c in cols)
+        values = [item["id"]] + [item.get(c) for c in TABLES[name]] + [json.dumps(item), rev, writer]
+        conflict = "" if insert else f" ON CONFLICT(id) DO UPDATE SET {updates}"
+        conn.execute(f"INSERT INTO {name} ({names}) VALUES ({marks}){conflict}", values)
+
+    def _next_rev(self, conn) -> int:
+        # Sous BEGIN IMMEDIATE : une révision par écriture, dans l'ordre des commits
+        conn.execute("UPDATE revision SET n = n + 1")
+        (rev,) = conn.execute("SELECT n FROM revision").fetchone()
+        return rev
+
+    def _bury(self, conn, name: str, ids, rev: int, writer: Optional[str]):
+        conn.executemany(
+            "INSERT INTO tombstones (name, id, rev, writer) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name, id) DO UPDATE SET rev=excluded.rev, writer=excluded.writer",
+            [(name, i, rev, writer) for i in ids])
+
+    # ---------- Surface YamlRepo ----------
+    @blocking
+    def load(self, name: str) -> Dict[str, Any]:
+        conn = self._conn()
+        if name in TABLES:
+            rows = conn.execute(f"SELECT body FROM {name} ORDER BY seq").fetchall()
+            return {name: [json.loads(r[0]) for r in rows]}
+        row = conn.execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    @blocking
+    def save(self, name: str, data: Dict[str, Any]):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if name in TABLES:
+                # Sans auteur : refresh() le transmet à tous les process, celui-ci compris
+                rev = self._next_rev(conn)
+                items = data.get(name, [])
+                ids = [x["id"] for x in items]
+                gone = [r[0] for r in conn.execute(
+                    f"SELECT id FROM {name} WHERE id NOT IN (SELECT value FROM json_each(?))",
+                    (json.dumps(ids),),
+                )]
+                conn.executemany(f"DELETE FROM {name} WHERE id = ?", [(i,) for i in gone])
+                self._bury(conn, name, gone, rev, None)
+                for item in items:
+                    self._upsert(conn, name, item, rev, None)
+            else:
+                conn.execute(
+                    "INSERT INTO documents (name, body) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET body=excluded.body",
+                    (name, json.dumps(data)),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._bump(name)
+
+    def cache_stats(self) -> Dict[str, int]:
+        # Pas de cache applicatif : SQLite garde ses pages en mémoire
+        return {}
+
+    # ---------- Accès par ligne ----------
+    @blocking
+    def get(self, name: str, item_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(f"SELECT body FROM {name} WHERE id = ?", (item_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @blocking
+    def find(self, name: str, field: str, value) -> List[Dict[str, Any]]:
+        if field not in TABLES[name]:
+            raise KeyError(field)
+        rows = self._conn().execute(
+            f"SELECT body FROM {name} WHERE {field} = ? ORDER BY seq", (value,)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    @blocking
+    def count(self, name: str, field: str, value) -> int:
+        if field not in TABLES[name]:
+            raise KeyError(field)
+        (n,) = self._conn().execute(f"SELECT COUNT(*) FROM {name} WHERE {field} = ?", (value,)).fetchone()
+        return n
+
+    @blocking
+    def _reserve_ids(self, name: str, count: int) -> int:
+        # BEGIN IMMEDIATE : un seul process réserve à la fois
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (top,) = conn.execute(f"SELECT COALESCE(MAX({ID_NUMBER}), 0) FROM {name}").fetchone()
+            row = conn.execute("SELECT last FROM ids WHERE name = ?", (name,)).fetchone()
+            last = max(top, row[0] if row else 0)
+            conn.execute("INSERT INTO ids (name, last) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET last=excluded.last", (name, last + count))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return last + 1
+
+    @blocking
+    def tail(self, name: str, cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        # Curseur = dernier seq lu (AUTOINCREMENT : jamais réutilisé)
+        rows = self._conn().execute(
+            f"SELECT seq, body FROM {name} WHERE seq > ? ORDER BY seq", (cursor or 0,)
+        ).fetchall()
+        return [json.loads(r[1]) for r in rows], (rows[-1][0] if rows else cursor or 0)
+
+    @blocking
+    def _commit(self, puts, deletes, inserts):
+        # Une seule transaction SQLite : toutes les lignes ou aucune
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rev = self._next_rev(conn)
+            for name, rows in puts.items():
+                new = inserts.get(name, ())
+                for item in rows.values():
+                    try:
+                        self._upsert(conn, name, item, rev, self._writer, insert=item["id"] in new)
+                    except sqlite3.IntegrityError:
+                        raise IdConflict(f"{name}: {item['id']} existe déjà")
+            for name, ids in deletes.items():
+                conn.executemany(f"DELETE FROM {name} WHERE id = ?", [(i,) for i in ids])
+                self._bury(conn, name, ids, rev, self._writer)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+    def refresh(self):
+        # Sous verrou : chaque révision n'est transmise qu'une fois, dans l'ordre
+        with self._refresh_lock:
+            self._seen, puts, deletes = self._changes_since(self._seen)
+            if puts or deletes:
+                self._bump(*(set(puts) | set(deletes)))
+                self._emit(puts, deletes)
+
+    @blocking
+    def _changes_since(self, seen: int):
+        """(révision, lignes écrites, ids supprimés) par d'autres depuis `seen`."""
+        # Une transaction de lecture : révision et lignes du même instantané
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            (rev,) = conn.execute("SELECT n FROM revision").fetchone()
+            puts, deletes = {}, {}
+            if rev == seen:
+                return rev, puts, deletes
+            for name in TABLES:
+                rows = conn.execute(
+                    f"SELECT body FROM {name} WHERE rev > ? AND writer IS NOT ? ORDER BY seq",
+                    (seen, self._writer)).fetchall()
+                if rows:
+                    puts[name] = {x["id"]: x for x in (json.loads(r[0]) for r in rows)}
+            for name, item_id in conn.execute(
+                    "SELECT name, id FROM tombstones WHERE rev > ? AND writer IS NOT ?", (seen, self._writer)):
+                if item_id not in puts.get(name, {}):
+                    deletes.setdefault(name, set()).add(item_id)
+        finally:
+            conn.execute("COMMIT")
+        return rev, puts, deletes
+
+
+def migrate_from_yaml(src: YamlRepo, dst: SqliteRepo):
+    """Importe tous les documents d'un DB_DIR YAML (écrase le contenu SQLite)."""
+    for name in list(TABLES) + ["categories"]:
+        doc = src.load(name)
+        if doc:
+            dst.save(name, doc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outils du backend SQLite")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate", help="Importer un DB_DIR YAML existant")
+    mig.add_argument("--from", dest="src", default=str(DB_DIR))
+    mig.add_argument("--to", dest="dst", default=str(SQLITE_PATH))
+    args = parser.parse_args()
+
+    src, dst = YamlRepo(Path(args.src)), SqliteRepo(Path(args.dst))
+    migrate_from_yaml(src, dst)
+    for name in TABLES:
+        print(f"{name}: {len(dst.load(name).get(name, []))}")
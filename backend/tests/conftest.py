@@ -0,0 +1,74 @@
+import atexit
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# DB_DIR et MEDIA_ROOT sont lus à l'import : jamais la base locale de développement
+if "DB_DIR" not in os.environ:
+    os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="auctionnet-tests-")
+    atexit.register(shutil.rmtree, os.environ["DB_DIR"], True)
+os.environ.setdefault("MEDIA_ROOT", os.path.join(os.environ["DB_DIR"], "media"))
+# Hachage dans le process : pas de pool à démarrer pour chaque test
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+os.environ.setdefault("JWT_SECRET", "tests-" + "0" * 32)
+
+from services import repo as repo_module  # noqa: E402
+from services.repo import YamlRepo  # noqa: E402
+from services.sqlite_repo import SqliteRepo  # noqa: E402
+
+
+@pytest.fixture(params=["yaml", "sqlite"])
+def make_repo(request, tmp_path):
+    """Fabrique de repos sur une même base : chaque appel est un nouveau
+    process (redémarrage ou autre worker) qui ne partage que le stockage."""
+    def make():
+        if request.param == "yaml":
+            return YamlRepo(tmp_path)
+        return SqliteRepo(tmp_path / "db.sqlite3")
+    return make
+
+
+@pytest.fixture
+def repo(make_repo):
+    return make_repo()
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Fabrique de l'application complète (create_app) sur une base et des
+    médias vides ; les constantes de app.py peuvent être patchées avant."""
+    import app as app_module
+    monkeypatch.setattr(repo_module, "DB_DIR", tmp_path / "db")
+    monkeypatch.setattr(app_module, "MEDIA_ROOT", tmp_path / "media")
+    (tmp_path / "db").mkdir()
+    (tmp_path / "media").mkdir()
+
+    def make():
+        flask_app, _ = app_module.create_app()
+        return flask_app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def signup(client):
+    """Inscrit puis connecte un email ; renvoie les en-têtes d'authentification."""
+    def signup(email, password="secret123"):
+        client.post("/api/auth/register", json={"email": email, "password": password})
+        r = client.post("/api/auth/login", json={"email": email, "password": password})
+        return {"Authorization": f"Bearer {r.get_json()['access_token']}"}
+    return signup
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+import threading
+
+
+def _auction(client, seller, **product):
+    pid = client.post("/api/products", headers=seller,
+                      json={"title": "Peugeot 208", "description": "Essence 2019", "category": "vehicule",
+                            "condition": "used", **product}).get_json()["id"]
+    now = datetime.now(timezone.utc)
+    return client.post("/api/auctions", headers=seller,
+                       json={"product_id": pid, "start_price": 100, "min_increment": 10,
+                             "start_at": (now - timedelta(minutes=1)).isoformat(),
+                             "end_at": (now + timedelta(hours=1)).isoformat()}).get_json()["id"]
+
+
+def test_listing_shows_bids_not_yet_written(app, client, signup, monkeypatch):
+    seller, buyer = signup("alice@example.com"), signup("bob@example.com")
+    aid = _auction(client, seller)
+    engine = app.extensions["auction_engine"]
+    first = client.get("/api/auctions")
+
+    # Écriture retenue : la mise n'existe que dans le moteur
+    release, persist = threading.Event(), engine._persist
+    monkeypatch.setattr(engine, "_persist", lambda ops, retry=False: (release.wait(), persist(ops, retry)))
+    assert client.post(f"/api/auctions/{aid}/bids", headers=buyer, json={"amount": 130}).status_code == 201
+    listed = client.get("/api/auctions", headers={"If-None-Match": first.headers["ETag"]})
+    assert listed.status_code == 200
+    [a] = listed.get_json()["auctions"]
+    assert a["current_price"] == 130 and a["bids_count"] == 1
+
+    release.set()
+    engine.flush()
+    assert client.get("/api/auctions").get_json()["auctions"][0]["current_price"] == 130
+
+
+def test_listing_sorts_on_the_server(app, client, signup):
+    seller, buyer = signup("alice@example.com"), signup("bob@example.com")
+    first, second, third = (_auction(client, seller) for _ in range(3))
+    for aid, amount in ((first, 150), (third, 120)):
+        client.post(f"/api/auctions/{aid}/bids", headers=buyer, json={"amount": amount})
+    app.extensions["auction_engine"].flush()
+
+    def ids(sort, limit=200):
+        out, cursor = [], None
+        while True:
+            params = {"sort": sort, "limit": limit, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/api/auctions", query_string=params).get_json()
+            out += [a["id"] for a in page["auctions"]]
+            if not (cursor := page["next_cursor"]):
+                return out
+
+    assert ids("price_asc") == [second, third, first]
+    assert ids("price_desc", limit=1) == [first, third, second]
+    assert ids("recent") == [third, second, first]
+    assert client.get("/api/auctions?sort=cheapest").status_code == 400
+
+
+def test_my_auctions_and_bids(app, client, signup, monkeypatch):
+    seller, buyer = signup("alice@example.com"), signup("bob@example.com")
+    sold, other = _auction(client, seller), _auction(client, seller)
+    client.post(f"/api/auctions/{sold}/bids", headers=buyer, json={"amount": 110})
+    engine = app.extensions["auction_engine"]
+    engine.flush()
+
+    assert {a["id"] for a in client.get("/api/my/auctions", headers=seller).get_json()["auctions"]} == {sold, other}
+    assert client.get("/api/my/auctions", headers=buyer).get_json() == {"auctions": []}
+    assert client.get("/api/my/bids", headers=seller).get_json() == {"auctions": []}
+
+    # Seconde mise retenue dans le moteur : déjà comptée
+    release, persist = threading.Event(), engine._persist
+    monkeypatch.setattr(engine, "_persist", lambda ops, retry=False: (release.wait(), persist(ops, retry)))
+    client.post(f"/api/auctions/{sold}/bids", headers=buyer, json={"amount": 140})
+    [a] = client.get("/api/my/bids", headers=buyer).get_json()["auctions"]
+    release.set()
+    engine.flush()
+    assert (a["id"], a["my_bid"], a["my_bids_count"], a["current_price"]) == (sold, 140, 2, 140)
+    assert a["product"]["title"] == "Peugeot 208"
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta, timezone
+
+from services.auctions import close_due_auctions
+
+
+def test_close_skips_auction_whose_winning_bid_is_missing(repo):
+    ended = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    repo.insert("users", {"id": "u_1", "email": "buyer@x"}, {"id": "u_2", "email": "seller@x"})
+    repo.insert("products", {"id": "p_1", "owner_id": "u_2"}, {"id": "p_2", "owner_id": "u_2"})
+    repo.insert("bids", {"id": "b_1", "auction_id": "a_1", "user_id": "u_1", "amount": 20.0})
+    repo.insert("auctions",
+                {"id": "a_1", "product_id": "p_1", "status": "running", "end_at": ended,
+                 "current_price": 20.0, "current_bid_id": "b_1"},
+                {"id": "a_2", "product_id": "p_2", "status": "running", "end_at": ended,
+                 "current_price": 30.0, "current_bid_id": "b_404"})
+
+    closed = close_due_auctions(repo, ["a_1", "a_2"])
+
+    assert [a["id"] for a in closed] == ["a_1"]
+    assert repo.get("auctions", "a_1")["winner_id"] == "u_1"
+    assert repo.get("auctions", "a_2")["status"] == "running"
+    assert [e["type"] for e in repo.find("ledger", "user_id", "u_1")] == ["settle"]
@@ -0,0 +1,78 @@
+import pytest
+
+import app as app_module
+from services import auth
+from services.auth import LoginThrottle, check_password, hash_password, needs_rehash
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_email_limit_and_window(clock):
+    throttle = LoginThrottle(per_email=3, per_ip=100, window=60)
+    assert [throttle.attempt("Alice@x", "10.0.0.1") for _ in range(3)] == [0, 0, 0]
+    # Même email (casse ignorée), autre IP : toujours refusé
+    assert throttle.attempt("alice@x", "10.0.0.2") == 60
+    clock[0] += 45
+    assert throttle.attempt("alice@x", "10.0.0.1") == 15
+    clock[0] += 16
+    assert throttle.attempt("alice@x", "10.0.0.1") == 0
+
+
+def test_success_resets_email_but_not_ip(clock):
+    throttle = LoginThrottle(per_email=2, per_ip=3, window=60)
+    throttle.attempt("alice@x", "10.0.0.1")
+    throttle.attempt("alice@x", "10.0.0.1")
+    throttle.succeeded("alice@x")
+    assert throttle.attempt("alice@x", "10.0.0.1") == 0
+    # Limite par IP : la quatrième tentative depuis cette adresse, quel que soit l'email
+    assert throttle.attempt("bob@x", "10.0.0.1") == 60
+
+
+def test_refused_attempts_are_not_counted(clock):
+    throttle = LoginThrottle(per_email=1, per_ip=100, window=60)
+    throttle.attempt("alice@x", "10.0.0.1")
+    clock[0] += 30
+    # Refusées : elles ne repoussent pas la fin de la fenêtre
+    assert all(throttle.attempt("alice@x", "10.0.0.1") for _ in range(10))
+    clock[0] += 31
+    assert throttle.attempt("alice@x", "10.0.0.1") == 0
+
+
+def test_password_hashes():
+    h = hash_password("secret123")
+    assert check_password("secret123", h) and not check_password("wrong", h)
+    assert not needs_rehash(h)
+
+
+def _failed_logins(client, n, forwarded_for=None, remote="10.0.0.1"):
+    codes = []
+    for i in range(n):
+        headers = {"X-Forwarded-For": forwarded_for or f"198.51.100.{i}"}
+        r = client.post("/api/auth/login", json={"email": f"user{i}@example.com", "password": "wrong-pass"},
+                        headers=headers, environ_base={"REMOTE_ADDR": remote})
+        codes.append(r.status_code)
+    return codes
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(app, client):
+    app.extensions["login_throttle"].limits["ip"] = 3
+    # X-Forwarded-For changé à chaque requête : la limite suit la connexion
+    assert _failed_logins(client, 5) == [401, 401, 401, 429, 429]
+
+
+def test_trusted_proxy_limits_the_forwarded_client(make_app, monkeypatch):
+    monkeypatch.setattr(app_module, "TRUSTED_PROXIES", 1)
+    app = make_app()
+    app.extensions["login_throttle"].limits["ip"] = 3
+    client = app.test_client()
+    # Derrière le proxy : une limite par client, pas une pour le proxy entier
+    assert _failed_logins(client, 5, remote="10.0.0.254") == [401] * 5
+    assert _failed_logins(client, 4, forwarded_for="203.0.113.7", remote="10.0.0.254") == [401, 401, 401, 429]
+    # Seule la dernière entrée (ajoutée par le proxy) compte : le client ne choisit pas son IP
+    spoofed = _failed_logins(client, 1, forwarded_for="1.2.3.4, 203.0.113.7", remote="10.0.0.254")
+    assert spoofed == [429]
@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from services.bulk import Importer, export
+from services.ledger import Ledger, entry
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def _product(ref, owner, title):
+    return {"id": ref, "owner_id": owner, "title": title, "description": "Laiton", "category": "art",
+            "condition": "used"}
+
+
+def _files(tmp_path, users=None, products=None, auctions=None):
+    users = users or ["id,email,password,balance", "alice,alice@example.com,secret123,250.5",
+                      "bob,bob@example.com,secret123,0"]
+    products = products or [_product("lamp", "alice", "Lampe")]
+    auctions = auctions or ["id,product_id,start_price,start_at,end_at",
+                            "x,lamp,10,2030-01-01T10:00:00+01:00,2030-01-02T10:00:00+01:00"]
+    paths = {"users": tmp_path / "users.csv", "products": tmp_path / "products.jsonl",
+             "auctions": tmp_path / "auctions.csv"}
+    paths["users"].write_text("\n".join(users) + "\n")
+    paths["products"].write_text("".join(json.dumps(p) + "\n" for p in products))
+    paths["auctions"].write_text("\n".join(auctions) + "\n")
+    return paths
+
+
+def _import(repo, paths, **kw):
+    errors = io.StringIO()
+    importer = Importer(repo, errors=errors, **kw)
+    for kind, path in paths.items():
+        importer.run(kind, str(path))
+    return importer, errors.getvalue()
+
+
+def test_references_between_files_get_repo_ids(repo, tmp_path):
+    importer, _ = _import(repo, _files(tmp_path))
+    assert importer.stats == {"users": [2, 0], "products": [1, 0], "auctions": [1, 0]}
+    [alice] = repo.find("users", "email", "alice@example.com")
+    [product] = repo.find("products", "owner_id", alice["id"])
+    [auction] = repo.find("auctions", "product_id", product["id"])
+    assert alice["id"].startswith("u_") and product["id"].startswith("p_")
+    assert auction["status"] == "scheduled" and auction["current_price"] == 10.0
+    assert Ledger(repo).totals(alice["id"]) == {"balance": 25050, "held": 0}
+    assert "password" not in alice and alice["password_hash"]
+
+
+def test_invalid_rows_are_reported_and_skipped(repo, tmp_path):
+    paths = _files(tmp_path, users=["id,email,password", "alice,not-an-email,secret123",
+                                    "bob,bob@example.com,secret123", "bob2,bob@example.com,secret123"],
+                   products=[_product("lamp", "alice", "Lampe"), _product("vase", "bob", "Vase")])
+    importer, errors = _import(repo, paths)
+    assert importer.stats == {"users": [1, 2], "products": [1, 1], "auctions": [0, 1]}
+    assert f"{paths['users']}:2: " in errors and "Email already registered" in errors
+    assert f"{paths['products']}:1: " in errors and "alice introuvable" in errors
+    assert [p["title"] for p in repo.load("products")["products"]] == ["Vase"]
+
+
+def test_dry_run_allocates_no_ids(repo, tmp_path):
+    importer, _ = _import(repo, _files(tmp_path), dry_run=True)
+    assert importer.stats == {"users": [2, 0], "products": [1, 0], "auctions": [1, 0]}
+    assert not repo.load("users").get("users")
+    assert repo.new_id("users", prefix="u_") == "u_1"
+
+
+def test_export_reports_ledger_balances(repo, tmp_path):
+    _import(repo, _files(tmp_path))
+    [alice] = repo.find("users", "email", "alice@example.com")
+    repo.insert("ledger", entry(repo, "hold", alice["id"], 2000, auction_id="a_1"))
+    out = io.StringIO()
+    assert export(repo, "users", out, "csv") == 2
+    rows = {r["email"]: r for r in csv.DictReader(io.StringIO(out.getvalue()))}
+    assert (rows["alice@example.com"]["balance"], rows["alice@example.com"]["held"]) == ("250.5", "20.0")
+    assert rows["bob@example.com"]["balance"] == "0.0"
+    assert "password_hash" not in rows["bob@example.com"]
+
+
+def _cli(db_dir, *args):
+    env = {**os.environ, "DB_DIR": str(db_dir), "DB_BACKEND": "yaml", "PASSWORD_WORKERS": "0"}
+    return subprocess.run([sys.executable, "-m", "services.bulk", *args], cwd=BACKEND, env=env,
+                          capture_output=True, text=True, timeout=60)
+
+
+def test_cli_dry_run_writes_nothing_and_exit_code(tmp_path):
+    db = tmp_path / "db"
+    paths = _files(tmp_path)
+    args = ["import", "--users", str(paths["users"]), "--products", str(paths["products"]),
+            "--auctions", str(paths["auctions"])]
+
+    dry = _cli(db, *args, "--dry-run")
+    assert dry.returncode == 0, dry.stderr
+    assert [p for p in db.rglob("*") if p.is_file()] == []
+
+    # Aucun id réservé par l'essai : le vrai import commence à u_1
+    assert _cli(db, *args).returncode == 0
+    users = [json.loads(line) for line in _cli(db, "export", "users").stdout.splitlines()]
+    assert [(u["id"], u["email"]) for u in users] == [("u_1", "alice@example.com"), ("u_2", "bob@example.com")]
+
+    # Même fichier une seconde fois : emails déjà en base, lignes rejetées
+    again = _cli(db, "import", "--users", str(paths["users"]))
+    assert again.returncode == 1 and "Email already registered" in again.stderr
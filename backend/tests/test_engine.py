@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services import auctions
+from services.auctions import AuctionEngine, EngineUnavailable
+from services.ledger import Ledger
+
+
+@pytest.fixture
+def engine(repo, monkeypatch):
+    monkeypatch.setattr(auctions, "WRITE_RETRY_MIN_S", 0.01)
+    end = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    repo.insert("users", {"id": "u_1", "email": "buyer@x"}, {"id": "u_2", "email": "seller@x"})
+    repo.insert("products", {"id": "p_1", "owner_id": "u_2"})
+    repo.insert("auctions", {"id": "a_1", "product_id": "p_1", "status": "running", "end_at": end,
+                             "current_price": 10.0, "min_increment": 1.0, "current_bid_id": None})
+    repo.insert("ledger", {"id": "l_0", "user_id": "u_1", "type": "credit", "cents": 10000})
+    return AuctionEngine(repo, Ledger(repo))
+
+
+def _failing(monkeypatch, repo, times, write_first=False):
+    # Les `times` premiers commits échouent (après avoir écrit si write_first)
+    real = repo._commit
+    calls = {"n": 0}
+
+    def commit(puts, deletes, inserts):
+        calls["n"] += 1
+        if calls["n"] <= times:
+            if write_first:
+                real(puts, deletes, inserts)
+            raise OSError("disque plein")
+        return real(puts, deletes, inserts)
+    monkeypatch.setattr(repo, "_commit", commit)
+    return calls
+
+
+def test_failed_batch_is_retried_not_dropped(engine, repo, monkeypatch):
+    calls = _failing(monkeypatch, repo, 2)
+    res = engine.place_bid("a_1", "u_1", 12)
+    engine.flush()
+    assert calls["n"] == 3
+    assert repo.get("bids", res["bid_id"])["amount"] == 12
+    assert repo.get("auctions", "a_1")["current_bid_id"] == res["bid_id"]
+    assert engine.failure is None
+
+
+def test_retry_after_partial_write(engine, repo, monkeypatch):
+    _failing(monkeypatch, repo, 1, write_first=True)
+    res = engine.place_bid("a_1", "u_1", 12)
+    engine.flush()
+    assert repo.get("bids", res["bid_id"])["amount"] == 12
+    assert engine.failure is None
+
+
+def test_new_bids_rejected_while_writes_fail(engine):
+    engine.failure = OSError("disque plein")
+    with pytest.raises(EngineUnavailable):
+        engine.place_bid("a_1", "u_1", 12)
+    with pytest.raises(EngineUnavailable):
+        engine.credit("u_1", 5)
+
+
+def test_exclusive_gives_up_when_writes_keep_failing(engine, repo, monkeypatch):
+    monkeypatch.setattr(auctions, "FLUSH_TIMEOUT_S", 0.2)
+    _failing(monkeypatch, repo, 10 ** 6)
+    engine.place_bid("a_1", "u_1", 12)
+    with pytest.raises(EngineUnavailable):
+        with engine.exclusive("a_1"):
+            pass
+    # Verrous relâchés : l'enchère reste lisible
+    assert engine.snapshot("a_1")["current_price"] == 12
@@ -0,0 +1,24 @@
+from services.events import Coalescer
+
+
+class Bus:
+    def __init__(self):
+        self.sent = []
+
+    def publish(self, event, data, room=None):
+        self.sent.append((room, data))
+
+
+def test_seq_is_numbered_per_origin():
+    bus = Bus()
+    # Deux workers derrière le même broker
+    workers = [Coalescer(bus, "bid_placed", window=0) for _ in range(2)]
+    for i, worker in enumerate(workers * 2):
+        worker.submit("auction_a_1", {"current_price": i})
+
+    assert workers[0].origin != workers[1].origin
+    by_origin = {}
+    for _, data in bus.sent:
+        by_origin.setdefault(data["origin"], []).append(data["seq"])
+    assert by_origin == {w.origin: [1, 2] for w in workers}
+    assert workers[0].seq("auction_a_1") == 2
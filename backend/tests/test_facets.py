@@ -0,0 +1,51 @@
+from services.auctions import auction_facets, SORTS, list_auctions
+from services.facets import FacetIndex
+
+
+def _seed(repo):
+    repo.insert("products",
+                {"id": "p_1", "owner_id": "u_1", "title": "Lampe", "category": "art", "condition": "used"},
+                {"id": "p_2", "owner_id": "u_1", "title": "Vélo", "category": "vehicule", "condition": "new"},
+                {"id": "p_3", "owner_id": "u_1", "title": "Vase", "category": "art", "condition": "new"})
+    repo.insert("auctions", *[
+        {"id": f"a_{i}", "product_id": pid, "status": status, "end_at": f"2030-01-0{i}T00:00:00+00:00",
+         "current_price": 10.0}
+        for i, (pid, status) in enumerate([("p_1", "running"), ("p_2", "running"),
+                                           ("p_3", "closed"), ("p_3", "running")], 1)])
+
+
+def test_each_facet_is_counted_without_its_own_filter(repo):
+    _seed(repo)
+    facets = FacetIndex.from_repo(repo, sort_keys=SORTS)
+    counts = facets.counts(status="running", category="art")
+    # Catégories : enchères en cours, toutes catégories confondues
+    assert counts["category"] == {"art": 2, "vehicule": 1}
+    # Statuts : enchères d'art, tous statuts confondus
+    assert counts["status"] == {"running": 2, "closed": 1}
+    assert counts["condition"] == {"used": 1, "new": 1}
+    assert facets.select(status="running", category="art") == {"a_1", "a_4"}
+    assert facets.select({"a_1", "a_2"}, status="running") == {"a_1", "a_2"}
+
+
+def test_writes_refile_auctions(repo):
+    _seed(repo)
+    facets = FacetIndex.from_repo(repo, sort_keys=SORTS)
+    repo.put("products", {"id": "p_1", "owner_id": "u_1", "title": "Lampe", "category": "autre",
+                          "condition": "used"})
+    repo.put("auctions", {"id": "a_2", "product_id": "p_2", "status": "closed",
+                          "end_at": "2030-01-02T00:00:00+00:00", "current_price": 10.0})
+    repo.delete("auctions", "a_4")
+    assert facets.counts()["category"] == {"autre": 1, "vehicule": 1, "art": 1}
+    assert facets.select(status="running") == {"a_1"}
+    assert facets.counts(status="running")["condition"] == {"used": 1}
+
+
+def test_indexed_listing_matches_scan(repo):
+    _seed(repo)
+    facets = FacetIndex.from_repo(repo, sort_keys=SORTS)
+    for filters in ({}, {"status": "running"}, {"category": "art"}, {"status": "running", "condition": "new"}):
+        indexed = list_auctions(repo, facets=facets, **filters)["auctions"]
+        scanned = list_auctions(repo, **filters)["auctions"]
+        assert [a["id"] for a in indexed] == [a["id"] for a in scanned]
+    out = auction_facets(repo, facets, status="running")
+    assert out["total"] == 3 and out["facets"]["category"] == {"art": 2, "vehicule": 1}
@@ -0,0 +1,58 @@
+import time
+
+from flask import Flask
+from werkzeug.http import http_date
+
+from services.http_cache import ResponseCache
+
+
+def _app(state):
+    app = Flask(__name__)
+    cache = ResponseCache()
+
+    @app.get("/thing")
+    def thing():
+        return cache.serve((state["n"],), state["modified"], lambda: {"n": state["n"]})
+    return app.test_client()
+
+
+def test_same_second_change_is_not_hidden_by_if_modified_since():
+    now = time.time()
+    state = {"n": 1, "modified": now}
+    client = _app(state)
+    # Version de la seconde en cours : pas de Last-Modified, IMS ignoré
+    first = client.get("/thing")
+    assert "Last-Modified" not in first.headers
+    state.update(n=2, modified=now)
+    again = client.get("/thing", headers={"If-Modified-Since": http_date(now)})
+    assert again.status_code == 200 and again.get_json() == {"n": 2}
+
+
+def test_if_modified_since_honoured_for_settled_version():
+    state = {"n": 1, "modified": time.time() - 5}
+    client = _app(state)
+    first = client.get("/thing")
+    since = first.headers["Last-Modified"]
+    assert client.get("/thing", headers={"If-Modified-Since": since}).status_code == 304
+    state.update(n=2, modified=time.time())
+    assert client.get("/thing", headers={"If-Modified-Since": since}).status_code == 200
+
+
+def _list_app(n):
+    app = Flask(__name__)
+    cache = ResponseCache()
+
+    @app.get("/items")
+    def items():
+        return cache.serve((n,), time.time() - 5, lambda: {"items": [{"i": i} for i in range(n)]},
+                           stream="items")
+    return app.test_client()
+
+
+def test_small_streamed_list_is_not_compressed():
+    small = _list_app(3).get("/items", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert small.get_json() == {"items": [{"i": 0}, {"i": 1}, {"i": 2}]}
+
+    large = _list_app(2000).get("/items", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["Content-Encoding"] == "gzip"
@@ -0,0 +1,55 @@
+import pytest
+
+from services.repo import ID_BLOCK, IdConflict
+
+
+def test_new_ids_are_distinct(repo):
+    ids = [repo.new_id("auctions", prefix="a_") for _ in range(ID_BLOCK * 2 + 3)]
+    assert len(set(ids)) == len(ids)
+    assert ids[0] == "a_1"
+
+
+def test_deleted_id_not_reused_after_restart(make_repo):
+    repo = make_repo()
+    for _ in range(3):
+        repo.insert("auctions", {"id": repo.new_id("auctions", prefix="a_"), "start_price": 10})
+    repo.delete("auctions", "a_2")
+
+    restarted = make_repo()
+    new_id = restarted.new_id("auctions", prefix="a_")
+    assert new_id not in {"a_1", "a_2", "a_3"}
+    assert restarted.get("auctions", "a_3")["start_price"] == 10
+
+
+def test_processes_never_share_ids(make_repo):
+    first, second = make_repo(), make_repo()
+    ids = [r.new_id("bids", prefix="b_") for _ in range(ID_BLOCK + 1) for r in (first, second)]
+    assert len(set(ids)) == len(ids)
+
+
+def test_new_id_above_rows_written_without_it(repo):
+    repo.save("products", {"products": [{"id": "p_500"}, {"id": "open_p_900"}]})
+    assert repo.new_id("products", prefix="p_") == "p_501"
+
+
+def test_insert_rejects_existing_id(repo):
+    repo.insert("products", {"id": "p_1", "title": "original"})
+    with pytest.raises(IdConflict):
+        repo.insert("products", {"id": "p_1", "title": "overwrite"})
+    assert repo.get("products", "p_1")["title"] == "original"
+
+
+def test_conflicting_transaction_writes_nothing(repo):
+    repo.insert("bids", {"id": "b_1", "auction_id": "a_1", "user_id": "u_1"})
+    with pytest.raises(IdConflict):
+        with repo.transaction("auction:a_1") as tx:
+            tx.put("auctions", {"id": "a_1", "current_bid_id": "b_1"})
+            tx.insert("bids", {"id": "b_1", "auction_id": "a_2", "user_id": "u_2"})
+    assert repo.get("auctions", "a_1") is None
+    assert repo.get("bids", "b_1")["auction_id"] == "a_1"
+
+
+def test_put_still_replaces(repo):
+    repo.insert("auctions", {"id": "a_1", "status": "scheduled"})
+    repo.put("auctions", {"id": "a_1", "status": "running"})
+    assert repo.get("auctions", "a_1")["status"] == "running"
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+from services.images import ImagePipeline, UnsupportedImage, content_etag, sniff
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+def _png(width=600, height=300):
+    Image = pytest.importorskip("PIL.Image")
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(out, "PNG")
+    return out.getvalue()
+
+
+def _store(pipeline, data, pid="p_1"):
+    upload = pipeline.receive(pid, max_bytes=10 ** 7)
+    try:
+        for i in range(0, len(data), 1000):
+            upload.write(data[i:i + 1000])
+        return pipeline.commit(upload)
+    finally:
+        upload.discard()
+
+
+def test_sniff_trusts_content_not_names():
+    assert sniff(JPEG[:12]) == ".jpg"
+    assert sniff(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d") == ".png"
+    assert sniff(b"RIFF\x00\x00\x00\x00WEBP") == ".webp"
+    assert sniff(b"GIF89a\x00\x00\x00\x00\x00\x00") is None
+    assert sniff(b"<svg xmlns=") is None
+
+
+def test_same_content_is_stored_once(tmp_path):
+    pipeline = ImagePipeline(tmp_path)
+    first, second = _store(pipeline, JPEG), _store(pipeline, JPEG)
+    pipeline.join()  # en-tête JPEG seul : pas de variantes
+    assert first == second and first.endswith(".jpg") and content_etag(first) == first
+    assert sorted(p.name for p in (tmp_path / "p_1").iterdir()) == [first]
+
+
+def test_unsupported_content_is_refused(tmp_path):
+    pipeline = ImagePipeline(tmp_path)
+    with pytest.raises(UnsupportedImage):
+        _store(pipeline, b"GIF89a" + b"\x00" * 64)
+    # Fichier plus court que les octets magiques : reconnu à la fin
+    with pytest.raises(UnsupportedImage):
+        _store(pipeline, b"\xff\xd8")
+    assert list((tmp_path / "p_1").iterdir()) == []
+
+
+def test_variants_are_resolved_by_width_and_format(tmp_path):
+    pipeline = ImagePipeline(tmp_path)
+    name = _store(pipeline, _png())
+    pipeline.join()
+    stem = name[:-4]
+    stored = {p.name for p in (tmp_path / "p_1").iterdir()}
+    assert {f"{stem}@160.webp", f"{stem}@480.webp", f"{stem}@160.png", f"{stem}@480.png"} <= stored
+    assert not any("@1200" in n for n in stored)  # jamais agrandie
+
+    assert pipeline.resolve("p_1", name, 200, webp=True) == (f"{stem}@480.webp", "variant")
+    assert pipeline.resolve("p_1", name, 100, webp=False) == (f"{stem}@160.png", "variant")
+    assert pipeline.resolve("p_1", name, 1000, webp=True) == (name, "original")
+    assert pipeline.resolve("p_1", name, None, webp=True) == (name, "original")
+
+
+def test_media_route_serves_variants_with_strong_etags(app, client):
+    pipeline = app.extensions["images"]
+    name = _store(pipeline, _png())
+    pipeline.join()
+    r = client.get(f"/media/p_1/{name}?size=200", headers={"Accept": "image/webp,*/*"})
+    assert r.status_code == 200 and r.mimetype == "image/webp"
+    assert r.headers["ETag"] == f'"{name[:-4]}@480.webp"'
+    assert r.cache_control.max_age == 31536000 and "Accept" in r.headers["Vary"]
+    again = client.get(f"/media/p_1/{name}?size=200",
+                       headers={"Accept": "image/webp", "If-None-Match": r.headers["ETag"]})
+    assert again.status_code == 304
+
+    original = client.get(f"/media/p_1/{name}")
+    assert original.status_code == 200 and original.data == _png()
+    assert client.get("/media/p_1/../../etc/passwd").status_code == 404
+    assert client.get("/media/p_1/.upload-x").status_code == 404
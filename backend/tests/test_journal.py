@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from services import repo as repo_module
+from services.repo import YamlRepo
+
+
+def _bids(n, start=1):
+    return [{"id": f"b_{i}", "auction_id": "a_1", "amount": float(i)} for i in range(start, start + n)]
+
+
+def test_appends_go_to_the_journal(tmp_path):
+    repo = YamlRepo(tmp_path)
+    repo.insert("bids", *_bids(3))
+    lines = (tmp_path / "bids.jsonl").read_text().splitlines()
+    assert [json.loads(x)["id"] for x in lines] == ["b_1", "b_2", "b_3"]
+    assert not (tmp_path / "bids.yaml").exists()
+
+
+def test_restart_replays_the_journal(tmp_path):
+    YamlRepo(tmp_path).insert("bids", *_bids(3))
+    restarted = YamlRepo(tmp_path)
+    assert [b["id"] for b in restarted.find("bids", "auction_id", "a_1")] == ["b_1", "b_2", "b_3"]
+
+
+def test_truncated_line_is_skipped_and_isolated(tmp_path):
+    repo = YamlRepo(tmp_path)
+    repo.insert("bids", *_bids(2))
+    with open(tmp_path / "bids.jsonl", "a") as f:
+        f.write('{"id": "b_3", "auct')  # arrêt brutal au milieu d'une ligne
+    restarted = YamlRepo(tmp_path)
+    assert restarted.get("bids", "b_3") is None
+    restarted.insert("bids", *_bids(1, start=4))
+    assert YamlRepo(tmp_path).get("bids", "b_4")["amount"] == 4.0
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(repo_module, "JOURNAL_COMPACT_ROWS", 5)
+    repo = YamlRepo(tmp_path)
+    repo.insert("bids", *_bids(3))
+    repo.insert("bids", *_bids(3, start=4))
+    assert (tmp_path / "bids.jsonl").read_text() == ""
+    assert len(YamlRepo(tmp_path).load("bids")["bids"]) == 6
+
+    repo.insert("bids", *_bids(1, start=7))
+    restarted = YamlRepo(tmp_path)
+    assert [b["id"] for b in restarted.find("bids", "auction_id", "a_1")][-2:] == ["b_6", "b_7"]
+
+
+def test_other_process_appends_are_seen(tmp_path):
+    reader, writer = YamlRepo(tmp_path), YamlRepo(tmp_path)
+    writer.insert("bids", *_bids(2))
+    rows, cursor = reader.tail("bids")
+    assert [r["id"] for r in rows] == ["b_1", "b_2"]
+    writer.insert("bids", *_bids(1, start=3))
+    rows, cursor = reader.tail("bids", cursor)
+    assert [r["id"] for r in rows] == ["b_3"] and cursor == 3
+
+
+def test_failed_append_undoes_the_other_journals(tmp_path, monkeypatch):
+    repo = YamlRepo(tmp_path)
+    repo.insert("auctions", {"id": "a_1", "current_bid_id": None})
+    repo.insert("bids", *_bids(1))
+    write = repo._write_journal
+
+    def full_disk(name, rows):
+        if name == "ledger":
+            raise OSError("disque plein")
+        return write(name, rows)
+    monkeypatch.setattr(repo, "_write_journal", full_disk)
+
+    with pytest.raises(OSError):
+        with repo.transaction("auction:a_1") as tx:
+            tx.insert("bids", *_bids(1, start=2))
+            tx.insert("ledger", {"id": "l_1", "type": "hold", "bid_id": "b_2"})
+            tx.put("auctions", {"id": "a_1", "current_bid_id": "b_2"})
+    for seen in (repo, YamlRepo(tmp_path)):
+        assert seen.get("bids", "b_2") is None
+        assert [b["id"] for b in seen.find("bids", "auction_id", "a_1")] == ["b_1"]
+        assert seen.get("auctions", "a_1")["current_bid_id"] is None
+    assert len((tmp_path / "bids.jsonl").read_text().splitlines()) == 1
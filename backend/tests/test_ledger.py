@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.auctions import close_due_auctions, place_bid
+from services.ledger import Ledger, entry, fix, to_cents
+from services.repo import IdConflict
+
+
+def _market(repo, end_in=timedelta(hours=1)):
+    end = (datetime.now(timezone.utc) + end_in).isoformat()
+    repo.insert("users", {"id": "u_1", "email": "alice@x"}, {"id": "u_2", "email": "bob@x"},
+                {"id": "u_3", "email": "seller@x"})
+    repo.insert("products", {"id": "p_1", "owner_id": "u_3"})
+    repo.insert("auctions", {"id": "a_1", "product_id": "p_1", "status": "running", "end_at": end,
+                             "current_price": 10.0, "min_increment": 1.0, "current_bid_id": None})
+    with repo.transaction() as tx:
+        tx.insert("ledger", *(entry(repo, "credit", uid, to_cents(100)) for uid in ("u_1", "u_2")))
+
+
+def test_opening_is_idempotent(repo):
+    repo.insert("users", {"id": "u_1", "email": "alice@x", "balance": 50.0, "held": 12.0},
+                {"id": "u_2", "email": "bob@x", "balance": 0.0})
+    repo.insert("bids", {"id": "b_1", "auction_id": "a_1", "user_id": "u_1", "amount": 12.0})
+    repo.insert("auctions", {"id": "a_1", "status": "running", "current_bid_id": "b_1"})
+
+    ledger = Ledger.from_repo(repo)
+    assert ledger.totals("u_1") == {"balance": 5000, "held": 1200}
+    assert "balance" not in repo.get("users", "u_1")
+
+    # Ouverture interrompue avant la mise à jour des utilisateurs, puis rejouée
+    repo.put("users", {"id": "u_1", "email": "alice@x", "balance": 50.0})
+    again = Ledger.from_repo(repo)
+    assert again.totals("u_1") == {"balance": 5000, "held": 1200}
+    assert len(repo.find("ledger", "user_id", "u_1")) == 2
+
+
+def test_totals_follow_bids_and_closing(repo):
+    _market(repo)
+    ledger = Ledger.from_repo(repo)
+    place_bid(repo, ledger, "a_1", "u_1", 20)
+    place_bid(repo, ledger, "a_1", "u_2", 30)
+    assert ledger.totals("u_1") == {"balance": 10000, "held": 0}
+    assert ledger.totals("u_2") == {"balance": 10000, "held": 3000}
+
+    auction = repo.get("auctions", "a_1")
+    auction["end_at"] = datetime.now(timezone.utc).isoformat()
+    repo.put("auctions", auction)
+    close_due_auctions(repo, ["a_1"])
+    assert ledger.totals("u_2") == {"balance": 7000, "held": 0}
+    assert ledger.totals("u_3") == {"balance": 3000, "held": 0}
+
+
+def test_entries_from_another_process_are_counted(make_repo):
+    here, other = make_repo(), make_repo()
+    ledger = Ledger.from_repo(here)
+    other.insert("ledger", entry(other, "credit", "u_1", 500))
+    assert ledger.totals("u_1") == {"balance": 500, "held": 0}
+
+
+def test_ledger_entries_are_never_replaced(repo):
+    row = entry(repo, "credit", "u_1", 500)
+    repo.insert("ledger", row)
+    with pytest.raises(IdConflict):
+        repo.insert("ledger", {**row, "cents": 1})
+    assert Ledger.from_repo(repo).totals("u_1")["balance"] == 500
+
+
+def test_reconcile_and_fix(repo):
+    _market(repo)
+    ledger = Ledger.from_repo(repo)
+    place_bid(repo, ledger, "a_1", "u_1", 20)
+    assert ledger.reconcile() == {}
+
+    # Blocage orphelin (mise perdue) : écart détecté puis corrigé
+    repo.insert("ledger", entry(repo, "hold", "u_2", 700))
+    drift = ledger.reconcile()
+    assert drift == {"u_2": (700, 0)}
+    assert fix(ledger, drift) == 1
+    assert ledger.reconcile() == {}
+    assert ledger.totals("u_2") == {"balance": 10000, "held": 0}
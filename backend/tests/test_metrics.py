@@ -0,0 +1,52 @@
+import pytest
+
+from services import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Métriques de test retirées du registre global à la fin du test
+    monkeypatch.setattr(metrics, "_REGISTRY", list(metrics._REGISTRY))
+
+
+def _lines(name):
+    return [line for line in metrics.render().splitlines() if line.startswith(name)]
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("test_seconds", "Test", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        h.observe(value, op="load")
+    assert _lines("test_seconds") == [
+        'test_seconds_bucket{op="load",le="0.1"} 1',
+        'test_seconds_bucket{op="load",le="1.0"} 3',
+        'test_seconds_bucket{op="load",le="+Inf"} 4',
+        'test_seconds_sum{op="load"} 4.05',
+        'test_seconds_count{op="load"} 4',
+    ]
+    assert "# TYPE test_seconds histogram" in metrics.render()
+
+
+def test_counter_labels_are_escaped_and_gauges_collected():
+    c = metrics.Counter("test_total", "Test", ("doc",))
+    c.inc(doc='a"b\\c')
+    c.inc(2, doc='a"b\\c')
+    metrics.Gauge("test_gauge", "Test", collect=lambda: {(): 7})
+    metrics.Gauge("test_broken", "Test", collect=lambda: 1 / 0)
+    assert _lines("test_total") == ['test_total{doc="a\\"b\\\\c"} 3']
+    assert _lines("test_gauge") == ["test_gauge 7"]
+    assert _lines("test_broken") == []
+
+
+def test_endpoint_reports_requests_by_route(client):
+    series = 'http_request_duration_seconds_count{method="GET",route="/api/auctions/<aid>",status="404"}'
+
+    def count():
+        body = client.get("/api/metrics").get_data(as_text=True)
+        assert "# TYPE repo_io_duration_seconds histogram" in body
+        return next((int(line.split()[-1]) for line in body.splitlines() if line.startswith(series)), 0)
+
+    before = count()
+    client.get("/api/auctions/a_404")
+    client.get("/api/auctions/a_405")
+    assert count() == before + 2
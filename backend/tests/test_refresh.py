@@ -0,0 +1,72 @@
+from services.auctions import SORTS
+from services.facets import FacetIndex
+from services.listing import ListingView
+from services.search import SearchIndex
+
+
+def _seed(repo):
+    repo.insert("users", {"id": "u_1", "email": "alice@x"})
+    repo.insert("products", {"id": "p_1", "owner_id": "u_1", "title": "Lampe", "category": "art"})
+    repo.insert("auctions", {"id": "a_1", "product_id": "p_1", "status": "running",
+                             "end_at": "2030-01-01T00:00:00+00:00", "current_price": 10.0})
+
+
+def test_listeners_receive_other_process_writes_once(make_repo):
+    here, other = make_repo(), make_repo()
+    _seed(here)
+    here.load("auctions"), here.load("bids")  # documents suivis par ce process
+    seen = []
+    here.add_listener(lambda puts, deletes: seen.append((puts, deletes)))
+
+    other.insert("bids", {"id": "b_1", "auction_id": "a_1", "user_id": "u_1", "amount": 12.0})
+    other.put("auctions", {"id": "a_1", "product_id": "p_1", "status": "running",
+                           "end_at": "2030-01-01T00:00:00+00:00", "current_price": 12.0})
+    here.refresh()
+    here.refresh()
+
+    puts = {name: set(rows) for p, _ in seen for name, rows in p.items()}
+    assert puts == {"bids": {"b_1"}, "auctions": {"a_1"}}
+    # Les écritures de ce process ne reviennent pas par refresh()
+    seen.clear()
+    here.insert("bids", {"id": "b_2", "auction_id": "a_1", "user_id": "u_1", "amount": 13.0})
+    here.refresh()
+    assert len(seen) == 1
+
+
+def test_views_follow_other_workers(make_repo):
+    here, other = make_repo(), make_repo()
+    _seed(here)
+    view = ListingView.from_repo(here)
+    facets = FacetIndex.from_repo(here, sort_keys=SORTS)
+    search = SearchIndex.from_repo(here)
+    before = view.version("a_1")
+
+    other.insert("bids", {"id": "b_1", "auction_id": "a_1", "user_id": "u_1", "amount": 12.0})
+    other.put("auctions", {"id": "a_1", "product_id": "p_1", "status": "closed",
+                           "end_at": "2030-01-01T00:00:00+00:00", "current_price": 12.0})
+    other.put("products", {"id": "p_1", "owner_id": "u_1", "title": "Vase", "category": "art"})
+    here.refresh()
+
+    entry = view.get("a_1")
+    assert (entry["bids_count"], entry["status"], entry["product"]["title"]) == (1, "closed", "Vase")
+    assert view.version("a_1") > before
+    assert facets.counts()["status"] == {"closed": 1}
+    assert set(search.search("vase")) == {"p_1"} and search.search("lampe") == {}
+
+    other.delete("products", "p_1")
+    here.refresh()
+    assert search.search("vase") == {}
+
+
+def test_bid_count_ignores_rewrites(make_repo):
+    here, other = make_repo(), make_repo()
+    _seed(here)
+    view = ListingView.from_repo(here)
+    bid = {"id": "b_1", "auction_id": "a_1", "user_id": "u_1", "amount": 12.0}
+    here.insert("bids", bid)
+    # Nouvel essai d'écriture du moteur, puis la même mise vue d'un autre worker
+    here.put("bids", bid)
+    other.put("bids", bid)
+    here.refresh()
+    assert view.get("a_1")["bids_count"] == 1
+    assert ListingView.from_repo(here).get("a_1")["bids_count"] == 1
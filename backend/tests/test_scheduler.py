@@ -0,0 +1,56 @@
+from services import scheduler as scheduler_module
+from services.scheduler import LifecycleScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _auction(aid, end):
+    return {"id": aid, "status": "running", "end_at": f"@{end}"}
+
+
+def _scheduler(monkeypatch, on_close):
+    monkeypatch.setattr(scheduler_module, "_ts", lambda value: float(value[1:]))
+    clock = Clock()
+    return LifecycleScheduler(on_open=lambda ids: None, on_close=on_close, clock=clock), clock
+
+
+def test_failed_batch_is_retried_with_backoff(monkeypatch):
+    calls = []
+
+    def on_close(ids):
+        calls.append(list(ids))
+        if len(calls) < 3:
+            raise OSError("base indisponible")
+
+    sched, clock = _scheduler(monkeypatch, on_close)
+    sched.load([_auction("a_1", clock.now), _auction("a_2", clock.now)])
+    sched.run_due()
+    assert sched.pending() == 2
+
+    clock.now += scheduler_module.RETRY_MIN_S
+    sched.run_due()
+    assert len(calls) == 2
+    # Deuxième échec : délai doublé
+    clock.now += scheduler_module.RETRY_MIN_S
+    assert sched.run_due()["close"] == []
+    clock.now += scheduler_module.RETRY_MIN_S
+    assert sorted(sched.run_due()["close"]) == ["a_1", "a_2"]
+    assert len(calls) == 3 and sched.pending() == 0
+
+
+def test_retry_skips_auctions_cancelled_meanwhile(monkeypatch):
+    def on_close(ids):
+        sched.cancel("a_1")
+        raise OSError("base indisponible")
+
+    sched, clock = _scheduler(monkeypatch, on_close)
+    sched.load([_auction("a_1", clock.now), _auction("a_2", clock.now)])
+    sched.run_due()
+    clock.now += scheduler_module.RETRY_MIN_S
+    assert sched.run_due()["close"] == ["a_2"]
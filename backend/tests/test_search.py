@@ -0,0 +1,17 @@
+from services.search import SearchIndex
+
+
+def test_index_follows_repo_writes(repo):
+    repo.insert("products", {"id": "p_1", "title": "Peugeot 208", "description": ""})
+    index = SearchIndex.from_repo(repo)
+    assert set(index.search("peug")) == {"p_1"}
+
+    # Écritures hors de la route de création (import en masse, modification)
+    with repo.transaction() as tx:
+        tx.insert("products", {"id": "p_2", "title": "Vélo Peugeot", "description": ""})
+    repo.put("products", {"id": "p_1", "title": "Renault Clio", "description": ""})
+    assert set(index.search("peugeot")) == {"p_2"}
+    assert set(index.search("velo")) == {"p_2"}
+
+    repo.delete("products", "p_2")
+    assert index.search("peugeot") == {}
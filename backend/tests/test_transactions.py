@@ -0,0 +1,86 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from services.repo import IdConflict, YamlRepo
+from services.sqlite_repo import SqliteRepo
+
+
+def _increment(backend, path, times):
+    # Process enfant : son propre repo sur la même base
+    repo = YamlRepo(path) if backend == "yaml" else SqliteRepo(path)
+    for _ in range(times):
+        with repo.transaction("auction:a_1") as tx:
+            auction = tx.get("auctions", "a_1")
+            auction["bids"] += 1
+            tx.put("auctions", auction)
+
+
+def test_exception_rolls_back(repo):
+    repo.insert("auctions", {"id": "a_1", "status": "running"})
+    with pytest.raises(RuntimeError):
+        with repo.transaction("auction:a_1") as tx:
+            tx.put("auctions", {"id": "a_1", "status": "closed"})
+            tx.insert("bids", {"id": "b_1", "auction_id": "a_1"})
+            raise RuntimeError("abandon")
+    assert repo.get("auctions", "a_1")["status"] == "running"
+    assert repo.get("bids", "b_1") is None
+
+
+def test_transaction_reads_its_own_writes(repo):
+    repo.insert("users", {"id": "u_1", "email": "a@x"}, {"id": "u_2", "email": "b@x"})
+    with repo.transaction("user:u_1", "user:u_2") as tx:
+        tx.put("users", {"id": "u_1", "email": "c@x"})
+        tx.delete("users", "u_2")
+        assert tx.get("users", "u_1")["email"] == "c@x"
+        assert tx.get("users", "u_2") is None
+        # Rien n'est visible hors de la transaction avant le commit
+        assert repo.get("users", "u_1")["email"] == "a@x"
+    assert repo.get("users", "u_2") is None
+
+
+def test_failed_insert_leaves_other_writes_unapplied(repo):
+    repo.insert("bids", {"id": "b_1", "auction_id": "a_1"})
+    with pytest.raises(IdConflict):
+        with repo.transaction("auction:a_1") as tx:
+            tx.put("auctions", {"id": "a_1", "current_bid_id": "b_1"})
+            tx.insert("bids", {"id": "b_1", "auction_id": "a_2"})
+    assert repo.get("auctions", "a_1") is None
+    assert repo.get("bids", "b_1")["auction_id"] == "a_1"
+
+
+def test_key_lock_spans_repos(make_repo):
+    # Deux repos sur la même base (deux workers) : le second attend le premier
+    first, second = make_repo(), make_repo()
+    first.insert("auctions", {"id": "a_1", "bids": 0})
+    entered = threading.Event()
+    done = threading.Event()
+
+    def other_worker():
+        with second.transaction("auction:a_1"):
+            entered.set()
+        done.set()
+
+    with first.transaction("auction:a_1"):
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        assert not entered.wait(0.2)
+    assert done.wait(5)
+    thread.join()
+
+
+def test_no_lost_update_across_processes(make_repo, tmp_path):
+    repo = make_repo()
+    repo.insert("auctions", {"id": "a_1", "bids": 0})
+    backend = "yaml" if isinstance(repo, YamlRepo) else "sqlite"
+    path = repo.db_dir if backend == "yaml" else repo.path
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_increment, args=(backend, path, 100)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    _increment(backend, path, 100)
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    assert repo.get("auctions", "a_1")["bids"] == 300
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from services.images import Upload
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+@pytest.fixture
+def product(client, signup):
+    owner = signup("alice@example.com")
+    pid = client.post("/api/products", headers=owner,
+                      json={"title": "Lampe", "description": "Laiton", "category": "art",
+                            "condition": "used"}).get_json()["id"]
+    return pid, owner
+
+
+def _upload(client, pid, headers, data, filename="photo.jpg"):
+    return client.post(f"/api/products/{pid}/images", headers=headers, content_type="multipart/form-data",
+                       data={"file": (io.BytesIO(data), filename, "image/jpeg")})
+
+
+def _images(app, pid):
+    return app.extensions["auction_engine"].repo.get("products", pid).get("images", [])
+
+
+def _stored(tmp_path, pid):
+    return sorted(p.name for p in (tmp_path / "media" / pid).glob("*"))
+
+
+def test_same_file_uploaded_twice_is_listed_once(app, client, product):
+    pid, owner = product
+    first = _upload(client, pid, owner, JPEG)
+    second = _upload(client, pid, owner, JPEG, filename="copie.jpg")
+    assert first.status_code == second.status_code == 201
+    assert first.get_json() == second.get_json()
+    path = first.get_json()["path"]
+    assert _images(app, pid) == [path]
+    assert client.get("/" + path).data == JPEG
+
+
+def test_content_type_is_checked_on_the_bytes(app, client, product, tmp_path):
+    pid, owner = product
+    # Nom et Content-Type d'image, contenu HTML : refusé, rien ne reste sur disque
+    r = _upload(client, pid, owner, b"<html><script>alert(1)</script></html>")
+    assert r.status_code == 400 and r.get_json() == {"error": "Unsupported file type"}
+    assert _stored(tmp_path, pid) == []
+    assert _images(app, pid) == []
+
+
+def test_oversized_upload_is_rejected_and_cleaned_up(app, client, product, tmp_path):
+    pid, owner = product
+    app.config["MAX_CONTENT_LENGTH"] = 4096
+    r = _upload(client, pid, owner, JPEG + b"\x00" * 8192)
+    assert r.status_code == 413
+    assert _stored(tmp_path, pid) == []
+
+
+def test_only_the_owner_can_upload(client, product, signup):
+    pid, _ = product
+    other = signup("bob@example.com")
+    assert _upload(client, pid, other, JPEG).status_code == 403
+    assert _upload(client, "p_404", other, JPEG).status_code == 404
+
+
+def test_size_is_bounded_while_streaming(tmp_path):
+    # Corps sans Content-Length (chunked) : la limite tombe au fil de l'écriture
+    upload = Upload(tmp_path, max_bytes=100)
+    upload.write(JPEG[:60])
+    with pytest.raises(RequestEntityTooLarge):
+        upload.write(b"\x00" * 60)
+    upload.discard()
+    assert list(tmp_path.iterdir()) == []
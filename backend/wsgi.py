@@ -0,0 +1,27 @@
+# wsgi.py
+"""Point d'entrée de production.
+
+    ASYNC_MODE=gevent gunicorn -k geventwebsocket.gunicorn.workers.GeventWebSocketWorker \\
+        -w 1 -b 0.0.0.0:5000 wsgi:app
+
+Un worker gevent sert des milliers de clients Socket.IO. Plusieurs workers
+(-w N ou plusieurs conteneurs) : EVENTS_URL=redis://... et BID_ENGINE=0
+(chaque mise est une transaction dont les verrous par clé valent pour tous
+les process sur la même base), voir README. `python wsgi.py` lance le même serveur sans gunicorn.
+"""
+# Avant tout autre import (gunicorn a déjà patché, l'appel est alors sans effet)
+from services.serving import monkey_patch
+monkey_patch()
+
+import os  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+from app import create_app  # noqa: E402
+
+(Path(__file__).parent / "local_data" / "db").mkdir(parents=True, exist_ok=True)
+(Path(__file__).parent / "local_data" / "media").mkdir(parents=True, exist_ok=True)
+app, socketio = create_app()
+
+if __name__ == '__main__':
+    port = int(os.environ.get("PORT", 5000))
+    socketio.run(app, host='0.0.0.0', port=port, debug=False, allow_unsafe_werkzeug=True)
@@ -13,4 +13,7 @@ export type Auction = {
   product?: Product;
 };
 
-export type AuctionsResponse = { auctions: Auction[] };
+export type AuctionsResponse = {
+  auctions: Auction[];
+  next_cursor?: string | null;
+};
@@ -106,11 +106,27 @@ class ApiService {
   }
 
   // --- Auctions endpoints ---
-  async getAuctions(filters = {}) {
+  // Une page d'enchères : { auctions, next_cursor }
+  async getAuctions(filters = {}, cursor = null) {
     const params = new URLSearchParams(filters);
+    if (cursor) params.set("cursor", cursor);
     return await this.request(`/auctions?${params}`);
   }
 
+  // Comptes par statut / catégorie / état : { total, facets }
+  async getAuctionFacets(filters = {}) {
+    const params = new URLSearchParams(filters);
+    return await this.request(`/auctions/facets?${params}`);
+  }
+
+  // Une page de l'historique des mises (plus récentes en premier)
+  async getAuctionBids(auctionId, { limit, cursor } = {}) {
+    const params = new URLSearchParams();
+    if (limit) params.set("limit", limit);
+    if (cursor) params.set("cursor", cursor);
+    return await this.request(`/auctions/${auctionId}/bids?${params}`);
+  }
+
   async getAuction(id) {
     return await this.request(`/auctions/${id}`);
   }
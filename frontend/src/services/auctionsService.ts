@@ -18,12 +18,19 @@ export async function getAllAuctions(
   if (query.category) params.append("category", query.category);
   if (query.search) params.append("search", query.search);
 
-  const qs = params.toString();
-  const url = qs ? `${API}/api/auctions?${qs}` : `${API}/api/auctions`;
+  params.append("limit", "200");
 
-  const r = await fetch(url);
-  if (!r.ok) throw new Error(await r.text());
+  // Suivre next_cursor jusqu'à la dernière page
+  const all: Auction[] = [];
+  let cursor: string | null = null;
+  do {
+    if (cursor) params.set("cursor", cursor);
+    const r = await fetch(`${API}/api/auctions?${params.toString()}`);
+    if (!r.ok) throw new Error(await r.text());
 
-  const data = (await r.json()) as AuctionsResponse;
-  return data.auctions ?? [];
+    const data = (await r.json()) as AuctionsResponse;
+    all.push(...(data.auctions ?? []));
+    cursor = data.next_cursor ?? null;
+  } while (cursor);
+  return all;
 }
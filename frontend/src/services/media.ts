@@ -3,8 +3,9 @@ const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:5000";
 /**
  * Transforme "media/p2/xxx.jpg" en "http://localhost:5000/media/p2/xxx.jpg".
  * Gère aussi "/media/..." et les URLs déjà absolues.
+ * `size` : largeur affichée en px, le backend sert alors une variante réduite.
  */
-export function toMediaUrl(path?: string): string {
+export function toMediaUrl(path?: string, size?: number): string {
   if (!path) return "/assets/images/placeholder.jpg";
   if (/^https?:\/\//i.test(path)) return path;        // déjà absolu
   if (path.startsWith("/assets/")) return path;       // asset front
@@ -16,5 +17,6 @@ export function toMediaUrl(path?: string): string {
   const pid = encodeURIComponent(m[1]);
   const filename = encodeURIComponent(m[2]);
   const base = API_BASE.replace(/\/+$/, "");
-  return `${base}/media/${pid}/${filename}`;
+  const query = size ? `?size=${size}` : "";
+  return `${base}/media/${pid}/${filename}${query}`;
 }
@@ -13,38 +13,17 @@ export async function getMyProfile() {
 }
 
 /**
- * Récupérer toutes les enchères où l'utilisateur a participé (placé une enchère)
+ * Récupérer les enchères où l'utilisateur a participé (placé une enchère)
  */
 export async function getMyParticipations() {
   try {
-    const user = await api.request("/me");
-    const bidsDoc = await api.request("/auctions");
-
-    // Récupérer toutes les enchères et tous les bids
-    const allAuctions = bidsDoc.auctions || [];
-    const allBids = [];
-
-    // Pour chaque enchère, récupérer les bids
-    for (const auction of allAuctions) {
-      try {
-        const bidsData = await api.request(`/auctions/${auction.id}/bids`);
-        const userBids = bidsData.bids.filter((bid) => bid.user.id === user.id);
-
-        if (userBids.length > 0) {
-          // Trouver l'enchère maximale de l'utilisateur
-          const maxBid = Math.max(...userBids.map((b) => b.amount));
-          allBids.push({
-            ...auction,
-            myBid: maxBid,
-            myBidsCount: userBids.length,
-          });
-        }
-      } catch (error) {
-        console.error(`Error fetching bids for auction ${auction.id}:`, error);
-      }
-    }
-
-    return allBids;
+    // Filtré par le backend (index des mises par utilisateur)
+    const response = await api.request("/my/bids");
+    return (response.auctions || []).map((auction) => ({
+      ...auction,
+      myBid: auction.my_bid,
+      myBidsCount: auction.my_bids_count,
+    }));
   } catch (error) {
     console.error("Error fetching participations:", error);
     return [];
@@ -56,17 +35,8 @@ export async function getMyParticipations() {
  */
 export async function getMyAuctions() {
   try {
-    const user = await api.request("/me");
-    const auctionsDoc = await api.request("/auctions");
-
-    const auctions = auctionsDoc.auctions || [];
-
-    // Filtrer les enchères créées par l'utilisateur
-    const myAuctions = auctions.filter((auction) => {
-      return auction.product && auction.product.owner_id === user.id;
-    });
-
-    return myAuctions;
+    const response = await api.request("/my/auctions");
+    return response.auctions || [];
   } catch (error) {
     console.error("Error fetching my auctions:", error);
     return [];
@@ -78,17 +48,14 @@ export async function getMyAuctions() {
  */
 export async function getMyWonAuctions() {
   try {
-    const user = await api.request("/me");
-    const auctionsDoc = await api.request("/auctions?status=closed");
-
-    const auctions = auctionsDoc.auctions || [];
-
-    // Filtrer les enchères où l'utilisateur est le gagnant
-    const wonAuctions = auctions.filter((auction) => {
-      return auction.winner_id === user.id;
-    });
-
-    return wonAuctions;
+    // Une enchère gagnée est une enchère où l'on a misé
+    const [user, response] = await Promise.all([
+      api.request("/me"),
+      api.request("/my/bids"),
+    ]);
+    return (response.auctions || []).filter(
+      (auction) => auction.winner_id === user.id
+    );
   } catch (error) {
     console.error("Error fetching won auctions:", error);
     return [];
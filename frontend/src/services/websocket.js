@@ -14,6 +14,9 @@ class WebSocketService {
     this.socket = null;
     this.connected = false;
     this.listeners = new Map();
+    // Par enchère : origine (worker) -> dernier seq reçu. Chaque worker
+    // numérote ses propres messages : les trous se comptent par origine
+    this.lastSeq = new Map();
   }
 
   connect() {
@@ -91,6 +94,7 @@ class WebSocketService {
       this.socket = null;
       this.connected = false;
       this.listeners.clear();
+      this.lastSeq.clear();
       console.log("WebSocket disconnected");
     }
   }
@@ -107,6 +111,7 @@ class WebSocketService {
     return new Promise((resolve) => {
       this.socket.once("joined_auction", (data) => {
         console.log("Joined auction room:", data.auction_id);
+        this.resetSeq(data);
         resolve(data);
       });
     });
@@ -117,6 +122,7 @@ class WebSocketService {
       console.log("Leaving auction room:", auctionId);
       this.socket.emit("leave_auction", { auction_id: auctionId });
     }
+    this.lastSeq.delete(auctionId);
   }
 
   onBidPlaced(callback) {
@@ -125,9 +131,23 @@ class WebSocketService {
       return;
     }
 
+    // Delta : { auction_id, current_price, bid_id, bids_count, leader, seq, origin }
     console.log("Listening for bid_placed events");
     this.socket.on("bid_placed", (data) => {
       console.log("📢 New bid received via WebSocket:", data);
+      let seqs = this.lastSeq.get(data.auction_id);
+      if (!seqs) {
+        seqs = new Map();
+        this.lastSeq.set(data.auction_id, seqs);
+      }
+      // Première origine vue depuis le join : elle sert de point de départ
+      const last = seqs.get(data.origin);
+      seqs.set(data.origin, data.seq);
+      if (last != null && data.seq !== last + 1) {
+        // Message(s) perdu(s) : demander l'état complet au serveur
+        console.warn(`Seq gap from ${data.origin} (${last} -> ${data.seq}), resync`);
+        this.socket.emit("resync", { auction_id: data.auction_id });
+      }
       callback(data);
     });
 
@@ -135,6 +155,31 @@ class WebSocketService {
     this.listeners.set("bid_placed", callback);
   }
 
+  // Position du worker qui a répondu (join, resync) : les seq des autres
+  // origines repartent de leur prochain message
+  resetSeq(data) {
+    const seqs = new Map();
+    if (data.origin != null) seqs.set(data.origin, data.seq ?? null);
+    this.lastSeq.set(data.auction_id, seqs);
+  }
+
+  // Réponse à un resync : { auction_id, seq, origin, auction }
+  onAuctionState(callback) {
+    if (!this.socket) return;
+    this.socket.on("auction_state", (data) => {
+      this.resetSeq(data);
+      callback(data);
+    });
+    this.listeners.set("auction_state", callback);
+  }
+
+  offAuctionState() {
+    if (this.socket) {
+      this.socket.removeAllListeners("auction_state");
+      this.listeners.delete("auction_state");
+    }
+  }
+
   offBidPlaced() {
     if (this.socket) {
       // Retirer tous les listeners pour bid_placed
@@ -144,6 +189,27 @@ class WebSocketService {
     }
   }
 
+  // Clôtures groupées : { auctions: [{ auction_id, winner_id, current_price, status }] }
+  onAuctionClosed(callback) {
+    if (!this.socket) {
+      console.warn("Cannot listen for closings, socket not initialized");
+      return;
+    }
+
+    this.socket.on("auction_closed", (data) => {
+      console.log("📢 Auctions closed via WebSocket:", data);
+      callback(data);
+    });
+    this.listeners.set("auction_closed", callback);
+  }
+
+  offAuctionClosed() {
+    if (this.socket) {
+      this.socket.removeAllListeners("auction_closed");
+      this.listeners.delete("auction_closed");
+    }
+  }
+
   isConnected() {
     return this.connected && this.socket?.connected;
   }